@@ -0,0 +1,122 @@
+"""
+Laufende Auszählung der Umfrageergebnisse für das Stimmungsbild.
+
+WICHTIG:
+- Jede neue Abgabe wird in konstanter Zeit eingerechnet (die Zahl der
+  Optionen pro Frage ist klein und begrenzt); es wird nie alles neu gezählt.
+- `version` erhöht sich mit jeder Abgabe – darüber lassen sich abgeleitete
+  Dinge wie Diagramme zwischenspeichern.
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+@dataclass
+class TallySnapshot:
+    """Unveränderliche Kopie der Zählerstände zu einer bestimmten Version."""
+    version: int
+    submissions: int
+    option_counts: Dict[str, Dict[str, int]]
+    other_counts: Dict[str, int]
+    co_occurrence: Dict[Tuple[str, str], int]
+    avatar_counts: Dict[str, int]
+    questions: List[str] = field(default_factory=list)
+
+
+class Tallies:
+    """
+    Zählt pro Frage die gewählten Optionen, wie oft ein Freitext ausgefüllt
+    wurde, welche Optionen gemeinsam gewählt wurden (auch über Fragen
+    hinweg) und wie oft welcher Avatar abgegeben hat.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = 0
+        self._submissions = 0
+        self._questions: List[str] = []
+        self._option_counts: Dict[str, Counter] = {}
+        self._other_counts: Counter = Counter()
+        self._co_occurrence: Counter = Counter()
+        self._avatar_counts: Counter = Counter()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def add(self, payload: Dict[str, Any]) -> None:
+        """Rechnet eine Abgabe (Schema des Sende-Buttons) ein."""
+        answers = payload.get("answers") or {}
+        chosen: List[str] = []
+
+        with self._lock:
+            for question, answer in answers.items():
+                if not isinstance(answer, dict):
+                    continue
+                counts = self._option_counts.get(question)
+                if counts is None:
+                    counts = self._option_counts[question] = Counter()
+                    self._questions.append(question)
+                for opt in answer.get("selected", []):
+                    counts[opt] += 1
+                    chosen.append(f"{question}: {opt}")
+                if str(answer.get("other", "")).strip():
+                    self._other_counts[question] += 1
+
+            for a, b in combinations(sorted(chosen), 2):
+                self._co_occurrence[(a, b)] += 1
+
+            avatar = payload.get("avatar")
+            if avatar:
+                self._avatar_counts[avatar] += 1
+
+            self._submissions += 1
+            self._version += 1
+
+    def add_many(self, payloads: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for payload in payloads:
+            self.add(payload)
+            n += 1
+        return n
+
+    def to_state(self) -> Dict[str, Any]:
+        """Zählerstände als JSON-taugliches Dict (für snapshots.py)."""
+        with self._lock:
+            return {
+                "version": self._version,
+                "submissions": self._submissions,
+                "questions": list(self._questions),
+                "option_counts": {q: dict(c) for q, c in self._option_counts.items()},
+                "other_counts": dict(self._other_counts),
+                "co_occurrence": [[a, b, n] for (a, b), n in self._co_occurrence.items()],
+                "avatar_counts": dict(self._avatar_counts),
+            }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Tallies":
+        tallies = cls()
+        tallies._version = state["version"]
+        tallies._submissions = state["submissions"]
+        tallies._questions = list(state["questions"])
+        tallies._option_counts = {q: Counter(c) for q, c in state["option_counts"].items()}
+        tallies._other_counts = Counter(state["other_counts"])
+        tallies._co_occurrence = Counter({(a, b): n for a, b, n in state["co_occurrence"]})
+        tallies._avatar_counts = Counter(state["avatar_counts"])
+        return tallies
+
+    def snapshot(self) -> TallySnapshot:
+        with self._lock:
+            return TallySnapshot(
+                version=self._version,
+                submissions=self._submissions,
+                option_counts={q: dict(c) for q, c in self._option_counts.items()},
+                other_counts=dict(self._other_counts),
+                co_occurrence=dict(self._co_occurrence),
+                avatar_counts=dict(self._avatar_counts),
+                questions=list(self._questions),
+            )
@@ -0,0 +1,82 @@
+"""
+Fragebogen als Browser-Komponente (components/answer_form/index.html):
+Häkchen, Freitexte und das max_choices-Limit bleiben im Browser, der
+Server bekommt den kompletten Stand in EINER Nachricht.
+
+WICHTIG:
+- Der Browser ist nicht vertrauenswürdig: Jeder übernommene Stand wird mit
+  Survey.validate() geprüft (bekannte Fragen, gültige Bits, Limits) und erst
+  dann in die Masken/Freitexte im Session State geschrieben. Alles danach –
+  Vorschau, PDF, Versand – liest wie bisher nur den Session State.
+- Die erste Änderung nach dem Übernehmen meldet die Komponente als
+  "noch nicht übernommen" (`answers_pending()`); solange darf nicht
+  gesendet werden, sonst ginge der alte Stand raus.
+- Die Masken sind im Browser 32-Bit-Ganzzahlen; Fragebögen mit mehr als
+  MAX_OPTIONS Optionen pro Frage laufen deshalb immer über die Checkboxen.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from assets import LIGHT_GREEN_RGB
+from survey_schema import Survey, SurveySchemaError
+
+COMPONENT_DIR = Path(__file__).resolve().parent / "components" / "answer_form"
+MAX_OPTIONS = 31
+
+_answer_form = components.declare_component("answer_form", path=str(COMPONENT_DIR))
+
+
+def supports(survey: Survey) -> bool:
+    """Passt der Fragebogen in die Browser-Komponente?"""
+    return all(len(q.options) <= MAX_OPTIONS for q in survey.questions)
+
+
+def _args(survey: Survey) -> Dict[str, Any]:
+    state = st.session_state
+    return {
+        "codebook": survey.codebook,
+        "questions": [
+            {"key": q.key, "title": q.title, "options": list(q.options),
+             "max_choices": q.max_choices, "limit": q.limit_caption and q.limit_caption.replace("**", "")}
+            for q in survey.questions
+        ],
+        "masks": {q.key: state.get(q.mask_key, 0) for q in survey.questions},
+        "other": {q.key: state.get(q.other_key, "") for q in survey.questions},
+        "other_label": "Sonstiges / eigene Antwort:",
+        "accent": "#%02x%02x%02x" % LIGHT_GREEN_RGB,
+    }
+
+
+def answers_pending(key: str = "answer_form") -> bool:
+    """True, wenn im Browser Änderungen liegen, die noch nicht übernommen sind."""
+    return bool(st.session_state.get(f"{key}_dirty", False))
+
+
+def answer_form(survey: Survey, key: str = "answer_form") -> Optional[str]:
+    """
+    Zeigt alle Fragen als eine Komponente. Ein neu übernommener Stand wird
+    geprüft und in den Session State geschrieben; zurück kommt eine
+    Fehlermeldung, falls er ungültig war (sonst None).
+    """
+    value = _answer_form(**_args(survey), key=key, default=None)
+    state = st.session_state
+    if value is None or value == state.get(f"{key}_applied"):
+        return None
+    state[f"{key}_applied"] = value
+    state[f"{key}_dirty"] = bool(value.get("dirty"))
+    if value.get("dirty"):
+        return None
+    if value.get("codebook") != survey.codebook:
+        return "Der Fragebogen wurde inzwischen geändert – bitte lade die Seite neu."
+    try:
+        kompakt = survey.validate(value.get("masks", {}), value.get("other", {}))
+    except SurveySchemaError as e:
+        return f"Die Antworten konnten nicht übernommen werden: {e}"
+    for q in survey.questions:
+        state[q.mask_key] = kompakt["masks"].get(q.key, 0)
+        state[q.other_key] = kompakt["other"].get(q.key, "")
+    return None
@@ -0,0 +1,338 @@
+"""
+Statische Assets der App: Farben, Icon, Stylesheet und Schriften.
+
+WICHTIG:
+- Das Sonnenblumen-Icon wird einmal pro Prozess dekodiert und in kleinen
+  PNG-Varianten (Favicon, Logo) vorgehalten – nicht bei jedem Rerun.
+- Das CSS wird einmal pro Prozess erzeugt und als `static/umfrage-<hash>.css`
+  abgelegt. Über Streamlits Static Serving (.streamlit/config.toml:
+  `enableStaticServing = true`) lädt der Browser es einmal und cached es;
+  pro Rerun geht nur noch ein kurzer Verweis raus.
+- PT Sans und Oswald kommen aus `static/fonts/` (kein Google-Fonts-Import,
+  funktioniert auch offline). Einmalig holen mit
+      python assets.py fetch-fonts
+  Solange die Dateien fehlen (oder static/ nicht ausgeliefert wird), lädt
+  das Stylesheet die Schriften wie früher von Google Fonts.
+"""
+
+import functools
+import hashlib
+import io
+import sys
+import urllib.request
+from pathlib import Path
+from string import Template
+from typing import Optional, Tuple, Union
+
+# ============================================================
+# DESIGN-FARBEN
+# ============================================================
+DARK_GREEN_RGB = (0, 85, 56)        # Hintergrund & Titel-Farbe
+LIGHT_GREEN_RGB = (138, 189, 36)    # Schriftfarbe & Titelblock-Hintergrund
+
+DARK_GREEN = "rgb({}, {}, {})".format(*DARK_GREEN_RGB)
+LIGHT_GREEN = "rgb({}, {}, {})".format(*LIGHT_GREEN_RGB)
+
+
+def mpl_color(rgb: Tuple[int, int, int]) -> Tuple[float, float, float]:
+    """RGB (0–255) -> matplotlib-Farbe (0–1)."""
+    return tuple(c / 255 for c in rgb)
+
+
+# ============================================================
+# PFADE
+# ============================================================
+APP_DIR = Path(__file__).parent
+ICON_PATH = APP_DIR / "sunflower.png"
+STATIC_DIR = APP_DIR / "static"
+FONT_DIR = STATIC_DIR / "fonts"
+
+# URL des static-Ordners, relativ zur Seite (funktioniert auch mit baseUrlPath)
+STATIC_URL = "app/static"
+
+FALLBACK_ICON = "🌻"
+
+
+# ------------------------------------------------------------
+# Icon
+# ------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def icon_png(size: int) -> Optional[bytes]:
+    """Sonnenblume als PNG mit höchstens `size` Pixeln Kantenlänge (einmal pro Prozess)."""
+    if not ICON_PATH.exists():
+        return None
+    from PIL import Image
+
+    with Image.open(ICON_PATH) as img:
+        img.thumbnail((size, size))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def page_icon() -> Union[bytes, str]:
+    """Favicon für st.set_page_config: PNG-Bytes oder das Emoji als Ersatz."""
+    return icon_png(64) or FALLBACK_ICON
+
+
+# ------------------------------------------------------------
+# Schriften
+# ------------------------------------------------------------
+
+# (Familie, Stil, Gewicht, Datei, Quelle unter github.com/google/fonts, SIL OFL)
+FONTS = (
+    ("PT Sans", "normal", "400", "PTSans-Regular.ttf", "ofl/ptsans/PT_Sans-Web-Regular.ttf"),
+    ("PT Sans", "normal", "700", "PTSans-Bold.ttf", "ofl/ptsans/PT_Sans-Web-Bold.ttf"),
+    ("PT Sans", "italic", "400", "PTSans-Italic.ttf", "ofl/ptsans/PT_Sans-Web-Italic.ttf"),
+    ("Oswald", "normal", "200 700", "Oswald.ttf", "ofl/oswald/Oswald%5Bwght%5D.ttf"),
+)
+FONT_LICENSES = (
+    ("OFL-PTSans.txt", "ofl/ptsans/OFL.txt"),
+    ("OFL-Oswald.txt", "ofl/oswald/OFL.txt"),
+)
+FONT_SOURCE = "https://github.com/google/fonts/raw/main/"
+GOOGLE_FONTS_URL = (
+    "https://fonts.googleapis.com/css2?family=PT+Sans:ital,wght@0,400;0,700;1,400"
+    "&family=Oswald:ital,wght@1,600;1,700&display=swap"
+)
+
+
+def fonts_local() -> bool:
+    """True, wenn alle Schriftdateien in static/fonts/ liegen."""
+    return all((FONT_DIR / f[3]).exists() for f in FONTS)
+
+
+def font_faces(base_url: Optional[str]) -> str:
+    """
+    @font-face-Regeln für die lokalen Schriftdateien. Fehlen sie oder
+    werden sie nicht ausgeliefert (`base_url` None): Google-Fonts-Import.
+    """
+    if base_url is None or not fonts_local():
+        return f'@import url("{GOOGLE_FONTS_URL}");'
+    return "\n".join(
+        f'@font-face{{font-family:"{family}";font-style:{style};font-weight:{weight};'
+        f'font-display:swap;src:url("{base_url}/{filename}") format("truetype");}}'
+        for family, style, weight, filename, _ in FONTS
+    )
+
+
+def fetch_fonts() -> None:
+    """Lädt die Schriften (und Lizenzen) einmalig nach static/fonts/."""
+    FONT_DIR.mkdir(parents=True, exist_ok=True)
+    targets = [(f[3], f[4]) for f in FONTS] + list(FONT_LICENSES)
+    for filename, source in targets:
+        path = FONT_DIR / filename
+        if path.exists():
+            continue
+        with urllib.request.urlopen(FONT_SOURCE + source, timeout=30) as resp:
+            path.write_bytes(resp.read())
+        print(f"{path} ({path.stat().st_size // 1024} kB)")
+
+
+# ------------------------------------------------------------
+# Stylesheet
+# ------------------------------------------------------------
+
+# Dunkelgrüner Hintergrund, hellgrüne Schrift, Titelblock hellgrün mit
+# dunkelgrüner Überschrift, größere Emoji-Icons
+_CSS = Template("""
+/* App-Hintergrund */
+.stApp { background: $dark; }
+
+/* Standard-Textfarbe (Absätze, Hinweise, Labels etc.) */
+html, body, [class*="css"] { font-family: "PT Sans", Arial, sans-serif; color: $light !important; }
+
+/* Streamlit Markdown/Text */
+.stMarkdown, .stMarkdown p, .stMarkdown li { color: $light !important; }
+
+/* Captions / Help-Text */
+.stCaption, small { color: $light !important; opacity: 0.9; }
+
+/* Expander Header */
+div[data-testid="stExpander"] > details > summary { color: $light !important; }
+
+/* Inputs/Selectbox Labels */
+label, .stTextInput label, .stSelectbox label, .stMultiSelect label { color: $light !important; }
+
+/* Karten/Container (leicht transparent, damit es "modern" wirkt) */
+.survey-card {
+    background: rgba(255, 255, 255, 0.06);
+    border-radius: 16px;
+    padding: 1.2rem 1.4rem;
+    border: 1px solid rgba(138, 189, 36, 0.35);
+    box-shadow: 0 6px 18px rgba(0,0,0,0.18);
+}
+
+/* Titel-Block: hellgrün, Text dunkelgrün */
+.title-block {
+    background: $light;
+    border-radius: 18px;
+    padding: 1.1rem 1.3rem;
+    border: 1px solid rgba(0,0,0,0.08);
+    box-shadow: 0 8px 20px rgba(0,0,0,0.18);
+    margin-bottom: 1rem;
+}
+.title-block h1 {
+    margin: 0;
+    padding: 0;
+    font-size: 2.25rem;
+    line-height: 1.1;
+    color: $dark !important;
+    /*GrueneType fallback*/
+    font-family: "Oswald", "Arial Narrow", Arial, sans-serif;
+    font-style: italic;
+    font-weight: 700;
+    letter-spacing: 0.02em;
+}
+.title-block h2 {
+    margin: 0.35rem 0 0 0;
+    padding: 0;
+    font-size: 1.1rem;
+    line-height: 1.2;
+    color: $dark !important;
+    font-weight: 600;
+    opacity: 0.95;
+}
+
+/* Trennlinie */
+hr { border: none; border-top: 1px solid rgba(138, 189, 36, 0.35); margin: 1.0rem 0; }
+
+/* Buttons */
+button[kind="primary"] {
+    background-color: $light !important;
+    color: $dark !important;
+    border: 1px solid rgba(0,0,0,0.08) !important;
+    font-weight: 700 !important;
+}
+
+/* Emoji-Übersicht (größer) */
+.avatar-box { display: flex; flex-wrap: wrap; gap: 0.75rem; margin: 0.6rem 0 0.2rem 0; }
+
+/* Größere Icons */
+.avatar-pill {
+    font-size: 2.35rem;
+    line-height: 1;
+    border-radius: 999px;
+    padding: 0.35rem 0.85rem;
+    border: 1px solid rgba(138, 189, 36, 0.55);
+    cursor: default;
+    user-select: none;
+}
+.avatar-pill.used { opacity: 0.30; }
+.avatar-pill.free { background: rgba(138, 189, 36, 0.14); }
+/* Avatar-Übersicht: alle Kacheln einer Seite in EINEM Element */
+.avatar-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(84px, 1fr));
+    gap: 0.6rem;
+    margin: 0.8rem 0;
+}
+
+.avatar-tile {
+    font-size: 2.4rem;
+    line-height: 1;
+    text-align: center;
+    padding: 0.5rem 0.2rem;
+    border-radius: 16px;
+    border: 2px solid transparent;
+    background: rgba(138, 189, 36, 0.14);
+}
+.avatar-tile .avatar-name { font-size: 0.75rem; margin-top: 0.3rem; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
+.avatar-tile.used { opacity: 0.25; }
+.avatar-tile.selected {
+    border-color: $light;
+    box-shadow: 0 0 0 3px rgba(138, 189, 36, 0.35);
+    background: rgba(138, 189, 36, 0.25);
+}
+
+/* Avatar-Kachel (Emoji + Name) */
+.avatar-card {
+    display: flex;
+    align-items: center;
+    gap: 0.7rem;
+    padding: 0.75rem 0.9rem;
+    border-radius: 16px;
+    border: none;
+    background: rgba(138, 189, 36, 0.12);
+}
+.avatar-card.used { opacity: 0.30; }
+.avatar-card.selected { box-shadow: 0 0 0 3px rgba(138, 189, 36, 0.35); background: rgba(138, 189, 36, 0.22); }
+.avatar-emoji { font-size: 2.6rem; line-height: 1; }
+.avatar-name { font-size: 1.05rem; font-weight: 700; color: $light; }
+
+/* Fußnote */
+.footnote { font-size: 0.85rem; color: $light !important; opacity: 0.9; margin-top: 0.8rem; }
+""")
+
+
+def build_css(font_base_url: Optional[str]) -> str:
+    """Komplettes Stylesheet; Schrift-URLs relativ zu `font_base_url` (None: Google Fonts)."""
+    return font_faces(font_base_url) + "\n" + _CSS.substitute(dark=DARK_GREEN, light=LIGHT_GREEN)
+
+
+def static_css_served() -> bool:
+    """
+    True, wenn Streamlit den static-Ordner ausliefert UND .css dabei als
+    text/css schickt. Der ältere Tornado-Server liefert nur Bilder,
+    Schriften, PDF/JSON/XML mit echtem Typ, alles andere als text/plain –
+    das würde der Browser als Stylesheet verwerfen.
+    """
+    from streamlit import config
+
+    if not config.get_option("server.enableStaticServing"):
+        return False
+    try:
+        from streamlit.web.server.app_static_file_handler import SAFE_APP_STATIC_FILE_EXTENSIONS
+    except ImportError:
+        return True   # Starlette-Server: Content-Type nach Dateiendung
+    try:
+        if config.get_option("server.useStarlette"):
+            return True
+    except Exception:
+        pass
+    return ".css" in SAFE_APP_STATIC_FILE_EXTENSIONS
+
+
+@functools.lru_cache(maxsize=None)
+def _stylesheet_url() -> str:
+    """Schreibt static/umfrage-<hash>.css (falls noch nicht da) und liefert die URL."""
+    css = build_css("fonts")   # relativ zur CSS-Datei: static/fonts/
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+    name = f"umfrage-{digest}.css"
+    path = STATIC_DIR / name
+    if not path.exists():
+        STATIC_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(css, encoding="utf-8")
+        tmp.replace(path)
+        for old in STATIC_DIR.glob("umfrage-*.css"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return f"{STATIC_URL}/{name}"
+
+
+@functools.lru_cache(maxsize=None)
+def _inline_css(fonts_served: bool) -> str:
+    return "<style>" + build_css(f"{STATIC_URL}/fonts" if fonts_served else None) + "</style>"
+
+
+def css_markup() -> str:
+    """
+    HTML für st.markdown(..., unsafe_allow_html=True): ein kurzer Verweis
+    auf das gecachte Stylesheet – oder, wenn der Server es nicht korrekt
+    ausliefern kann, das (einmal erzeugte) CSS direkt.
+    """
+    from streamlit import config
+
+    if static_css_served():
+        return f'<style>@import url("{_stylesheet_url()}");</style>'
+    return _inline_css(bool(config.get_option("server.enableStaticServing")))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["fetch-fonts"]:
+        fetch_fonts()
+    else:
+        print("Aufruf: python assets.py fetch-fonts")
+        sys.exit(2)
@@ -0,0 +1,187 @@
+"""
+Avatar-Raum: alle wählbaren Avatare als durchnummerierte Plätze
+(Tier × Zusatz) und deren Belegung als kompaktes Bitset mit Frei-Liste.
+
+WICHTIG:
+- Die ersten Plätze sind die reinen Tier-Emojis (wie bisher), danach
+  folgen Tier + Farbe (🦉 🟩) und Tier + Nummer (🦉 12). Die Größe ist
+  frei einstellbar (st.secrets AVATAR_SPACE_SIZE).
+- "Ist frei?" und "zufälligen freien Platz wählen" kosten O(1), egal wie
+  groß der Raum ist.
+"""
+
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# ------------------------------------------------------------
+# Definition der Avatar-Emojis
+# ------------------------------------------------------------
+ANIMALS: Tuple[Tuple[str, str], ...] = (
+    ("🦇", "Fledermaus"),
+    ("🦉", "Eule"),
+    ("🦅", "Adler"),
+    ("🦆", "Ente"),
+    ("🦢", "Schwan"),
+    ("🦜", "Papagei"),
+    ("🦚", "Pfau"),
+    ("🦩", "Flamingo"),
+    ("🕊️", "Taube"),
+    ("🦤", "Dodo"),
+    ("🦝", "Waschbär"),
+    ("🦨", "Stinktier"),
+    ("🦡", "Dachs"),
+    ("🦫", "Biber"),
+    ("🦦", "Otter"),
+    ("🦥", "Faultier"),
+    ("🦘", "Känguru"),
+    ("🦙", "Lama"),
+    ("🦒", "Giraffe"),
+    ("🦬", "Bison"),
+    ("🦏", "Nashorn"),
+    ("🦛", "Nilpferd"),
+    ("🐆", "Leopard"),
+    ("🐅", "Tiger"),
+    ("🐊", "Krokodil"),
+    ("🦈", "Hai"),
+    ("🐋", "Wal"),
+    ("🐬", "Delfin"),
+    ("🦭", "Robbe"),
+    ("🦎", "Eidechse"),
+    ("🐢", "Schildkröte"),
+    ("🦕", "Sauropode"),
+    ("🦖", "T-Rex"),
+    ("🦟", "Mücke"),
+    ("🕷️", "Spinne"),
+    ("🦂", "Skorpion"),
+    ("🐙", "Oktopus"),
+    ("🦑", "Kalmar"),
+    ("🪼", "Qualle"),
+)
+
+COLORS: Tuple[Tuple[str, str], ...] = (
+    ("🟩", "grün"),
+    ("🟦", "blau"),
+    ("🟨", "gelb"),
+    ("🟥", "rot"),
+    ("🟪", "lila"),
+    ("🟧", "orange"),
+    ("🟫", "braun"),
+    ("⬛", "schwarz"),
+    ("⬜", "weiß"),
+)
+
+
+class AvatarSpace:
+    """
+    Bildet Platznummern 0 … size-1 auf Avatar-Kennungen ab und zurück.
+
+    Platz i = Tier (i % Anzahl Tiere) mit Zusatz (i // Anzahl Tiere):
+    Zusatz 0 ist leer, dann die Farben, dann Nummern ab 2.
+    """
+
+    def __init__(self, size: Optional[int] = None, animals: Sequence[Tuple[str, str]] = ANIMALS) -> None:
+        self.animals = tuple(animals)
+        self.size = len(self.animals) if size is None else int(size)
+        if self.size < 1:
+            raise ValueError("Der Avatar-Raum braucht mindestens einen Platz")
+
+        n_suffixes = -(-self.size // len(self.animals))
+        suffixes: List[Tuple[str, str]] = [("", "")]
+        suffixes += list(COLORS[: n_suffixes - 1])
+        number = 2
+        while len(suffixes) < n_suffixes:
+            suffixes.append((str(number), str(number)))
+            number += 1
+        self._suffixes = suffixes
+
+        self._index: Dict[str, int] = {self.avatar(i): i for i in range(self.size)}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def avatar(self, index: int) -> str:
+        """Kennung, wie sie reserviert und verschickt wird, z. B. "🦉" oder "🦉 🟩"."""
+        emoji, _ = self.animals[index % len(self.animals)]
+        suffix, _ = self._suffixes[index // len(self.animals)]
+        return f"{emoji} {suffix}" if suffix else emoji
+
+    def name(self, index: int) -> str:
+        _, animal = self.animals[index % len(self.animals)]
+        _, suffix = self._suffixes[index // len(self.animals)]
+        return f"{animal} {suffix}" if suffix else animal
+
+    def index(self, avatar: str) -> Optional[int]:
+        """Platznummer einer Kennung (None, wenn sie nicht zum Raum gehört)."""
+        return self._index.get(avatar)
+
+
+class Occupancy:
+    """
+    Belegung als Bitset plus dichte Frei-Liste mit Positionsindex.
+
+    - is_free(i):        ein Bit-Test
+    - mark_used/free(i): Bit setzen und Frei-Liste per Swap-Remove pflegen
+    - random_free():     zufälliger Eintrag der Frei-Liste
+    Alles O(1); Speicherbedarf ~8 Byte pro Platz.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._bits = bytearray((size + 7) // 8)
+        self._free = array("l", range(size))        # freie Plätze, ungeordnet
+        self._pos = array("l", range(size))         # Platz -> Position in _free (nur wenn frei)
+
+    @property
+    def free_count(self) -> int:
+        return len(self._free)
+
+    @property
+    def used_count(self) -> int:
+        return self.size - len(self._free)
+
+    def is_free(self, index: int) -> bool:
+        return not self._bits[index >> 3] & (1 << (index & 7))
+
+    def mark_used(self, index: int) -> bool:
+        """Gibt False zurück, wenn der Platz schon belegt war."""
+        if not self.is_free(index):
+            return False
+        self._bits[index >> 3] |= 1 << (index & 7)
+        pos = self._pos[index]
+        last = self._free.pop()
+        if last != index:
+            self._free[pos] = last
+            self._pos[last] = pos
+        return True
+
+    def mark_free(self, index: int) -> bool:
+        """Gibt False zurück, wenn der Platz schon frei war."""
+        if self.is_free(index):
+            return False
+        self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        self._pos[index] = len(self._free)
+        self._free.append(index)
+        return True
+
+    def random_free(self, rng: Optional[random.Random] = None) -> Optional[int]:
+        if not self._free:
+            return None
+        return self._free[(rng or random).randrange(len(self._free))]
+
+    def changed(self, other: "Occupancy") -> List[int]:
+        """Plätze, deren Belegung sich gegenüber `other` unterscheidet (byteweiser Vergleich)."""
+        out = []
+        for byte, (a, b) in enumerate(zip(self._bits, other._bits)):
+            if a != b:
+                diff = a ^ b
+                out.extend(byte * 8 + bit for bit in range(8) if diff & (1 << bit))
+        return out
+
+    @classmethod
+    def from_used(cls, size: int, used: Iterable[int]) -> "Occupancy":
+        occ = cls(size)
+        for index in used:
+            occ.mark_used(index)
+        return occ
@@ -0,0 +1,424 @@
+"""
+Avatar-Belegung: atomare Reservierungen in einer SQLite-Datei (WAL-Modus)
+und ein prozessweiter Zwischenspeicher der Belegung (Bitset, avatar_space.py).
+
+WICHTIG:
+- Hier werden nur Emojis und eine zufällige Session-Kennung gespeichert,
+  KEINE Antworten und keine personenbezogenen Daten.
+- Eine Reservierung ist genau EIN SQL-Statement: entweder sie gelingt oder
+  der Avatar gehört bereits einer anderen Session. Es wird nie die gesamte
+  Liste neu geschrieben.
+- Reservierungen aus der Auswahl sind Leases mit Ablaufzeit: offene Tabs
+  verlängern sie per Heartbeat, ein Hintergrund-Thread räumt abgelaufene
+  gesammelt ab. Mit dem Absenden wird der Avatar dauerhaft belegt
+  (expires_at = NULL, ebenso der Altbestand).
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from avatar_space import AvatarSpace, Occupancy
+
+
+# Listener für Belegungsänderungen: (Avatar oder None für "alles neu", belegt, auslösende Session)
+OccupancyListener = Callable[[Optional[str], bool, Optional[str]], None]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    emoji       TEXT PRIMARY KEY,
+    session_id  TEXT NOT NULL,
+    reserved_at REAL NOT NULL,
+    expires_at  REAL                -- NULL: dauerhaft belegt
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS reservations_expiry
+    ON reservations (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS reservations_session
+    ON reservations (session_id);
+"""
+
+
+class ReservationStore:
+    """
+    Reservierungen von Avatar-Emojis mit Compare-and-Set-Semantik.
+
+    Mehrere Prozesse dürfen dieselbe Datei gleichzeitig verwenden; SQLite
+    übernimmt das Sperren. Innerhalb eines Prozesses teilen sich alle
+    Sessions eine Verbindung (geschützt durch ein Lock).
+    """
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._local_writes = 0
+        self._conn = sqlite3.connect(
+            str(self.path),
+            timeout=30.0,
+            isolation_level=None,       # Autocommit: jedes Statement ist eine Transaktion
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(reservations)")}
+        if "expires_at" not in columns:   # Datei aus der Zeit vor den Leases
+            self._conn.execute("ALTER TABLE reservations ADD COLUMN expires_at REAL")
+        self._conn.executescript(_INDEXES)
+        if legacy_json is not None:
+            self._import_legacy_json(Path(legacy_json))
+
+    def reserve(self, emoji: str, session_id: str, ttl: Optional[float] = None) -> bool:
+        """
+        Reserviert `emoji` für `session_id` – mit `ttl` als Lease, die nach
+        so vielen Sekunden ohne Heartbeat abläuft, sonst dauerhaft.
+
+        Gibt True zurück, wenn der Avatar frei war, bereits dieser Session
+        gehört oder die Lease einer anderen Session abgelaufen ist, sonst
+        False. Eine dauerhafte Belegung wird dabei nie wieder zur Lease.
+        """
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                """
+                INSERT INTO reservations (emoji, session_id, reserved_at, expires_at)
+                VALUES (:emoji, :session, :now, :expires)
+                ON CONFLICT (emoji) DO UPDATE SET
+                    session_id  = excluded.session_id,
+                    reserved_at = excluded.reserved_at,
+                    expires_at  = CASE
+                        WHEN reservations.session_id = excluded.session_id
+                             AND reservations.expires_at IS NULL THEN NULL
+                        ELSE excluded.expires_at END
+                WHERE reservations.session_id = excluded.session_id
+                   OR reservations.expires_at < :now
+                """,
+                {"emoji": emoji, "session": session_id, "now": now,
+                 "expires": None if ttl is None else now + ttl},
+            )
+            if cur.rowcount:
+                self._local_writes += 1
+            return cur.rowcount == 1
+
+    def release(self, emoji: str, session_id: str) -> bool:
+        """
+        Gibt einen Avatar frei – aber nur, wenn er dieser Session gehört
+        und noch eine Lease ist (abgeschickte Avatare bleiben belegt).
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM reservations WHERE emoji = ? AND session_id = ? AND expires_at IS NOT NULL",
+                (emoji, session_id),
+            )
+            if cur.rowcount:
+                self._local_writes += 1
+            return cur.rowcount == 1
+
+    def make_permanent(self, emoji: str, session_id: str) -> bool:
+        """Aus der Lease wird eine dauerhafte Belegung (nach dem Absenden)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE reservations SET expires_at = NULL WHERE emoji = ? AND session_id = ?",
+                (emoji, session_id),
+            )
+            return cur.rowcount == 1
+
+    def extend_leases(self, session_ids: Iterable[str], ttl: float) -> int:
+        """
+        Heartbeat für viele Sessions in EINER Transaktion. Ändert nur
+        Ablaufzeiten, nicht die Belegung (zählt daher nicht als Schreibvorgang
+        für change_counters).
+        """
+        expires = time.time() + ttl
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.executemany(
+                    "UPDATE reservations SET expires_at = ? WHERE session_id = ? AND expires_at IS NOT NULL",
+                    [(expires, sid) for sid in session_ids],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cur.rowcount
+
+    def reap_expired(self, now: Optional[float] = None) -> List[str]:
+        """Löscht alle abgelaufenen Leases in einem Statement und liefert deren Emojis."""
+        with self._lock:
+            rows = self._conn.execute(
+                "DELETE FROM reservations WHERE expires_at < ? RETURNING emoji",
+                (time.time() if now is None else now,),
+            ).fetchall()
+            if rows:
+                self._local_writes += 1
+        return [r[0] for r in rows]
+
+    def owner(self, emoji: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id FROM reservations WHERE emoji = ?", (emoji,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def used(self) -> FrozenSet[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT emoji FROM reservations").fetchall()
+        return frozenset(r[0] for r in rows)
+
+    @property
+    def local_writes(self) -> int:
+        return self._local_writes
+
+    def change_counters(self) -> Tuple[int, int]:
+        """
+        Günstige Änderungszähler: PRAGMA data_version erhöht sich bei
+        Commits anderer Verbindungen, eigene Schreibvorgänge zählen wir selbst.
+        """
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._local_writes
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _import_legacy_json(self, legacy_json: Path) -> None:
+        """
+        Übernimmt einmalig Einträge aus der alten used_avatars.json. Dass die
+        Übernahme erfolgt ist, steht in der Tabelle `meta` – später
+        freigegebene Avatare kommen bei einem Neustart also nicht zurück.
+        """
+        try:
+            with legacy_json.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, list):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone()
+                if done is None:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO reservations (emoji, session_id, reserved_at)"
+                        " VALUES (?, 'legacy', ?)",
+                        [(str(x), now) for x in data],
+                    )
+                    self._conn.execute(
+                        "INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(legacy_json),)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class AvatarRegistry:
+    """
+    Hält die Belegung des Avatar-Raums als Bitset im Speicher (eine Instanz
+    pro Server-Prozess). Eigene Reservierungen und abgeräumte Leases werden
+    direkt eingetragen; nur wenn ein anderer Prozess die Datei geändert hat,
+    wird neu geladen. Die Zahl freier Plätze ist damit immer ohne Scan da.
+
+    Leases: `heartbeat()` merkt sich nur die Session; der Reaper-Thread
+    verlängert alle gemerkten Leases gesammelt und löscht danach die
+    abgelaufenen in einem Statement.
+
+    Listener (`add_listener`) erfahren jede tatsächliche Änderung der
+    Belegung; sie laufen unter dem Lock und dürfen die Registry nicht
+    selbst aufrufen.
+    """
+
+    def __init__(self, store: ReservationStore, space: AvatarSpace, lease_seconds: float = 600.0) -> None:
+        self.store = store
+        self.space = space
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._touched: Dict[str, None] = {}
+        self._touch_lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._seen: Optional[Tuple[int, int]] = None
+        self._occupancy = Occupancy(space.size)
+        self._outside: FrozenSet[str] = frozenset()   # belegt, aber nicht (mehr) im Raum
+        self._version = 0
+        self._listeners: List[OccupancyListener] = []
+
+    def add_listener(self, listener: OccupancyListener) -> None:
+        self._listeners.append(listener)
+
+    def refresh(self) -> None:
+        """Neu lesen, falls ein anderer Prozess den Store geändert hat."""
+        self._revalidate()
+
+    @property
+    def version(self) -> int:
+        """Zähler, der sich bei jeder Änderung der Belegung erhöht."""
+        self._revalidate()
+        return self._version
+
+    @property
+    def free_count(self) -> int:
+        self._revalidate()
+        return self._occupancy.free_count
+
+    def is_used(self, avatar: str) -> bool:
+        self._revalidate()
+        index = self.space.index(avatar)
+        if index is None:
+            return avatar in self._outside
+        return not self._occupancy.is_free(index)
+
+    def reserve(self, avatar: str, session_id: str) -> bool:
+        """Wie ReservationStore.reserve, trägt das Ergebnis aber sofort ein."""
+        self._revalidate()
+        with self._lock:
+            ok = self.store.reserve(avatar, session_id, ttl=self.lease_seconds)
+            self._apply(avatar, used=True, origin=session_id if ok else None)
+            return ok
+
+    def release(self, avatar: str, session_id: str) -> bool:
+        self._revalidate()
+        with self._lock:
+            ok = self.store.release(avatar, session_id)
+            if ok:
+                self._apply(avatar, used=False, origin=session_id)
+            return ok
+
+    def reserve_random(self, session_id: str, rng: Optional[random.Random] = None) -> Optional[str]:
+        """
+        Reserviert einen zufälligen freien Avatar (O(1) pro Versuch). War
+        ein anderer Prozess schneller, wird der Platz als belegt markiert
+        und ein neuer gezogen. None, wenn alles belegt ist.
+        """
+        while True:
+            self._revalidate()
+            with self._lock:
+                index = self._occupancy.random_free(rng)
+                if index is None:
+                    return None
+                avatar = self.space.avatar(index)
+                ok = self.store.reserve(avatar, session_id, ttl=self.lease_seconds)
+                self._apply(avatar, used=True, origin=session_id if ok else None)
+                if ok:
+                    return avatar
+
+    # --------------------------------------------------------
+    # Leases
+    # --------------------------------------------------------
+
+    def heartbeat(self, session_id: str) -> None:
+        """Session ist noch aktiv – wird beim nächsten Reaper-Lauf verlängert."""
+        with self._touch_lock:
+            self._touched[session_id] = None
+
+    def holds(self, avatar: str, session_id: str) -> bool:
+        """Gehört `avatar` (noch) dieser Session? Punktabfrage per Primärschlüssel."""
+        return self.store.owner(avatar) == session_id
+
+    def make_permanent(self, avatar: str, session_id: str) -> bool:
+        return self.store.make_permanent(avatar, session_id)
+
+    def reap_once(self) -> int:
+        """Heartbeats schreiben, dann abgelaufene Leases abräumen. Gibt die Zahl freigewordener Plätze zurück."""
+        with self._touch_lock:
+            touched, self._touched = list(self._touched), {}
+        if touched:
+            self.store.extend_leases(touched, self.lease_seconds)
+
+        self._revalidate()
+        with self._lock:
+            freed = self.store.reap_expired()
+            for avatar in freed:
+                self._apply(avatar, used=False)
+        return len(freed)
+
+    def start_reaper(self, interval: float) -> None:
+        if self._reaper is not None:
+            return
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.reap_once()
+                except Exception:
+                    pass   # z. B. Datei kurz gesperrt: nächster Lauf versucht es wieder
+
+        self._reaper = threading.Thread(target=run, name="avatar-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self) -> None:
+        self._stop.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+    # --------------------------------------------------------
+    # Abgleich
+    # --------------------------------------------------------
+
+    def _apply(self, avatar: str, used: bool, origin: Optional[str] = None) -> None:
+        """Eigene Änderung eintragen (Lock wird gehalten)."""
+        index = self.space.index(avatar)
+        if index is None:
+            changed = (avatar in self._outside) != used
+            self._outside = self._outside | {avatar} if used else self._outside - {avatar}
+        elif used:
+            changed = self._occupancy.mark_used(index)
+        else:
+            changed = self._occupancy.mark_free(index)
+        if changed:
+            self._version += 1
+            self._notify(avatar, used, origin)
+        if self._seen is not None:
+            self._seen = (self._seen[0], self.store.local_writes)
+
+    def _revalidate(self) -> None:
+        counters = self.store.change_counters()
+        if counters == self._seen:
+            return
+        with self._lock:
+            counters = self.store.change_counters()
+            if counters == self._seen:
+                return
+            used = self.store.used()
+            indices = [self.space.index(a) for a in used]
+            previous, previous_outside = self._occupancy, self._outside
+            self._occupancy = Occupancy.from_used(self.space.size, (i for i in indices if i is not None))
+            self._outside = frozenset(a for a, i in zip(used, indices) if i is None)
+            self._version += 1
+            first = self._seen is None
+            self._seen = counters
+            if self._listeners and not first:
+                self._notify_reload(previous, previous_outside)
+
+    def _notify(self, avatar: Optional[str], used: bool, origin: Optional[str] = None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(avatar, used, origin)
+            except Exception:
+                pass   # eine fehlerhafte Benachrichtigung darf die Reservierung nicht stören
+
+    def _notify_reload(self, previous: Occupancy, previous_outside: FrozenSet[str]) -> None:
+        """Nach dem Neuladen nur die tatsächlich geänderten Avatare melden."""
+        changed = previous.changed(self._occupancy)
+        if len(changed) > 64:
+            self._notify(None, True)
+            return
+        for index in changed:
+            self._notify(self.space.avatar(index), not self._occupancy.is_free(index))
+        for avatar in previous_outside ^ self._outside:
+            self._notify(avatar, avatar in self._outside)
@@ -0,0 +1,117 @@
+"""
+Durchsatz der Sammeleingabe (ingest.py): startet die App mit INGEST_PORT,
+schickt Stapel zufälliger Abgaben per HTTP und misst Datensätze pro
+Sekunde – inklusive Prüfung, Journal (fsync), Auszählung und Postausgang.
+
+Aufruf:
+    python benchmarks/bench_ingest.py [--records 20000] [--batch 1000]
+                                      [--invalid 0.01] [--journal]
+
+Ein Anteil `--invalid` der Datensätze ist absichtlich fehlerhaft (zu viele
+Antworten); sie müssen einzeln als Fehler zurückkommen.
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from headless_client import HeadlessSession, free_port, start_server  # noqa: E402
+from smtp_sink import SmtpSink  # noqa: E402
+from survey_schema import Survey, SurveyCatalog  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def make_record(survey: Survey, rng: random.Random, invalid: bool) -> Dict[str, Any]:
+    masks = {}
+    for q in survey.questions:
+        limit = q.max_choices or len(q.options)
+        n = len(q.options) if invalid and q.max_choices is not None else rng.randint(0, limit)
+        masks[q.key] = sum(1 << i for i in rng.sample(range(len(q.options)), n))
+    return {
+        "survey_id": survey.survey_id,
+        "survey_version": survey.version,
+        "codebook": survey.codebook,
+        "avatar": None,
+        "masks": {k: v for k, v in masks.items() if v},
+        "other": {survey.questions[0].key: "Papierbogen"} if rng.random() < 0.2 else {},
+    }
+
+
+def post(url: str, records: List[Dict[str, Any]], key: str) -> Dict[str, Any]:
+    req = urllib.request.Request(
+        url, data=json.dumps(records).encode("utf-8"), method="POST",
+        headers={"Content-Type": "application/json", "Idempotency-Key": key},
+    )
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        return json.loads(resp.read())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", type=Path, default=ROOT / "umfrage_gruene.py")
+    parser.add_argument("--survey", default="ortsverband")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--invalid", type=float, default=0.01, help="Anteil fehlerhafter Datensätze")
+    parser.add_argument("--journal", action="store_true", help="mit Ergebnis-Journal (fsync pro Stapel)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    survey = SurveyCatalog.load().get(args.survey)
+    rng = random.Random(args.seed)
+    records = [make_record(survey, rng, rng.random() < args.invalid) for _ in range(args.records)]
+    batches = [records[i:i + args.batch] for i in range(0, len(records), args.batch)]
+
+    sink = SmtpSink()
+    workdir = Path(tempfile.mkdtemp(prefix="bench-ingest-"))
+    ingest_port = free_port()
+    (workdir / ".streamlit").mkdir()
+    (workdir / ".streamlit" / "secrets.toml").write_text(
+        f'SMTP_HOST = "127.0.0.1"\nSMTP_PORT = {sink.port}\nSMTP_USER = "bench"\nSMTP_PASS = ""\n'
+        f'SMTP_SSL = false\nMAIL_TO = "bench@example.invalid"\n'
+        f"INGEST_PORT = {ingest_port}\nRESULTS_JOURNAL = {'true' if args.journal else 'false'}\n",
+        encoding="utf-8",
+    )
+    port = free_port()
+    server = start_server(args.app.resolve(), port, workdir)
+    try:
+        # Die erste Session startet den Ingest-Server
+        HeadlessSession(f"ws://127.0.0.1:{port}/_stcore/stream").load()
+        url = f"http://127.0.0.1:{ingest_port}/ingest"
+
+        accepted = rejected = 0
+        t0 = time.perf_counter()
+        for i, batch in enumerate(batches):
+            result = post(url, batch, key=f"bench-{i}")
+            accepted += result["accepted"]
+            rejected += result["rejected"]
+        wall = time.perf_counter() - t0
+        repeat = post(url, batches[0], key="bench-0")
+
+        sink.wait_for(len(batches), timeout=60)
+        print(f"{args.records} Datensätze in {len(batches)} Stapeln à {args.batch}"
+              f"{' (mit Journal)' if args.journal else ''}")
+        print(f"angenommen {accepted}, abgelehnt {rejected}, "
+              f"Wiederholung erkannt: {repeat['duplicate']}")
+        print(f"Durchsatz: {args.records / wall:,.0f} Datensätze/s ({wall:.2f} s)")
+        print(f"E-Mails angekommen: {sink.count()} / {len(batches)}")
+    finally:
+        server.terminate()
+        server.wait(10)
+        sink.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Lasttest: viele gleichzeitige Teilnehmende gegen EINE Instanz der App.
+
+Jede simulierte Person öffnet die Seite, stimmt dem Versand zu, wählt einen
+freien Avatar, hakt pro Frage zufällige Optionen an (höchstens max_choices)
+und schickt ab – an einen lokalen SMTP-Ersatz (benchmarks/smtp_sink.py).
+Mit --answer-mode component (Standard) gehen alle Antworten in einer
+Nachricht an die Browser-Komponente, mit server wie früher jede Checkbox
+einzeln.
+
+Aufruf:
+    python benchmarks/bench_load.py [--participants 30] [--concurrency 10]
+                                    [--answer-mode component|server]
+                                    [--out benchmarks/results/load.json]
+                                    [--compare benchmarks/results/baseline.json]
+
+Ausgabe: p50/p95/p99 pro Interaktion, Durchsatz, Zustellzeit der E-Mails,
+Server-Aufrufe und CPU-Zeit des Servers pro Abgabe sowie Speicher pro
+Session (CPU und RSS nur Linux). Die Ergebnisse landen als
+JSON in benchmarks/results/; mit --compare wird gegen einen früheren Lauf
+verglichen und mit Exit-Code 1 beendet, wenn p95 einer Interaktion um mehr
+als --tolerance schlechter geworden ist.
+
+Hinweis: Es gibt nur so viele Teilnehmende mit Avatar wie Avatare; wer
+keinen freien mehr findet, wird als "ohne Avatar" gezählt und sendet nicht.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from headless_client import HeadlessSession, RunStats, free_port, start_server  # noqa: E402
+from smtp_sink import SmtpSink  # noqa: E402
+from survey_schema import SurveyCatalog  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+OPT_IN_LABEL = "Ich möchte meine Ergebnisse anonym per E-Mail an den Ortsverband senden."
+SEND_LABEL = "📨 Ergebnisse jetzt senden"
+INTERACTIONS = ("load", "opt_in", "pick_avatar", "checkbox", "answers", "submit")
+
+
+# ------------------------------------------------------------
+# Eine simulierte Person
+# ------------------------------------------------------------
+
+class Participant:
+    def __init__(self, url: str, survey, seed: int, answer_mode: str = "component") -> None:
+        self.url = url
+        self.survey = survey
+        self.answer_mode = answer_mode
+        self.rng = random.Random(seed)
+        self.timings: Dict[str, List[float]] = {name: [] for name in INTERACTIONS}
+        self.session: Optional[HeadlessSession] = None
+        self.sent = False
+        self.got_avatar = False
+
+    def _timed(self, name: str, stats: RunStats) -> None:
+        self.timings[name].append(stats.seconds)
+
+    def run(self) -> None:
+        session = self.session = HeadlessSession(self.url)
+        self._timed("load", session.load())
+        self._timed("opt_in", session.set_checkbox(session.find("checkbox", label=OPT_IN_LABEL), True))
+
+        # Avatar: zufällig unter den freien, bei verlorenem Wettlauf den nächsten
+        while True:
+            picker = session.find("selectbox", key="avatar_choice")
+            if not picker.options:
+                break
+            self._timed("pick_avatar", session.set_selectbox(picker, self.rng.choice(picker.options)))
+            if not session.find("button", label=SEND_LABEL).disabled:
+                self.got_avatar = True
+                break
+
+        masks = {}
+        for question in self.survey.questions:
+            limit = question.max_choices or len(question.options)
+            picks = self.rng.sample(range(len(question.options)), self.rng.randint(1, limit))
+            masks[question.key] = sum(1 << i for i in picks)
+            if self.answer_mode == "server":
+                for i in picks:
+                    key = question.option_keys[i]
+                    self._timed("checkbox", session.set_checkbox(session.find("checkbox", key=key), True))
+        if self.answer_mode == "component":
+            value = {"codebook": self.survey.codebook, "masks": masks, "other": {}}
+            self._timed("answers", session.set_component(session.find("component_instance", key="answer_form"), value))
+
+        if self.got_avatar:
+            self._timed("submit", session.click(session.find("button", label=SEND_LABEL)))
+            self.sent = True
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
+
+
+# ------------------------------------------------------------
+# Auswertung
+# ------------------------------------------------------------
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    ms = sorted(v * 1000 for v in values)
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 0.50), 2),
+        "p95_ms": round(percentile(ms, 0.95), 2),
+        "p99_ms": round(percentile(ms, 0.99), 2),
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+    }
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident Set Size eines Prozesses (Linux: /proc)."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """Verbrauchte CPU-Zeit (user + system) eines Prozesses (Linux: /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"Teilnehmende: {result['participants']} (gesendet {result['sent']}, "
+          f"ohne Avatar {result['without_avatar']}, Fehler {result['errors']})")
+    print(f"{'Interaktion':<14}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in result["latency"].items():
+        print(f"{name:<14}{s['count']:>6}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+    t = result["throughput"]
+    print(f"Durchsatz: {t['interactions_per_s']:.1f} Interaktionen/s, "
+          f"{t['submissions_per_s']:.2f} Abgaben/s, Laufzeit {t['wall_s']:.1f} s")
+    per = result["per_submission"]
+    if per["server_calls"] is not None:
+        cpu = f", Server-CPU {per['server_cpu_ms']:.0f} ms" if per["server_cpu_ms"] is not None else ""
+        print(f"Pro Abgabe: {per['server_calls']:.1f} Server-Aufrufe{cpu}")
+    print(f"E-Mails angekommen: {result['mail']['delivered']} / {result['sent']}, "
+          f"letzte nach {result['mail']['drain_s']:.2f} s")
+    mem = result["memory"]
+    if mem["per_session_bytes"] is not None:
+        print(f"Speicher: Basis {mem['baseline_bytes'] / 2**20:.1f} MiB, "
+              f"Spitze {mem['peak_bytes'] / 2**20:.1f} MiB, "
+              f"pro Session {mem['per_session_bytes'] / 2**10:.0f} KiB")
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Gibt False zurück, wenn p95 irgendeiner Interaktion schlechter als erlaubt ist."""
+    ok = True
+    print(f"\nVergleich mit {baseline.get('revision', '?')} vom {baseline.get('started_utc', '?')}:")
+    for param in ("participants", "concurrency", "survey", "answer_mode"):
+        if baseline.get(param) != result[param]:
+            print(f"  Achtung: {param} unterscheidet sich ({baseline.get(param)} -> {result[param]})")
+    for name, now in result["latency"].items():
+        before = baseline.get("latency", {}).get(name)
+        if not before or not before["p95_ms"] or not now["count"]:
+            continue
+        ratio = now["p95_ms"] / before["p95_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  <-- REGRESSION"
+            ok = False
+        print(f"  {name:<14} p95 {before['p95_ms']:8.1f} -> {now['p95_ms']:8.1f} ms ({ratio - 1:+.0%}){flag}")
+    return ok
+
+
+# ------------------------------------------------------------
+# Ablauf
+# ------------------------------------------------------------
+
+def write_secrets(workdir: Path, smtp_port: int, answer_mode: str = "component") -> None:
+    (workdir / ".streamlit").mkdir()
+    (workdir / ".streamlit" / "secrets.toml").write_text(
+        f'SMTP_HOST = "127.0.0.1"\n'
+        f"SMTP_PORT = {smtp_port}\n"
+        f'SMTP_USER = "bench"\n'
+        f'SMTP_PASS = ""\n'
+        f"SMTP_SSL = false\n"
+        f'MAIL_TO = "bench@example.invalid"\n'
+        f'ANSWER_MODE = "{answer_mode}"\n',
+        encoding="utf-8",
+    )
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    survey = SurveyCatalog.load().get(args.survey)
+    sink = SmtpSink()
+    workdir = Path(tempfile.mkdtemp(prefix="bench-load-"))
+    write_secrets(workdir, sink.port, args.answer_mode)
+    port = free_port()
+    server = start_server(args.app.resolve(), port, workdir)
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+
+    try:
+        # Aufwärmen: Imports und Caches sind danach im Server geladen
+        warmup = HeadlessSession(url)
+        warmup.load()
+        warmup.close()
+        time.sleep(0.5)
+        baseline_rss = rss_bytes(server.pid)
+
+        participants = [
+            Participant(url, survey, seed=args.seed + i, answer_mode=args.answer_mode)
+            for i in range(args.participants)
+        ]
+        errors: List[str] = []
+        peak_rss = baseline_rss
+        stop_sampling = threading.Event()
+
+        def sample_memory() -> None:
+            nonlocal peak_rss
+            while not stop_sampling.wait(0.2):
+                rss = rss_bytes(server.pid)
+                if rss is not None and (peak_rss is None or rss > peak_rss):
+                    peak_rss = rss
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+
+        def drive(p: Participant) -> None:
+            try:
+                p.run()
+            except Exception as e:   # eine Person scheitert, der Lauf geht weiter
+                errors.append(f"{type(e).__name__}: {e}")
+
+        cpu_before = cpu_seconds(server.pid)
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(drive, participants))
+        wall = time.perf_counter() - t0
+        cpu_after = cpu_seconds(server.pid)
+
+        # Alle Sessions sind noch offen -> Speicherstand mit voller Belegung
+        open_rss = rss_bytes(server.pid)
+        stop_sampling.set()
+        sampler.join()
+        if open_rss is not None and (peak_rss is None or open_rss > peak_rss):
+            peak_rss = open_rss
+
+        sent = sum(p.sent for p in participants)
+        sink.wait_for(sent, timeout=args.mail_timeout)
+        arrivals = sorted(sink.arrivals)
+        for p in participants:
+            p.close()
+
+        timings: Dict[str, List[float]] = {name: [] for name in INTERACTIONS}
+        for p in participants:
+            for name, values in p.timings.items():
+                timings[name].extend(values)
+        n_interactions = sum(len(v) for v in timings.values())
+        server_cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+
+        per_session = None
+        if baseline_rss is not None and open_rss is not None and participants:
+            per_session = max(0, open_rss - baseline_rss) // len(participants)
+
+        return {
+            "benchmark": "load",
+            "started_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "app": str(args.app),
+            "survey": f"{survey.survey_id} v{survey.version}",
+            "participants": args.participants,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "answer_mode": args.answer_mode,
+            "sent": sent,
+            "without_avatar": sum(not p.got_avatar for p in participants),
+            "errors": len(errors),
+            "error_samples": errors[:5],
+            "latency": {name: latency_summary(values) for name, values in timings.items()},
+            "throughput": {
+                "wall_s": round(wall, 3),
+                "interactions_per_s": round(n_interactions / wall, 2) if wall else 0.0,
+                "submissions_per_s": round(sent / wall, 3) if wall else 0.0,
+            },
+            "per_submission": {
+                "server_calls": round(n_interactions / sent, 2) if sent else None,
+                "server_cpu_ms": round(server_cpu * 1000 / sent, 1) if sent and server_cpu is not None else None,
+            },
+            "mail": {
+                "delivered": len(arrivals),
+                "drain_s": round(arrivals[-1] - t0, 3) if arrivals else 0.0,
+            },
+            "memory": {
+                "baseline_bytes": baseline_rss,
+                "peak_bytes": peak_rss,
+                "per_session_bytes": per_session,
+            },
+        }
+    finally:
+        server.terminate()
+        server.wait(10)
+        sink.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", type=Path, default=ROOT / "umfrage_gruene.py")
+    parser.add_argument("--survey", default="ortsverband")
+    parser.add_argument("--participants", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--answer-mode", choices=("component", "server"), default="component",
+                        help="Antworten über die Browser-Komponente oder je Checkbox")
+    parser.add_argument("--mail-timeout", type=float, default=60.0)
+    parser.add_argument("--out", type=Path, default=None,
+                        help="JSON-Datei (Standard: benchmarks/results/load-<zeit>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="früherer Lauf als JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="erlaubte Verschlechterung von p95 (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_report(result)
+
+    out = args.out or RESULTS_DIR / f"load-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nErgebnis gespeichert: {out}")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: Kaltstart der Auszählung (snapshots.py) – ganzes Journal
+nachlesen gegenüber neuestem Snapshot + Journal-Rest.
+
+Aufruf:
+    python benchmarks/bench_recovery.py [--sizes 1000 10000 100000] [--tail 500]
+
+Pro Größe wird ein Journal mit zufälligen Abgaben (ein Fünftel mit
+Freitext) angelegt, einmal verdichtet und danach um `--tail` Abgaben
+verlängert. Gemessen wird recover() ohne und mit Snapshot; beide Wege
+müssen dieselben Zählerstände liefern.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from journal import ResultsJournal  # noqa: E402
+from snapshots import SnapshotStore, compact, recover  # noqa: E402
+from survey_schema import Survey, SurveyCatalog  # noqa: E402
+
+WORDS = "mehr radwege klimaschutz vor ort jugend treffen online themen stammtisch solar bus bahn".split()
+
+
+def make_payload(survey: Survey, rng: random.Random, i: int) -> Dict[str, Any]:
+    masks = {}
+    for q in survey.questions:
+        limit = q.max_choices or len(q.options)
+        masks[q.key] = sum(1 << j for j in rng.sample(range(len(q.options)), rng.randint(1, limit)))
+    other = {}
+    if rng.random() < 0.2:
+        other[rng.choice(survey.questions).key] = " ".join(rng.choices(WORDS, k=rng.randint(2, 6)))
+    return {"timestamp_utc": f"2026-01-01T00:00:{i % 60:02d}+00:00", "survey_id": survey.survey_id,
+            "survey_version": survey.version, "avatar": None, **survey.compact(masks, other)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--survey", default="ortsverband")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--tail", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    catalog = SurveyCatalog.load()
+    survey = catalog.get(args.survey)
+    print(f"{'Abgaben':>9}{'voll s':>10}{'Snapshot s':>12}{'nachgelesen':>13}{'Snapshot KiB':>14}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = ResultsJournal(Path(tmp) / "journal")
+            store = SnapshotStore(Path(tmp) / "snapshots")
+            journal.append_many([make_payload(survey, rng, i) for i in range(size)])
+            compact(journal, store, catalog.expand_payload)
+            journal.append_many([make_payload(survey, rng, i) for i in range(args.tail)])
+
+            t0 = time.perf_counter()
+            full = recover(journal, None, catalog.expand_payload)
+            full_s = time.perf_counter() - t0
+            fast = recover(journal, store, catalog.expand_payload)
+
+            a, b = full.tallies.snapshot(), fast.tallies.snapshot()
+            assert (a.submissions, a.option_counts, a.co_occurrence) == (b.submissions, b.option_counts, b.co_occurrence)
+            assert full.freetext.summary(survey.questions[0].key).terms == fast.freetext.summary(survey.questions[0].key).terms
+            kib = store.paths()[-1].stat().st_size / 1024
+            print(f"{size + args.tail:>9}{full_s:>10.3f}{fast.seconds:>12.3f}{fast.replayed:>13}{kib:>14.0f}")
+            journal.close()
+
+
+if __name__ == "__main__":
+    main()
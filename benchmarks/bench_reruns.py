@@ -0,0 +1,143 @@
+"""
+Benchmark: Serverzeit pro Interaktion (Antworten, Avatar wählen)
+gegen einen echten, headless gestarteten Streamlit-Server.
+
+Aufruf:
+    python benchmarks/bench_reruns.py [--app umfrage_gruene.py] [--rounds 30]
+                                      [--answer-mode component|server]
+
+Gemessen wird vom Absenden der Interaktion bis zur Meldung "Skript fertig",
+dazu die Zahl der übertragenen Elemente und Bytes. Zum Vergleich vorher /
+nachher einfach mit `--app` auf eine ältere Kopie der App zeigen.
+
+Mit --answer-mode server (wie früher) wird je Checkbox gemessen, mit
+component (Standard der App) je Nachricht der Browser-Komponente. In beiden
+Modi füllt "Umfrage ausfüllen" zusätzlich den ganzen Fragebogen aus und
+meldet Server-Aufrufe und CPU-Zeit des Servers pro Umfrage (CPU nur Linux).
+"""
+
+import argparse
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_load import cpu_seconds  # noqa: E402
+from headless_client import HeadlessSession, free_port, start_server  # noqa: E402
+from survey_schema import SurveyCatalog  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def summarize(name: str, stats) -> None:
+    ms = sorted(s.seconds * 1000 for s in stats)
+    p95 = ms[int(0.95 * (len(ms) - 1))]
+    print(
+        f"{name:<22} median {statistics.median(ms):7.1f} ms   p95 {p95:7.1f} ms   "
+        f"Elemente {statistics.mean(s.elements for s in stats):6.1f}   "
+        f"Bytes {statistics.mean(s.bytes for s in stats):9.0f}"
+    )
+
+
+def write_secrets(workdir: Path, answer_mode: str) -> None:
+    (workdir / ".streamlit").mkdir()
+    (workdir / ".streamlit" / "secrets.toml").write_text(f'ANSWER_MODE = "{answer_mode}"\n', encoding="utf-8")
+
+
+def fill_survey(session: HeadlessSession, survey, answer_mode: str, rng: random.Random) -> int:
+    """
+    Beantwortet in einer frischen Session alle Fragen (zufällige Optionen,
+    höchstens max_choices). Rückgabe: Zahl der Server-Aufrufe.
+    """
+    masks = {}
+    calls = 0
+    for question in survey.questions:
+        limit = question.max_choices or len(question.options)
+        picks = rng.sample(range(len(question.options)), rng.randint(1, limit))
+        masks[question.key] = sum(1 << i for i in picks)
+        if answer_mode == "server":
+            for i in picks:
+                session.set_checkbox(session.find("checkbox", key=question.option_keys[i]), True)
+                calls += 1
+    if answer_mode == "component":
+        value = {"codebook": survey.codebook, "masks": masks, "other": {}}
+        session.set_component(session.find("component_instance", key="answer_form"), value)
+        calls += 1
+    return calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", type=Path, default=ROOT / "umfrage_gruene.py")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--survey", default="ortsverband")
+    parser.add_argument("--answer-mode", choices=("component", "server"), default="component",
+                        help="Antworten über die Browser-Komponente oder je Checkbox")
+    args = parser.parse_args()
+    survey = SurveyCatalog.load().get(args.survey)
+
+    # Eigenes Arbeitsverzeichnis: Store, Postausgang usw. starten leer
+    with tempfile.TemporaryDirectory() as workdir:
+        write_secrets(Path(workdir), args.answer_mode)
+        port = free_port()
+        server = start_server(args.app.resolve(), port, Path(workdir))
+        try:
+            session = HeadlessSession(f"ws://127.0.0.1:{port}/_stcore/stream")
+            summarize("Erster Aufbau", [session.load()])
+
+            if args.answer_mode == "server":
+                checkbox = session.find("checkbox", key="q3_cb_5")
+                toggles = [session.set_checkbox(checkbox, i % 2 == 0) for i in range(args.rounds)]
+                summarize("Checkbox umschalten", toggles)
+            else:
+                form = session.find("component_instance", key="answer_form")
+                question = survey.questions[0]
+                messages = [
+                    session.set_component(
+                        form, {"codebook": survey.codebook, "masks": {question.key: i % 2}, "other": {}}
+                    )
+                    for i in range(args.rounds)
+                ]
+                summarize("Antworten (Komponente)", messages)
+
+            picks = []
+            for i in range(args.rounds):
+                picker = session.find("selectbox", key="avatar_choice")
+                option = next(o for o in picker.options if o.startswith("🦉" if i % 2 == 0 else "🦇"))
+                picks.append(session.set_selectbox(picker, option))
+            summarize("Avatar wählen", picks)
+
+            session.close()
+
+            # Ganze Umfragen, je eine frische Session; gezählt wird nur das Ausfüllen
+            rng = random.Random(1)
+            calls = 0
+            cpu: Optional[float] = 0.0
+            for _ in range(args.rounds):
+                session = HeadlessSession(f"ws://127.0.0.1:{port}/_stcore/stream")
+                session.load()
+                cpu_before = cpu_seconds(server.pid)
+                calls += fill_survey(session, survey, args.answer_mode, rng)
+                cpu_after = cpu_seconds(server.pid)
+                if cpu is not None and cpu_before is not None and cpu_after is not None:
+                    cpu += cpu_after - cpu_before
+                else:
+                    cpu = None
+                session.close()
+            per_survey = f"   Server-CPU {cpu * 1000 / args.rounds:6.1f} ms" if cpu is not None else ""
+            print(f"{'Umfrage ausfüllen':<22} {calls / args.rounds:6.1f} Server-Aufrufe pro Umfrage{per_survey}")
+        finally:
+            server.terminate()
+            server.wait(10)
+            shutil.rmtree(Path(workdir) / "outbox", ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
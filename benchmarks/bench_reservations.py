@@ -0,0 +1,92 @@
+"""
+Benchmark: Durchsatz atomarer Avatar-Reservierungen mit vielen parallelen
+Schreibern (je ein eigener Prozess mit eigener SQLite-Verbindung).
+
+Aufruf:
+    python benchmarks/bench_reservations.py --writers 16 --avatars 5000
+
+Am Ende wird geprüft, dass kein Avatar doppelt vergeben wurde.
+"""
+
+import argparse
+import multiprocessing as mp
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from avatar_store import ReservationStore  # noqa: E402
+
+
+def _writer(db_path: str, n_avatars: int, attempts: int, seed: int, start, results) -> None:
+    store = ReservationStore(Path(db_path))
+    session_id = uuid.uuid4().hex
+    rng = random.Random(seed)
+    won = []
+    start.wait()
+    t0 = time.perf_counter()
+    for _ in range(attempts):
+        emoji = f"avatar-{rng.randrange(n_avatars)}"
+        if store.reserve(emoji, session_id):
+            won.append(emoji)
+    elapsed = time.perf_counter() - t0
+    store.close()
+    results.put((session_id, won, elapsed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--avatars", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=500, help="Versuche pro Schreiber")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.sqlite3")
+        ReservationStore(Path(db_path)).close()
+
+        start = mp.Event()
+        results = mp.Queue()
+        procs = [
+            mp.Process(target=_writer, args=(db_path, args.avatars, args.attempts, i, start, results))
+            for i in range(args.writers)
+        ]
+        for p in procs:
+            p.start()
+        time.sleep(0.5)  # alle Prozesse sind verbunden
+
+        t0 = time.perf_counter()
+        start.set()
+        collected = [results.get() for _ in procs]
+        wall = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+
+        store = ReservationStore(Path(db_path))
+        claims = {}
+        for session_id, won, _ in collected:
+            for emoji in set(won):
+                claims.setdefault(emoji, []).append(session_id)
+        double = [e for e, owners in claims.items() if len(owners) > 1]
+        mismatched = [e for e, owners in claims.items() if store.owner(e) != owners[0]]
+        store.close()
+
+    total = args.writers * args.attempts
+    print(f"Schreiber:            {args.writers}")
+    print(f"Reservierungsversuche: {total}")
+    print(f"erfolgreich:          {sum(len(set(w)) for _, w, _ in collected)}")
+    print(f"Wanduhrzeit:          {wall:.3f} s")
+    print(f"Durchsatz:            {total / wall:,.0f} Reservierungen/s")
+    print(f"langsamster Schreiber: {max(e for _, _, e in collected):.3f} s")
+    print(f"Doppelvergaben:       {len(double)}")
+    print(f"Abweichungen im Store: {len(mismatched)}")
+    if double or mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
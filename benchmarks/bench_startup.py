@@ -0,0 +1,82 @@
+"""
+Benchmark: Kaltstart und übertragene Bytes pro Rerun.
+
+Aufruf:
+    python benchmarks/bench_startup.py [--app umfrage_gruene.py] [--rounds 3] [--reruns 20]
+
+Pro Runde wird ein frischer Server gestartet und gemessen:
+- Kaltstart: Prozessstart bis der Port antwortet, und bis der erste Aufbau
+  der Seite fertig ist (inkl. aller Imports im Skript-Thread),
+- warmer Aufbau: eine zweite, neue Session,
+- Bytes pro vollständigem Rerun derselben Session.
+
+Zum Vergleich vorher / nachher mit `--app` auf eine ältere Kopie der App
+(z. B. aus `git worktree add`) zeigen.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from headless_client import HeadlessSession, free_port, start_server  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def one_round(app: Path, reruns: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        t0 = time.perf_counter()
+        server = start_server(app, port, Path(workdir))
+        port_ready = time.perf_counter() - t0
+        try:
+            first = HeadlessSession(url)
+            first_load = first.load()
+            cold = time.perf_counter() - t0
+
+            second = HeadlessSession(url)
+            warm = second.load()
+            full = [second.load() for _ in range(reruns)]
+            first.close()
+            second.close()
+        finally:
+            server.terminate()
+            server.wait(10)
+
+    return {
+        "port_ready_s": port_ready,
+        "cold_first_load_s": cold,
+        "first_load_bytes": first_load.bytes,
+        "warm_load_s": warm.seconds,
+        "rerun_ms": statistics.median(s.seconds for s in full) * 1000,
+        "rerun_bytes": statistics.median(s.bytes for s in full),
+        "rerun_elements": statistics.median(s.elements for s in full),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", type=Path, default=ROOT / "umfrage_gruene.py")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    rounds = [one_round(args.app.resolve(), args.reruns) for _ in range(args.rounds)]
+    med = {k: statistics.median(r[k] for r in rounds) for k in rounds[0]}
+    print(f"App: {args.app}  (Median aus {args.rounds} Runden)")
+    print(f"  Port bereit nach        {med['port_ready_s']:7.2f} s")
+    print(f"  Erster Aufbau fertig    {med['cold_first_load_s']:7.2f} s nach Prozessstart "
+          f"({med['first_load_bytes'] / 1024:.1f} kB)")
+    print(f"  Aufbau neue Session     {med['warm_load_s'] * 1000:7.1f} ms")
+    print(f"  Voller Rerun            {med['rerun_ms']:7.1f} ms, "
+          f"{med['rerun_bytes'] / 1024:.1f} kB, {med['rerun_elements']:.0f} Elemente")
+
+
+if __name__ == "__main__":
+    main()
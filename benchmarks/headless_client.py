@@ -0,0 +1,178 @@
+"""
+Minimaler Headless-Client für eine laufende Streamlit-App: spricht direkt
+das Websocket-Protokoll (/_stcore/stream), wie es der Browser tut.
+
+Damit lassen sich echte Interaktionen (Checkbox, Button, Texteingabe) inkl.
+Fragment-Reruns gegen einen echten Server messen – ohne Browser.
+"""
+
+import json
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from websockets.sync.client import connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+WIDGET_TYPES = ("checkbox", "button", "text_input", "selectbox", "radio", "download_button", "component_instance")
+
+
+@dataclass
+class Widget:
+    kind: str
+    id: str
+    label: str
+    fragment_id: str
+    disabled: bool
+    options: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RunStats:
+    seconds: float
+    messages: int
+    bytes: int
+    elements: int
+
+
+@dataclass
+class HeadlessSession:
+    """Eine Browser-Session: hält Widget-Werte und schickt Reruns."""
+
+    url: str
+    widgets: Dict[str, Widget] = field(default_factory=dict)
+    values: Dict[str, WidgetState] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._ws = connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=30)
+
+    def close(self) -> None:
+        self._ws.close()
+
+    # --------------------------------------------------------
+    # Interaktionen
+    # --------------------------------------------------------
+
+    def load(self) -> RunStats:
+        return self._rerun()
+
+    def find(self, kind: str, key: Optional[str] = None, label: Optional[str] = None) -> Widget:
+        for w in self.widgets.values():
+            if w.kind != kind:
+                continue
+            if key is not None and not w.id.endswith(f"-{key}"):
+                continue
+            if label is not None and w.label != label:
+                continue
+            return w
+        raise KeyError(f"{kind} key={key!r} label={label!r} nicht gefunden")
+
+    def set_checkbox(self, widget: Widget, value: bool) -> RunStats:
+        ws = WidgetState(id=widget.id, bool_value=value)
+        self.values[widget.id] = ws
+        return self._rerun(fragment_id=widget.fragment_id)
+
+    def set_text(self, widget: Widget, value: str) -> RunStats:
+        ws = WidgetState(id=widget.id, string_value=value)
+        self.values[widget.id] = ws
+        return self._rerun(fragment_id=widget.fragment_id)
+
+    def set_selectbox(self, widget: Widget, option: str) -> RunStats:
+        """`option` ist der angezeigte Text (wie ihn format_func liefert)."""
+        ws = WidgetState(id=widget.id, string_value=option)
+        self.values[widget.id] = ws
+        return self._rerun(fragment_id=widget.fragment_id)
+
+    def set_component(self, widget: Widget, value: Any) -> RunStats:
+        """Wert einer Komponente setzen, wie es Streamlit.setComponentValue im Browser tut."""
+        ws = WidgetState(id=widget.id, json_value=json.dumps(value))
+        self.values[widget.id] = ws
+        return self._rerun(fragment_id=widget.fragment_id)
+
+    def click(self, widget: Widget) -> RunStats:
+        trigger = WidgetState(id=widget.id, trigger_value=True)
+        return self._rerun(fragment_id=widget.fragment_id, extra=[trigger])
+
+    # --------------------------------------------------------
+    # Protokoll
+    # --------------------------------------------------------
+
+    def _rerun(self, fragment_id: str = "", extra: Optional[List[WidgetState]] = None) -> RunStats:
+        msg = BackMsg()
+        rerun = msg.rerun_script
+        rerun.query_string = ""
+        rerun.page_script_hash = ""
+        if fragment_id:
+            rerun.fragment_id = fragment_id
+        for ws in list(self.values.values()) + list(extra or []):
+            rerun.widget_states.widgets.append(ws)
+
+        t0 = time.perf_counter()
+        self._ws.send(msg.SerializeToString())
+        n_msgs = n_bytes = n_elements = 0
+        while True:
+            raw = self._ws.recv()
+            n_msgs += 1
+            n_bytes += len(raw)
+            fwd = ForwardMsg.FromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                n_elements += 1
+                self._register(fwd)
+            elif kind == "script_finished":
+                # FINISHED_EARLY_FOR_RERUN: st.rerun() -> es folgt ein weiterer Lauf
+                if fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        return RunStats(time.perf_counter() - t0, n_msgs, n_bytes, n_elements)
+
+    def _register(self, fwd: ForwardMsg) -> None:
+        el = fwd.delta.new_element
+        kind = el.WhichOneof("type")
+        if kind not in WIDGET_TYPES:
+            return
+        proto = getattr(el, kind)
+        self.widgets[proto.id] = Widget(
+            kind=kind,
+            id=proto.id,
+            label=getattr(proto, "label", ""),
+            fragment_id=fwd.delta.fragment_id,
+            disabled=getattr(proto, "disabled", False),
+            options=list(getattr(proto, "options", [])),
+        )
+
+
+# ------------------------------------------------------------
+# Server starten / stoppen
+# ------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: Path, port: int, cwd: Path, extra_args: Optional[List[str]] = None) -> subprocess.Popen:
+    """Startet `streamlit run` headless und wartet, bis der Port antwortet."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(app),
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none",
+         *(extra_args or [])],
+        cwd=str(cwd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("Streamlit-Server ist nicht gestartet")
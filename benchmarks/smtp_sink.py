@@ -0,0 +1,74 @@
+"""
+Lokaler SMTP-Ersatz für Benchmarks: nimmt Nachrichten ohne TLS und ohne
+Anmeldung an und merkt sich nur, wann sie angekommen sind.
+
+Gegenstück in den Secrets der App: SMTP_SSL = false, SMTP_PASS = "".
+"""
+
+import socketserver
+import threading
+import time
+from typing import List
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        def reply(line: str) -> None:
+            self.wfile.write((line + "\r\n").encode("ascii"))
+
+        reply("220 smtp-sink")
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    self.server.received(time.perf_counter())
+                    reply("250 ok")
+                continue
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                reply("250 smtp-sink")
+            elif command == "DATA":
+                in_data = True
+                reply("354 go ahead")
+            elif command == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self._lock = threading.Lock()
+        self.arrivals: List[float] = []   # perf_counter()-Zeitpunkte
+        threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def received(self, at: float) -> None:
+        with self._lock:
+            self.arrivals.append(at)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.arrivals)
+
+    def wait_for(self, n: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.count() >= n:
+                return True
+            time.sleep(0.05)
+        return self.count() >= n
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,300 @@
+"""
+Auswertung der Freitexte ("Sonstiges / eigene Antwort"): Wortlisten,
+Wortpaare und Gruppen fast gleicher Antworten – pro Frage, laufend
+fortgeschrieben und ganz ohne Netz oder Sprachmodell.
+
+WICHTIG:
+- Normalisierung: Kleinschreibung, Umlaute/ß ausgeschrieben (ä -> ae),
+  nur Buchstaben und Ziffern, deutsche Füllwörter fallen weg.
+- Fast gleiche Antworten werden per MinHash (Zeichen-3-Gramme) mit
+  LSH-Bändern gruppiert: Jede neue Antwort kostet konstante Zeit, es wird
+  nie jede mit jeder verglichen.
+- Aufruf offline über ein Ergebnis-Journal:
+      python freetext.py results_journal [--top 15]
+"""
+
+import base64
+import re
+import sys
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# ------------------------------------------------------------
+# Normalisierung
+# ------------------------------------------------------------
+
+_FOLD = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss", "é": "e", "è": "e", "à": "a"})
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+    aber alle allem allen aller alles als also am an ander andere anderem anderen
+    anderer anderes auch auf aus bei bin bis bist da damit dann das dass dem den
+    denn der des dich die dies diese diesem diesen dieser dieses dir doch dort du
+    durch ein eine einem einen einer eines einig einige er es etwas euch euer
+    fuer gegen gibt hab habe haben hat hatte hier hin hinter ich ihm ihn ihnen
+    ihr ihre im in ins ist ja jede jedem jeden jeder jedes jetzt kann kein keine
+    koennen koennte man manche mehr mein meine mich mir mit muss nach nicht nichts
+    noch nun nur ob oder ohne schon sehr sein seine sich sie sind so soll sollte
+    sondern sonst ueber um und uns unser unsere unter viel vom von vor war waere
+    waren was weil wenn wer werden wie wieder will wir wird wo wollen wuerde zu
+    zum zur zwischen mal eher gerne gern bitte einfach immer bzw usw etc z b
+""".split())
+
+
+def normalize(text: str) -> str:
+    """Kleinschreibung und Umlaute ausgeschrieben; Satzzeichen werden zu Leerzeichen."""
+    return " ".join(_TOKEN.findall(text.lower().translate(_FOLD)))
+
+
+def tokenize(text: str) -> List[str]:
+    """Inhaltswörter eines Freitexts (normalisiert, ohne Füllwörter)."""
+    return [t for t in normalize(text).split() if len(t) > 1 and t not in STOPWORDS]
+
+
+# ------------------------------------------------------------
+# MinHash mit LSH-Bändern
+# ------------------------------------------------------------
+
+_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """
+    `num_perm` Hashfunktionen (a·x + b mod p) über die CRC32-Werte der
+    Zeichen-Shingles, vektorisiert mit numpy. Die Signaturen sind stabil
+    über Prozesse hinweg (kein Python-`hash()`).
+    """
+
+    def __init__(self, num_perm: int = 64, shingle: int = 3, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        k = self.shingle
+        shingles = {normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        ) % _PRIME
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1)
+
+
+@dataclass
+class AnswerGroup:
+    """Fast gleiche Antworten: der erste Text steht für die Gruppe."""
+    representative: str
+    count: int = 1
+    examples: List[str] = field(default_factory=list)
+
+
+class NearDuplicateGroups:
+    """
+    Ordnet jede neue Antwort einer bestehenden Gruppe zu, wenn sie in
+    mindestens einem LSH-Band mit ihr übereinstimmt und die geschätzte
+    Jaccard-Ähnlichkeit zum Vertreter der Gruppe `threshold` erreicht.
+    """
+
+    def __init__(self, hasher: MinHasher, bands: int = 16, threshold: float = 0.5, max_examples: int = 3) -> None:
+        if hasher.num_perm % bands:
+            raise ValueError("num_perm muss durch bands teilbar sein")
+        self.hasher = hasher
+        self.bands = bands
+        self.rows = hasher.num_perm // bands
+        self.threshold = threshold
+        self.max_examples = max_examples
+        self.groups: List[AnswerGroup] = []
+        self._signatures: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, bytes], int] = {}
+
+    def add(self, text: str, normalized: Optional[str] = None) -> int:
+        """Gibt die Nummer der Gruppe zurück, in der `text` gelandet ist."""
+        sig = self.hasher.signature(normalize(text) if normalized is None else normalized)
+        keys = [(b, sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+        group_id = None
+        for key in keys:
+            candidate = self._buckets.get(key)
+            if candidate is not None and (self._signatures[candidate] == sig).mean() >= self.threshold:
+                group_id = candidate
+                break
+
+        if group_id is None:
+            group_id = len(self.groups)
+            self.groups.append(AnswerGroup(representative=text, examples=[text]))
+            self._signatures.append(sig)
+        else:
+            group = self.groups[group_id]
+            group.count += 1
+            if len(group.examples) < self.max_examples and text not in group.examples:
+                group.examples.append(text)
+
+        for key in keys:
+            self._buckets.setdefault(key, group_id)
+        return group_id
+
+    def top(self, n: int = 10, min_count: int = 2) -> List[AnswerGroup]:
+        return sorted((g for g in self.groups if g.count >= min_count), key=lambda g: -g.count)[:n]
+
+    def to_state(self) -> List[Dict[str, Any]]:
+        return [
+            {"representative": g.representative, "count": g.count, "examples": g.examples,
+             "signature": base64.b64encode(sig.astype("<u8").tobytes()).decode("ascii")}
+            for g, sig in zip(self.groups, self._signatures)
+        ]
+
+    def load_state(self, groups: List[Dict[str, Any]]) -> None:
+        """
+        Gruppen aus einem Snapshot übernehmen. Die LSH-Bänder werden aus den
+        Signaturen der Vertreter neu aufgebaut (die der übrigen Mitglieder
+        stehen nicht im Snapshot).
+        """
+        for g in groups:
+            group_id = len(self.groups)
+            sig = np.frombuffer(base64.b64decode(g["signature"]), dtype="<u8").astype(np.uint64)
+            self.groups.append(AnswerGroup(g["representative"], g["count"], list(g["examples"])))
+            self._signatures.append(sig)
+            for b in range(self.bands):
+                self._buckets.setdefault((b, sig[b * self.rows:(b + 1) * self.rows].tobytes()), group_id)
+
+
+# ------------------------------------------------------------
+# Laufende Statistik pro Frage
+# ------------------------------------------------------------
+
+@dataclass
+class FreeTextSummary:
+    """Kopie der Auswertung einer Frage für die Anzeige."""
+    answers: int
+    terms: List[Tuple[str, int]]
+    bigrams: List[Tuple[str, int]]
+    groups: List[AnswerGroup]
+
+
+class FreeTextStats:
+    """Wort- und Wortpaar-Häufigkeiten sowie Gruppen je Frage, inkrementell."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.5) -> None:
+        self._lock = threading.Lock()
+        self._hasher = MinHasher(num_perm)
+        self._bands = bands
+        self._threshold = threshold
+        self._answers: Counter = Counter()
+        self._terms: Dict[str, Counter] = {}
+        self._bigrams: Dict[str, Counter] = {}
+        self._groups: Dict[str, NearDuplicateGroups] = {}
+        self.version = 0
+
+    def add(self, question: str, text: str) -> None:
+        text = str(text).strip()
+        if not text:
+            return
+        normalized = normalize(text)
+        tokens = [t for t in normalized.split() if len(t) > 1 and t not in STOPWORDS]
+        with self._lock:
+            if question not in self._groups:
+                self._terms[question] = Counter()
+                self._bigrams[question] = Counter()
+                self._groups[question] = NearDuplicateGroups(self._hasher, self._bands, self._threshold)
+            self._answers[question] += 1
+            self._terms[question].update(tokens)
+            self._bigrams[question].update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            self._groups[question].add(text, normalized)
+            self.version += 1
+
+    def add_payload(self, payload: Dict[str, Any]) -> None:
+        """Alle Freitexte einer Abgabe (lesbare Form mit "answers")."""
+        for question, answer in (payload.get("answers") or {}).items():
+            if isinstance(answer, dict) and answer.get("other"):
+                self.add(question, answer["other"])
+
+    def add_many(self, payloads: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for payload in payloads:
+            self.add_payload(payload)
+            n += 1
+        return n
+
+    def questions(self) -> List[str]:
+        with self._lock:
+            return list(self._groups)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Zähler und Gruppen als JSON-taugliches Dict (für snapshots.py)."""
+        with self._lock:
+            return {
+                "version": self.version,
+                "questions": {
+                    q: {
+                        "answers": self._answers[q],
+                        "terms": dict(self._terms[q]),
+                        "bigrams": dict(self._bigrams[q]),
+                        "groups": self._groups[q].to_state(),
+                    }
+                    for q in self._groups
+                },
+            }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "FreeTextStats":
+        stats = cls()
+        stats.version = state["version"]
+        for q, data in state["questions"].items():
+            stats._answers[q] = data["answers"]
+            stats._terms[q] = Counter(data["terms"])
+            stats._bigrams[q] = Counter(data["bigrams"])
+            groups = stats._groups[q] = NearDuplicateGroups(stats._hasher, stats._bands, stats._threshold)
+            groups.load_state(data["groups"])
+        return stats
+
+    def summary(self, question: str, top: int = 15) -> FreeTextSummary:
+        with self._lock:
+            if question not in self._groups:
+                return FreeTextSummary(0, [], [], [])
+            return FreeTextSummary(
+                answers=self._answers[question],
+                terms=self._terms[question].most_common(top),
+                bigrams=self._bigrams[question].most_common(top),
+                groups=[
+                    AnswerGroup(g.representative, g.count, list(g.examples))
+                    for g in self._groups[question].top(top)
+                ],
+            )
+
+
+def _main(argv: List[str]) -> int:
+    import argparse
+    from pathlib import Path
+
+    from journal import read_journal
+    from survey_schema import SurveyCatalog
+
+    parser = argparse.ArgumentParser(description="Freitexte eines Ergebnis-Journals auswerten")
+    parser.add_argument("journal", type=Path, help="Verzeichnis des Ergebnis-Journals")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    catalog = SurveyCatalog.load()
+    stats = FreeTextStats()
+    # Nur lesen: darf neben dem laufenden Server nichts abschneiden oder öffnen
+    n = stats.add_many(catalog.expand_payload(record) for record, _ in read_journal(args.journal))
+    print(f"{n} Abgaben gelesen")
+    for question in stats.questions():
+        s = stats.summary(question, args.top)
+        print(f"\n== {question} ({s.answers} Freitexte)")
+        print("Wörter:   " + ", ".join(f"{t} ({c})" for t, c in s.terms))
+        print("Paare:    " + ", ".join(f"{t} ({c})" for t, c in s.bigrams))
+        for g in s.groups:
+            print(f"  {g.count:4d} × {g.representative}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
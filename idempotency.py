@@ -0,0 +1,136 @@
+"""
+Idempotente Abgaben: Jede Abgabe trägt einen deterministischen Schlüssel
+(Session + Hash der Antworten). Ein begrenzter, ablaufender Index lässt
+Wiederholungen – Doppelklick, unterbrochener Rerun – gar nicht erst bis
+zum Journal oder zum SMTP-Server durch.
+
+WICHTIG:
+- Der Schlüssel enthält keinen Zeitstempel: dieselben Antworten derselben
+  Session ergeben immer denselben Schlüssel. Ändert jemand danach seine
+  Antworten, ist das eine neue Abgabe.
+- Der Index lebt im Speicher des Server-Prozesses und ist nach Anzahl und
+  Alter begrenzt. Abgeschlossene Einträge werden mit `export()` in den
+  Snapshot geschrieben und nach einem Neustart mit `restore()` wieder
+  geladen – so erkennt die Sammeleingabe auch dann einen wiederholten
+  Stapel (gleicher Idempotency-Key). Browser-Sessions haben nach einem
+  Neustart ohnehin ein neues Token.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def submission_key(session_id: str, payload: Dict[str, Any]) -> str:
+    """Schlüssel aus Session und Inhalt (ohne Zeitstempel) der Abgabe."""
+    content = {k: v for k, v in payload.items() if k != "timestamp_utc"}
+    canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{session_id}\n{canonical}".encode("utf-8")).hexdigest()
+    return digest[:32]
+
+
+class _Entry:
+    __slots__ = ("message_id", "expires_at", "done")
+
+    def __init__(self, expires_at: float) -> None:
+        self.message_id: Optional[str] = None
+        self.expires_at = expires_at
+        self.done = False
+
+
+class IdempotencyIndex:
+    """
+    Schlüssel -> Nachrichten-ID, höchstens `max_entries` Einträge, jeder
+    höchstens `ttl` Sekunden lang.
+
+    `run_once(key, submit)` ruft `submit()` für einen Schlüssel nur einmal
+    auf. Läuft der erste Aufruf noch, wartet ein zweiter auf dessen
+    Ergebnis; schlägt er fehl, ist der Schlüssel wieder frei.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 10_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cond = threading.Condition()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        with self._cond:
+            self._expire(time.monotonic())
+            return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        """Nachrichten-ID einer bereits abgeschlossenen Abgabe (sonst None)."""
+        with self._cond:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            return entry.message_id if entry is not None and entry.done else None
+
+    def run_once(self, key: str, submit: Callable[[], str]) -> Tuple[str, bool]:
+        """Gibt (Nachrichten-ID, war_Wiederholung) zurück."""
+        with self._cond:
+            now = time.monotonic()
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                while not entry.done and self._entries.get(key) is entry:
+                    self._cond.wait()
+                if entry.done:
+                    self.duplicates += 1
+                    return entry.message_id, True
+            entry = _Entry(now + self.ttl)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        try:
+            message_id = submit()
+        except BaseException:
+            with self._cond:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            entry.message_id = message_id
+            entry.done = True
+            self._cond.notify_all()
+        return message_id, False
+
+    def export(self) -> List[Tuple[str, str, float]]:
+        """Abgeschlossene Einträge als (Schlüssel, Nachrichten-ID, Ablauf als Unix-Zeit)."""
+        with self._cond:
+            now = time.monotonic()
+            self._expire(now)
+            offset = time.time() - now
+            return [(k, e.message_id, e.expires_at + offset) for k, e in self._entries.items() if e.done]
+
+    def restore(self, entries: Iterable[Tuple[str, str, float]]) -> int:
+        """Gegenstück zu export(), z. B. nach einem Neustart. Abgelaufenes fällt weg."""
+        with self._cond:
+            now = time.monotonic()
+            offset = time.time() - now
+            n = 0
+            for key, message_id, expires_wall in entries:
+                if expires_wall - offset <= now or key in self._entries:
+                    continue
+                entry = _Entry(expires_wall - offset)
+                entry.message_id, entry.done = message_id, True
+                self._entries[key] = entry
+                n += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return n
+
+    def _expire(self, now: float) -> None:
+        # Einträge liegen in Einfügereihenfolge, also auch nach Ablaufzeit
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now or not entry.done:
+                break
+            del self._entries[key]
@@ -0,0 +1,437 @@
+"""
+Import der Ergebnis-E-Mails aus einem lokalen Postfach (Maildir oder mbox)
+in einen spaltenorientierten Datensatz für die Auswertung.
+
+Aufruf:
+    python import_results.py POSTFACH [POSTFACH ...] [--out ergebnisse] [--format parquet|csv] [--workers N]
+
+Erkannt werden sowohl einzelne Ergebnis-Mails (JSON im Text, wie vom
+Sende-Button verschickt) als auch Sammelmails (Anhang .jsonl/.csv, ggf. .gz).
+Kompakte Abgaben (Bitmasken) werden über das Codebuch in `surveys/` wieder
+in die lesbare Form gebracht.
+
+WICHTIG:
+- Das Postfach wird gestreamt, nicht komplett eingelesen. Das Zerlegen der
+  Mails läuft parallel in einem Prozess-Pool, stapelweise (--batch).
+- Doppelte Ergebnisse (z. B. mehrfach weitergeleitet oder im Digest UND
+  einzeln) werden über einen Inhalts-Hash erkannt und nur einmal übernommen.
+- Inkrementell: `<out>/_import_state.json` merkt sich, was schon gelesen
+  wurde (mbox: Byte-Position, Maildir: Änderungszeit der neuesten Mail
+  plus die Namen der Mails aus den letzten MAILDIR_MARGIN Sekunden davor,
+  für spät eingetroffene) und die zuletzt
+  gesehenen Hashes (höchstens --keep-hashes; ältere Dubletten werden nicht
+  mehr erkannt). Jeder Stapel wird sofort als Teil-Datei
+  `results-<zeitstempel>.<format>` geschrieben und danach der Zustand
+  gesichert – der Speicherbedarf hängt nicht von der Postfachgröße ab.
+- mbox: Die Position wird nur bis zur letzten vollständigen Mail (also bis
+  zur nächsten "From "-Zeile) gemerkt. Die letzte Mail der Datei wird
+  beim nächsten Lauf noch einmal gelesen (und per Hash verworfen); eine
+  gerade erst halb geschriebene wird übersprungen.
+- Format "lang": eine Zeile pro gewählter Option bzw. Freitext
+  (result_hash, timestamp_utc, survey_id, survey_version, tenant, avatar,
+  question, kind, value). Das Schema bleibt so über alle Fragebögen gleich;
+  `pandas.read_parquet(out)` liest alle Teil-Dateien auf einmal.
+"""
+
+import argparse
+import csv
+import email
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from survey_schema import SurveyCatalog
+
+
+STATE_FILE = "_import_state.json"
+PART_PREFIX = "results-"
+KEEP_HASHES = 200_000
+MAILDIR_MARGIN = 24 * 3600   # Sekunden: so spät darf eine Mail gegenüber der neuesten eintreffen
+
+COLUMNS = [
+    "result_hash", "timestamp_utc", "survey_id", "survey_version", "tenant",
+    "avatar", "question", "kind", "value",
+]
+
+_MBOX_FROM = re.compile(rb"^>(>*From )")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ------------------------------------------------------------
+# Postfach streamen
+# ------------------------------------------------------------
+
+def iter_mbox(path: Path, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """
+    Liefert (Fortsetzungs-Position, Rohdaten) ab `offset`. Liest
+    zeilenweise, hält also immer nur eine Mail im Speicher.
+
+    Die Position ist die der nächsten "From "-Zeile – nur bis dorthin ist
+    eine Mail sicher vollständig. Für die letzte Mail der Datei ist es ihr
+    eigener Anfang (sie wird beim nächsten Lauf erneut gelesen); endet sie
+    nicht mit einer Leerzeile, wird sie gerade noch geschrieben und gar
+    nicht geliefert.
+    """
+    with path.open("rb") as f:
+        f.seek(offset)
+        lines: List[bytes] = []
+        prev_blank = True
+        pos = offset
+        start = offset
+        for line in f:
+            if line.startswith(b"From ") and prev_blank:
+                if lines:
+                    yield pos, b"".join(lines)
+                lines = []
+                start = pos
+            else:
+                lines.append(_MBOX_FROM.sub(rb"\1", line))
+            pos += len(line)
+            prev_blank = line in (b"\n", b"\r\n")
+        if lines and prev_blank:
+            yield start, b"".join(lines)
+
+
+def _maildir_key(name: str) -> str:
+    """Dateiname ohne die Flags (":2,S"), die sich beim Lesen ändern."""
+    return name.split(":", 1)[0]
+
+
+def maildir_entries(path: Path) -> List[Tuple[int, str, str]]:
+    """(mtime in ns, Schlüssel, Pfad) aller Mails in new/ und cur/, älteste zuerst."""
+    entries = []
+    for sub in ("new", "cur"):
+        directory = path / sub
+        if not directory.is_dir():
+            continue
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                entries.append((entry.stat().st_mtime_ns, _maildir_key(entry.name), entry.path))
+    entries.sort()
+    return entries
+
+
+def iter_maildir(
+    path: Path, watermark: int, recent: Dict[str, int], margin_ns: int
+) -> Iterator[Tuple[Tuple[int, str], bytes]]:
+    """
+    Liefert ((mtime, Schlüssel), Rohdaten) der noch nicht gelesenen Mails:
+    alles nach `watermark - margin_ns`, was nicht schon in `recent` steht.
+    Umbenennen (Flags, new/ -> cur/) ändert die mtime nicht.
+    """
+    for mtime, key, file_path in maildir_entries(path):
+        if mtime < watermark - margin_ns or key in recent:
+            continue
+        with open(file_path, "rb") as f:
+            yield (mtime, key), f.read()
+
+
+# ------------------------------------------------------------
+# Mails zerlegen (läuft im Prozess-Pool)
+# ------------------------------------------------------------
+
+def result_hash(payload: Dict[str, Any]) -> str:
+    """
+    Hash über die Felder, die jede Versandform trägt (die CSV-Sammelmail
+    kennt z. B. keine survey_id) – so fallen auch Dubletten zwischen
+    Einzel- und Sammelmail auf.
+    """
+    answers = {
+        q: {"selected": list(a.get("selected", [])), "other": a.get("other", "") or ""}
+        for q, a in payload.get("answers", {}).items()
+        if isinstance(a, dict)
+    }
+    key = {"timestamp_utc": payload.get("timestamp_utc"), "avatar": payload.get("avatar"), "answers": answers}
+    canonical = json.dumps(key, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def _payloads_from_csv(text: str) -> List[Dict[str, Any]]:
+    """Gegenstück zu outbox.encode_digest(fmt="csv")."""
+    payloads = []
+    for row in csv.DictReader(io.StringIO(text)):
+        answers: Dict[str, Dict[str, Any]] = {}
+        for column, value in row.items():
+            if column in ("timestamp_utc", "avatar") or "." not in column:
+                continue
+            question, field = column.rsplit(".", 1)
+            answer = answers.setdefault(question, {"selected": [], "other": ""})
+            if field == "selected":
+                answer["selected"] = [v for v in (value or "").split(" | ") if v]
+            elif field == "other":
+                answer["other"] = value or ""
+        payloads.append({
+            "timestamp_utc": row.get("timestamp_utc", ""),
+            "avatar": row.get("avatar", ""),
+            "answers": answers,
+        })
+    return payloads
+
+
+_catalog: Optional[SurveyCatalog] = None
+
+
+def _readable(obj: Any) -> Optional[Dict[str, Any]]:
+    """Lesbare Abgabe oder None, wenn `obj` keine Abgabe ist."""
+    global _catalog
+    if not isinstance(obj, dict):
+        return None
+    if isinstance(obj.get("masks"), dict):
+        if _catalog is None:     # einmal pro Worker-Prozess
+            _catalog = SurveyCatalog.load()
+        obj = _catalog.expand_payload(obj)
+    return obj if isinstance(obj.get("answers"), dict) else None
+
+
+def parse_message(raw: bytes) -> List[Dict[str, Any]]:
+    """Alle Ergebnisse einer Mail (leer, wenn es keine Ergebnis-Mail ist)."""
+    msg = email.message_from_bytes(raw)
+    payloads: List[Dict[str, Any]] = []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        filename = part.get_filename() or ""
+        data = part.get_payload(decode=True) or b""
+        if filename.endswith(".gz"):
+            data, filename = gzip.decompress(data), filename[:-3]
+        text = data.decode(part.get_content_charset() or "utf-8", errors="replace")
+
+        if filename.endswith(".jsonl"):
+            payloads += [p for p in map(_readable, map(json.loads, filter(None, text.splitlines()))) if p]
+        elif filename.endswith(".csv"):
+            payloads += _payloads_from_csv(text)
+        elif not filename and part.get_content_type() == "text/plain":
+            try:
+                obj = _readable(json.loads(text))
+            except ValueError:
+                continue
+            if obj is not None:
+                payloads.append(obj)
+    return payloads
+
+
+def rows_from_message(raw: bytes) -> Tuple[int, List[Tuple[str, List[Tuple]]]]:
+    """
+    Zerlegt eine Mail in Zeilen des langen Formats, gruppiert nach
+    Ergebnis-Hash. Gibt (Anzahl Fehler, [(hash, zeilen), ...]) zurück.
+    """
+    try:
+        payloads = parse_message(raw)
+    except Exception:
+        return 1, []
+
+    results = []
+    for p in payloads:
+        h = result_hash(p)
+        head = (h, p.get("timestamp_utc"), p.get("survey_id"), p.get("survey_version"),
+                p.get("tenant"), p.get("avatar"))
+        rows = []
+        for question, answer in p["answers"].items():
+            if not isinstance(answer, dict):
+                continue
+            for option in answer.get("selected", []):
+                rows.append(head + (question, "selected", option))
+            if answer.get("other"):
+                rows.append(head + (question, "other", answer["other"]))
+        if not rows:
+            rows.append(head + (None, None, None))
+        results.append((h, rows))
+    return 0, results
+
+
+# ------------------------------------------------------------
+# Zustand und Ausgabe
+# ------------------------------------------------------------
+
+def load_state(out: Path) -> Dict[str, Any]:
+    """Zustand des letzten Laufs; "hashes" in der Reihenfolge, in der sie gesehen wurden."""
+    path = out / STATE_FILE
+    if not path.exists():
+        return {"sources": {}, "hashes": []}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(out: Path, state: Dict[str, Any]) -> None:
+    path = out / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_part(out: Path, rows: List[Tuple], fmt: str) -> Optional[Path]:
+    if not rows:
+        return None
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df["survey_version"] = df["survey_version"].astype("Int64")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    if fmt == "parquet":
+        for column in ("survey_id", "tenant", "avatar", "question", "kind"):
+            df[column] = df[column].astype("category")
+        path = out / f"{PART_PREFIX}{stamp}.parquet"
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        path = out / f"{PART_PREFIX}{stamp}.csv"
+        df.to_csv(path, index=False)
+    return path
+
+
+# ------------------------------------------------------------
+# Import
+# ------------------------------------------------------------
+
+def _messages(source: Path, src_state: Dict[str, Any]) -> Iterator[Tuple[Any, bytes]]:
+    """(Fortschrittsmarke, Rohdaten) aus Maildir oder mbox."""
+    if source.is_dir():
+        legacy = set(src_state.pop("seen", []))   # Zustand älterer Läufe: alle Dateinamen
+        if legacy:
+            _advance_maildir(src_state, [(m, k) for m, k, _ in maildir_entries(source) if k in legacy])
+        yield from iter_maildir(
+            source, src_state.get("watermark", 0), src_state.setdefault("recent", {}), MAILDIR_MARGIN * 10**9
+        )
+        return
+
+    st = source.stat()
+    offset = src_state.get("offset", 0)
+    # Datei ersetzt oder gekürzt: von vorne lesen, die Hashes verhindern Dubletten
+    if src_state.get("inode") != st.st_ino or offset > st.st_size:
+        offset = 0
+    src_state["inode"] = st.st_ino
+    yield from iter_mbox(source, offset)
+
+
+def _advance_maildir(src_state: Dict[str, Any], marks: List[Tuple[int, str]]) -> None:
+    """Maildir-Fortschritt: Wasserstand vorschieben, nur die Namen im Rand dahinter behalten."""
+    recent = src_state.setdefault("recent", {})
+    watermark = src_state.get("watermark", 0)
+    for mtime, key in marks:
+        recent[key] = mtime
+        watermark = max(watermark, mtime)
+    floor = watermark - MAILDIR_MARGIN * 10**9
+    src_state["watermark"] = watermark
+    src_state["recent"] = {k: m for k, m in recent.items() if m >= floor}
+
+
+def import_mailboxes(
+    sources: List[Path],
+    out: Path,
+    fmt: str = "parquet",
+    workers: Optional[int] = None,
+    batch: int = 512,
+    keep_hashes: int = KEEP_HASHES,
+) -> Dict[str, Any]:
+    """Importiert alle neuen Ergebnisse; gibt eine kleine Statistik zurück."""
+    out.mkdir(parents=True, exist_ok=True)
+    state = load_state(out)
+    known: Dict[str, None] = dict.fromkeys(state["hashes"])   # Reihenfolge: älteste zuerst
+    stats = {"messages": 0, "results": 0, "new": 0, "duplicates": 0, "errors": 0, "parts": []}
+
+    def consume(results) -> List[Tuple]:
+        rows: List[Tuple] = []
+        for errors, found in results:
+            stats["messages"] += 1
+            stats["errors"] += errors
+            for h, result_rows in found:
+                stats["results"] += 1
+                if h in known:
+                    stats["duplicates"] += 1
+                    continue
+                known[h] = None
+                stats["new"] += 1
+                rows.extend(result_rows)
+        return rows
+
+    def commit(rows: List[Tuple]) -> None:
+        # Erst die Daten, dann der Zustand: bricht etwas ab, wird beim nächsten
+        # Lauf höchstens der letzte Stapel erneut gelesen (und per Hash verworfen)
+        part = write_part(out, rows, fmt)
+        if part is not None:
+            stats["parts"].append(str(part))
+        for h in list(known)[:max(0, len(known) - keep_hashes)]:
+            del known[h]
+        state["hashes"] = list(known)
+        save_state(out, state)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source in sources:
+            source = Path(source).resolve()
+            src_state = state["sources"].setdefault(str(source), {})
+            chunk_marks: List[Any] = []
+            chunk_raw: List[bytes] = []
+
+            def run_chunk() -> None:
+                rows = consume(pool.map(rows_from_message, chunk_raw, chunksize=16))
+                if source.is_dir():
+                    _advance_maildir(src_state, chunk_marks)
+                else:
+                    src_state["offset"] = chunk_marks[-1]
+                commit(rows)
+                chunk_marks.clear()
+                chunk_raw.clear()
+
+            for mark, raw in _messages(source, src_state):
+                chunk_marks.append(mark)
+                chunk_raw.append(raw)
+                if len(chunk_raw) >= batch:
+                    run_chunk()
+            if chunk_raw:
+                run_chunk()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ergebnis-E-Mails aus Maildir/mbox importieren")
+    parser.add_argument("sources", nargs="+", type=Path, help="Maildir-Verzeichnis oder mbox-Datei")
+    parser.add_argument("--out", type=Path, default=Path("ergebnisse"), help="Zielverzeichnis des Datensatzes")
+    parser.add_argument("--format", choices=("parquet", "csv"), default=None,
+                        help="Standard: parquet, falls pyarrow installiert ist, sonst csv")
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse zum Zerlegen (Standard: alle Kerne)")
+    parser.add_argument("--batch", type=int, default=512, help="Mails pro Stapel an den Pool")
+    parser.add_argument("--keep-hashes", type=int, default=KEEP_HASHES,
+                        help="so viele zuletzt gesehene Ergebnis-Hashes bleiben zur Dublettenerkennung gespeichert")
+    args = parser.parse_args(argv)
+
+    for source in args.sources:
+        if not source.exists():
+            parser.error(f"Postfach nicht gefunden: {source}")
+    fmt = args.format or ("parquet" if parquet_available() else "csv")
+    if fmt == "parquet" and not parquet_available():
+        parser.error("Für --format parquet wird pyarrow benötigt (pip install pyarrow)")
+
+    t0 = time.perf_counter()
+    stats = import_mailboxes(args.sources, args.out, fmt=fmt, workers=args.workers, batch=args.batch,
+                             keep_hashes=args.keep_hashes)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{stats['messages']} Mails gelesen, {stats['results']} Ergebnisse gefunden, "
+        f"{stats['new']} neu, {stats['duplicates']} doppelt, {stats['errors']} fehlerhaft "
+        f"({elapsed:.2f} s)"
+    )
+    for part in stats["parts"]:
+        print(f"Geschrieben: {part}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
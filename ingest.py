@@ -0,0 +1,208 @@
+"""
+Sammeleingabe über HTTP/JSON (Papierbögen, Kiosk-Rechner): ein kleiner
+Server neben der App, der ganze Stapel von Abgaben annimmt, prüft und in
+einem Rutsch in Journal, Auszählung und Postausgang gibt.
+
+WICHTIG:
+- Nur lokal: Der Server bindet ausschließlich an eine Loopback-Adresse
+  (Standard 127.0.0.1, auch ::1). Mit st.secrets INGEST_TOKEN muss jede Anfrage
+  zusätzlich "Authorization: Bearer <token>" mitschicken.
+- Schema je Datensatz wie beim Sende-Button (survey_id, survey_version,
+  codebook, masks, other, optional avatar und timestamp_utc). Fehlt der
+  Zeitstempel, gilt der Zeitpunkt des Eingangs.
+- Fehlerhafte Datensätze werden einzeln mit Position und Grund gemeldet;
+  die übrigen des Stapels werden trotzdem übernommen.
+- Avatare aus Papierbögen werden NICHT in der Avatar-Registry reserviert.
+
+Aufruf (Stapel als JSON-Array oder eine Abgabe pro Zeile):
+    curl -X POST 'http://127.0.0.1:8502/ingest?ov=<id>' \\
+         -H 'Content-Type: application/json' -H 'Idempotency-Key: stapel-17' \\
+         --data-binary @stapel.json
+"""
+
+import hmac
+import ipaddress
+import json
+import socket
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from survey_schema import SurveyCatalog, SurveySchemaError
+
+MAX_AVATAR_LENGTH = 32
+PAYLOAD_KEYS = frozenset(
+    ("timestamp_utc", "survey_id", "survey_version", "tenant", "avatar", "codebook", "masks", "other")
+)
+
+
+# ------------------------------------------------------------
+# Prüfung
+# ------------------------------------------------------------
+
+def validate_record(
+    record: Any, catalog: SurveyCatalog, tenant_id: str, multi: bool, received_at: str
+) -> Dict[str, Any]:
+    """
+    Prüft eine Abgabe gegen Fragebogen und Limits und gibt sie in der Form
+    des Sende-Buttons zurück. Fehler: SurveySchemaError mit lesbarem Grund.
+    """
+    if not isinstance(record, dict):
+        raise SurveySchemaError("Datensatz muss ein Objekt sein")
+    unknown = set(record) - PAYLOAD_KEYS
+    if unknown:
+        raise SurveySchemaError(f"unbekannte Felder: {', '.join(sorted(unknown))}")
+
+    try:
+        survey = catalog.get(record["survey_id"], record["survey_version"])
+    except KeyError as e:
+        raise SurveySchemaError(f"Feld {e.args[0]} fehlt") from None
+    except (TypeError, ValueError):
+        raise SurveySchemaError("survey_version muss eine Zahl sein") from None
+    if record.get("codebook") != survey.codebook:
+        raise SurveySchemaError(f"codebook passt nicht zu {survey.survey_id} v{survey.version}")
+    if record.get("tenant", tenant_id) != tenant_id:
+        raise SurveySchemaError(f"gehört zu Ortsverband {record['tenant']!r}, nicht {tenant_id!r}")
+
+    timestamp = record.get("timestamp_utc") or received_at
+    try:
+        datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        raise SurveySchemaError(f"timestamp_utc ist kein ISO-Zeitpunkt: {timestamp!r}") from None
+
+    avatar = record.get("avatar")
+    if avatar is not None and (not isinstance(avatar, str) or not 0 < len(avatar) <= MAX_AVATAR_LENGTH):
+        raise SurveySchemaError("avatar muss ein kurzer Text sein")
+
+    return {
+        "timestamp_utc": timestamp,
+        "survey_id": survey.survey_id,
+        "survey_version": survey.version,
+        **({"tenant": tenant_id} if multi else {}),
+        "avatar": avatar,
+        **survey.validate(record.get("masks", {}), record.get("other", {})),
+    }
+
+
+def validate_batch(
+    records: List[Any], catalog: SurveyCatalog, tenant_id: str, multi: bool
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Gibt (gültige Abgaben, Fehler als {"index", "error"}) zurück."""
+    received_at = datetime.now(timezone.utc).isoformat()
+    valid, errors = [], []
+    for index, record in enumerate(records):
+        try:
+            valid.append(validate_record(record, catalog, tenant_id, multi, received_at))
+        except SurveySchemaError as e:
+            errors.append({"index": index, "error": str(e)})
+    return valid, errors
+
+
+def parse_body(body: bytes) -> List[Any]:
+    """JSON-Array oder eine JSON-Abgabe pro Zeile (NDJSON)."""
+    text = body.decode("utf-8").strip()
+    if text.startswith("["):
+        records = json.loads(text)
+        if not isinstance(records, list):
+            raise ValueError("erwartet ein JSON-Array")
+        return records
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# ------------------------------------------------------------
+# HTTP-Server
+# ------------------------------------------------------------
+
+# (tenant_id, Datensätze, Idempotency-Key) -> Antwort; KeyError: unbekannter Ortsverband
+BatchHandler = Callable[[Optional[str], List[Any], Optional[str]], Dict[str, Any]]
+
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address: Tuple[str, int], handle_batch: BatchHandler,
+        token: Optional[str] = None, max_bytes: int = 16 * 1024 * 1024,
+    ) -> None:
+        host = address[0]
+        infos = socket.getaddrinfo(host, address[1], type=socket.SOCK_STREAM)
+        if not all(ipaddress.ip_address(info[4][0].split("%", 1)[0]).is_loopback for info in infos):
+            raise RuntimeError(f"Sammeleingabe nur lokal: {host} ist keine Loopback-Adresse")
+        self.address_family = infos[0][0]
+        self.handle_batch = handle_batch
+        self.token = token
+        self.max_bytes = max_bytes
+        super().__init__(address, _Handler)
+
+    def start(self) -> "IngestServer":
+        threading.Thread(target=self.serve_forever, name="ingest-http", daemon=True).start()
+        return self
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: IngestServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path == "/health":
+            self._reply(200, {"ok": True})
+        else:
+            self._reply(404, {"error": "unbekannter Pfad"})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/ingest":
+            return self._reply(404, {"error": "unbekannter Pfad"})
+        raw_length = self.headers.get("Content-Length")
+        if raw_length is None:
+            self.close_connection = True
+            return self._reply(411, {"error": "Content-Length fehlt"})
+        try:
+            length = int(raw_length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._reply(400, {"error": f"ungültige Content-Length: {raw_length!r}"})
+        if not self._authorized():
+            self.close_connection = True     # Rumpf bleibt ungelesen
+            return self._reply(401, {"error": "Token fehlt oder ist falsch"})
+        if length > self.server.max_bytes:
+            self.close_connection = True
+            return self._reply(413, {"error": f"höchstens {self.server.max_bytes} Bytes pro Stapel"})
+        try:
+            records = parse_body(self.rfile.read(length))
+        except (UnicodeDecodeError, ValueError) as e:
+            return self._reply(400, {"error": f"kein gültiges JSON: {e}"})
+
+        tenant_id = parse_qs(url.query).get("ov", [None])[0]
+        try:
+            result = self.server.handle_batch(tenant_id, records, self.headers.get("Idempotency-Key"))
+        except KeyError as e:
+            return self._reply(404, {"error": str(e.args[0])})
+        except Exception as e:   # z. B. fehlende SMTP-Secrets, Journal nicht schreibbar
+            return self._reply(503, {"error": str(e)})
+        self._reply(200, result)
+
+    def _authorized(self) -> bool:
+        if not self.server.token:
+            return True
+        given = self.headers.get("Authorization", "")
+        return hmac.compare_digest(given.encode("utf-8"), f"Bearer {self.server.token}".encode("utf-8"))
+
+    def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass   # keine Zugriffsprotokolle (anonyme Umfrage)
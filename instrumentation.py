@@ -0,0 +1,245 @@
+"""
+Messpunkte für die App: benannte Zeitabschnitte ("Spans"), Zähler und
+optional ein cProfile-Mitschnitt pro Skriptlauf.
+
+Einschalten über Umgebungsvariablen (ohne sie kostet alles praktisch nichts,
+weil `span` dann ein fester No-op ist):
+
+- UMFRAGE_METRICS=1          Spans und Zähler erfassen
+- UMFRAGE_METRICS_FILE=...   Ziel der Prometheus-Textdatei
+                             (Standard: metrics/umfrage.prom, alle 15 s)
+- UMFRAGE_PROFILE=1          jeden Skriptlauf mit cProfile mitschneiden
+- UMFRAGE_PROFILE_DIR=...    Ablage der .prof-Dateien (Standard: profiles/)
+- UMFRAGE_PROFILE_KEEP=50    so viele Mitschnitte werden behalten
+"""
+
+import bisect
+import contextlib
+import cProfile
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get("UMFRAGE_METRICS", "").lower() in ("1", "true", "yes")
+PROFILE = os.environ.get("UMFRAGE_PROFILE", "").lower() in ("1", "true", "yes")
+
+METRICS_FILE = Path(os.environ.get("UMFRAGE_METRICS_FILE", "metrics/umfrage.prom"))
+EXPORT_INTERVAL = 15.0
+PROFILE_DIR = Path(os.environ.get("UMFRAGE_PROFILE_DIR", "profiles"))
+PROFILE_KEEP = int(os.environ.get("UMFRAGE_PROFILE_KEEP", "50"))
+
+# Obergrenzen der Histogramm-Eimer in Sekunden
+BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # letzter Eimer: +Inf
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str], _Histogram] = {}   # (Metrik, Span-Name) -> Histogramm
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+
+
+# ------------------------------------------------------------
+# Öffentliche API
+# ------------------------------------------------------------
+
+def observe(metric: str, seconds: float, label: str = "") -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        hist = _histograms.get((metric, label))
+        if hist is None:
+            hist = _histograms[(metric, label)] = _Histogram()
+        hist.observe(seconds)
+
+
+def incr(counter: str, value: float = 1.0) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0.0) + value
+
+
+def gauge(name: str, value: float) -> None:
+    """Momentanwert (z. B. Länge einer Warteschlange); der letzte gewinnt."""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe("umfrage_span_seconds", time.perf_counter() - self.start, self.name)
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def _real_span(name: str) -> _Span:
+    """Zeitabschnitt: `with span("avatar_picker"): ...`"""
+    return _Span(name)
+
+
+def _null_span(name: str) -> contextlib.nullcontext:
+    """Ausgeschaltet: immer derselbe leere Kontextmanager."""
+    return _NULL_SPAN
+
+
+span = _real_span if ENABLED else _null_span
+
+
+# ------------------------------------------------------------
+# Export als Prometheus-Textdatei
+# ------------------------------------------------------------
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        hists = {k: (h.count, h.total, h.max, list(h.buckets)) for k, h in _histograms.items()}
+
+    for name in sorted(counters):
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {counters[name]:g}")
+
+    for name in sorted(gauges):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {gauges[name]:g}")
+
+    typed = set()
+    for (metric, label), (count, total, max_s, buckets) in sorted(hists.items()):
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        sel = f'span="{label}",' if label else ""
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), buckets):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{metric}_bucket{{{sel}le="{le}"}} {cumulative}')
+        plain = f"{{{sel.rstrip(',')}}}" if sel else ""
+        lines.append(f"{metric}_sum{plain} {total:.6f}")
+        lines.append(f"{metric}_count{plain} {count}")
+
+    # Höchstwerte als eigene Gauge-Familie (gehören nicht zum Histogramm)
+    typed = set()
+    for (metric, label), (_, _, max_s, _) in sorted(hists.items()):
+        max_metric = f"{metric[:-len('_seconds')] if metric.endswith('_seconds') else metric}_max_seconds"
+        if max_metric not in typed:
+            lines.append(f"# TYPE {max_metric} gauge")
+            typed.add(max_metric)
+        plain = f'{{span="{label}"}}' if label else ""
+        lines.append(f"{max_metric}{plain} {max_s:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: Path = METRICS_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(render_prometheus(), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+_exporter: Optional[threading.Thread] = None
+
+
+def start_exporter(interval: float = EXPORT_INTERVAL) -> None:
+    """Schreibt die Metriken regelmäßig in METRICS_FILE (einmal pro Prozess)."""
+    global _exporter
+    if not ENABLED or _exporter is not None:
+        return
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file()
+            except OSError:
+                pass
+
+    with _lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+            _exporter.start()
+
+
+# ------------------------------------------------------------
+# Skriptlauf: Gesamtzeit, Zähler und optional cProfile
+# ------------------------------------------------------------
+
+_local = threading.local()
+_profile_seq = 0
+
+
+def start_rerun() -> None:
+    """
+    Ganz oben im Skript aufrufen. Zählt den Lauf, startet beim ersten Mal
+    den Export und (mit UMFRAGE_PROFILE) einen cProfile-Mitschnitt.
+    Ein liegengebliebener Mitschnitt (Lauf durch st.rerun/st.stop
+    abgebrochen) wird verworfen.
+    """
+    if ENABLED:
+        incr("umfrage_reruns_total")
+        start_exporter()
+        _local.started = time.perf_counter()
+    if PROFILE:
+        stale = getattr(_local, "profiler", None)
+        if stale is not None:
+            stale.disable()
+        profiler = cProfile.Profile()
+        _local.profiler = profiler
+        profiler.enable()
+
+
+def finish_rerun() -> None:
+    """Ganz unten im Skript aufrufen: Gesamtzeit und ggf. profiles/rerun-*.prof."""
+    global _profile_seq
+    started = getattr(_local, "started", None)
+    if started is not None:
+        _local.started = None
+        observe("umfrage_span_seconds", time.perf_counter() - started, "rerun")
+
+    profiler = getattr(_local, "profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+    _local.profiler = None
+
+    with _lock:
+        _profile_seq += 1
+        seq = _profile_seq
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(str(PROFILE_DIR / f"rerun-{time.strftime('%Y%m%d-%H%M%S')}-{seq:06d}.prof"))
+
+    old = sorted(PROFILE_DIR.glob("rerun-*.prof"))
+    for path in old[:-PROFILE_KEEP]:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,222 @@
+"""
+Lokales Ergebnis-Journal (optional): eine nur anhängende JSONL-Ablage der
+abgeschickten, anonymen Antworten, aus der sich später auswerten lässt.
+
+WICHTIG:
+- Gespeichert wird genau das, was auch per E-Mail verschickt wird
+  (Zeitstempel, Avatar-Emoji, Antworten) – keine Session-Kennungen.
+- Gruppen-Commit: Treffen viele Abgaben gleichzeitig ein, schreibt EIN
+  Thread den ganzen Stapel und ruft nur einmal fsync auf.
+- Die Dateien werden ab einer Größe rotiert (results-000001.jsonl, ...).
+- Offline-Werkzeuge lesen mit `read_journal()`: nur lesend, ohne Reparatur
+  der letzten Zeile – ungefährlich neben einem laufenden Server.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+SEGMENT_PREFIX = "results-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _segment_number(path: Path) -> int:
+    return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def read_journal(
+    directory: Path, start: Optional[Tuple[int, int]] = None
+) -> Iterator[Tuple[Dict[str, Any], Tuple[int, int]]]:
+    """
+    Liest die Datensätze eines Journal-Verzeichnisses in Schreibreihenfolge
+    und liefert jeweils die Position (Segmentnummer, Byte-Offset) HINTER dem
+    Datensatz. Mit `start` beginnt es hinter einer früher gelieferten
+    Position. Öffnet nichts zum Schreiben; eine unvollständige letzte Zeile
+    (wird gerade geschrieben oder Absturz) wird nur übersprungen.
+    """
+    for path in sorted(Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")):
+        segment_no = _segment_number(path)
+        if start is not None and segment_no < start[0]:
+            continue
+        with path.open("rb") as f:
+            offset = 0
+            if start is not None and segment_no == start[0]:
+                offset = f.seek(start[1])
+            for raw in f:
+                offset += len(raw)
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                yield record, (segment_no, offset)
+
+
+class ResultsJournal:
+    """
+    Nur anhängendes Journal mit Gruppen-Commit und Segment-Rotation.
+
+    `append()` kehrt erst zurück, wenn der Datensatz per fsync auf der
+    Platte liegt. Wer gerade keinen Stapel schreibt, wartet auf den
+    laufenden Schreiber und wird mit dessen nächstem Stapel erledigt.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int = 8 * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._pending_callers = 0   # so viele append_many-Aufrufe warten auf den nächsten Stapel
+        self._next_seq = 0     # Anzahl bisher angenommener Datensätze
+        self._done_seq = 0     # so viele davon sind abgearbeitet (geschrieben oder gescheitert)
+        self._flushing = False
+        # Gescheiterte Stapel: [Anfang, Ende, Fehler, noch nicht benachrichtigte Aufrufer];
+        # ein Eintrag fällt weg, sobald alle Aufrufer seines Stapels den Fehler gesehen haben
+        self._failures: List[List[Any]] = []
+
+        segments = self.segments()
+        self._segment_no = _segment_number(segments[-1]) if segments else 1
+        self._repair_tail(self._segment_path(self._segment_no))
+        self._file = open(self._segment_path(self._segment_no), "ab")
+
+    # --------------------------------------------------------
+    # Schreiben
+    # --------------------------------------------------------
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """Mehrere Datensätze auf einmal: landen gemeinsam in einem Stapel (ein fsync)."""
+        lines = [
+            (json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8") for r in records
+        ]
+        if not lines:
+            return
+        with self._cond:
+            self._pending.extend(lines)
+            self._pending_callers += 1
+            self._next_seq += len(lines)
+            my_seq = self._next_seq
+
+            while self._done_seq < my_seq:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+
+                # Dieser Thread übernimmt den Stapel aller bisher Wartenden
+                self._flushing = True
+                batch, self._pending = self._pending, []
+                callers, self._pending_callers = self._pending_callers, 0
+                batch_start, batch_end = self._done_seq, self._next_seq
+                self._cond.release()
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self._failures.append([batch_start, batch_end, e, callers])
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    self._done_seq = batch_end
+                    self._cond.notify_all()
+
+            for failure in self._failures:
+                start, end, error, _ = failure
+                if start < my_seq <= end:
+                    failure[3] -= 1
+                    if failure[3] <= 0:
+                        self._failures.remove(failure)
+                    raise OSError(f"Journal konnte nicht geschrieben werden: {error}") from error
+
+    def close(self) -> None:
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._file.close()
+
+    def _write_batch(self, batch: List[bytes]) -> None:
+        data = b"".join(batch)
+        if self._file.tell() > 0 and self._file.tell() + len(data) > self.segment_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @staticmethod
+    def _repair_tail(path: Path) -> None:
+        """Schneidet eine halb geschriebene letzte Zeile (Absturz) ab."""
+        if not path.exists():
+            return
+        with path.open("r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                idx = chunk.rfind(b"\n")
+                if idx >= 0:
+                    f.truncate(pos - step + idx + 1)
+                    return
+                pos -= step
+            f.truncate(0)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._segment_no += 1
+        self._file = open(self._segment_path(self._segment_no), "ab")
+        # Neuer Verzeichniseintrag soll einen Absturz ebenfalls überleben
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    # --------------------------------------------------------
+    # Lesen (streamend, Zeile für Zeile)
+    # --------------------------------------------------------
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Liefert alle Datensätze in Schreibreihenfolge, ohne Segmente ganz zu laden."""
+        for record, _ in self.iter_with_positions():
+            yield record
+
+    def iter_with_positions(
+        self, start: Optional[Tuple[int, int]] = None
+    ) -> Iterator[Tuple[Dict[str, Any], Tuple[int, int]]]:
+        """
+        Wie iter_records(), liefert aber zusätzlich die Position
+        (Segmentnummer, Byte-Offset) HINTER dem jeweiligen Datensatz.
+        Mit `start` beginnt es hinter einer früher gelieferten Position.
+        """
+        return read_journal(self.directory, start)
+
+    def contains(self, position: Tuple[int, int]) -> bool:
+        """Liegt `position` auf einer Zeilengrenze im Journal (z. B. aus einem Snapshot)?"""
+        segment_no, offset = position
+        path = self._segment_path(segment_no)
+        if offset == 0:
+            return path.exists()
+        try:
+            with path.open("rb") as f:
+                f.seek(offset - 1)
+                return f.read(1) == b"\n"
+        except OSError:
+            return False
+
+    def _segment_path(self, number: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
@@ -0,0 +1,166 @@
+"""
+Benachrichtigungen über Änderungen der Avatar-Belegung: ein kleiner
+Publish/Subscribe-Bus im Server-Prozess, optional über lokale Unix-Sockets
+mit anderen Prozessen auf derselben Maschine verbunden.
+
+WICHTIG:
+- Die Registry meldet jede Änderung (Avatar, belegt/frei, auslösende
+  Session) an den Bus; jede Browser-Session hat ein Abonnement und prüft
+  nur noch einen Zähler im Speicher – kein Datei- oder Datenbankzugriff,
+  solange sich nichts ändert.
+- Abonnements werden nur schwach referenziert: Endet eine Session, fällt
+  ihr Abonnement einfach weg.
+- Mehrere Prozesse (st.secrets OCCUPANCY_BUS_DIR): Jeder Prozess bindet
+  einen Datagramm-Socket in diesem Verzeichnis und schickt seine Änderungen
+  an alle anderen. Ohne Bridge bemerkt der Reaper-Thread fremde Änderungen
+  beim nächsten Lauf.
+"""
+
+import json
+import os
+import socket
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set
+
+
+# Avatar-Angabe für "irgendetwas hat sich geändert" (z. B. nach Neuladen)
+ANY = "*"
+
+
+class Subscription:
+    """Sammelt die geänderten Avatare eines Themas (Ortsverbands) bis zum nächsten `take()`."""
+
+    def __init__(self, topic: str, origin: Optional[str] = None, max_pending: int = 256) -> None:
+        self.topic = topic
+        self.origin = origin
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._changed: Set[str] = set()
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._changed)
+
+    def take(self) -> Set[str]:
+        """Geänderte Avatare seit dem letzten Aufruf (ANY: alles neu ansehen)."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            return changed
+
+    def _deliver(self, avatar: str) -> None:
+        with self._lock:
+            if ANY in self._changed:
+                return
+            if avatar == ANY or len(self._changed) >= self.max_pending:
+                self._changed = {ANY}
+            else:
+                self._changed.add(avatar)
+
+
+class OccupancyBus:
+    """Verteilt Belegungsänderungen an alle Abonnements desselben Themas."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscriptions: "weakref.WeakSet[Subscription]" = weakref.WeakSet()
+        self._bridge: Optional["SocketBridge"] = None
+        self._refreshers: Dict[str, Callable[[], None]] = {}
+        self.published = 0
+
+    def subscribe(self, topic: str, origin: Optional[str] = None) -> Subscription:
+        sub = Subscription(topic, origin)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def publish(self, topic: str, avatar: Optional[str], used: bool, origin: Optional[str] = None,
+                remote: bool = False) -> None:
+        """
+        Meldet eine Änderung. Die auslösende Session (`origin`) wird nicht
+        benachrichtigt – sie hat ihre Änderung ja selbst gemacht.
+        """
+        avatar = avatar or ANY
+        with self._lock:
+            subscribers = [s for s in self._subscriptions if s.topic == topic]
+            self.published += 1
+        for sub in subscribers:
+            if origin is None or sub.origin != origin:
+                sub._deliver(avatar)
+        if self._bridge is not None and not remote:
+            self._bridge.send(topic, avatar, used)
+
+    def attach(self, bridge: "SocketBridge") -> None:
+        self._bridge = bridge
+
+    def set_refresher(self, topic: str, refresh: Callable[[], None]) -> None:
+        """
+        Wie eine Meldung aus einem anderen Prozess verarbeitet wird: Die
+        Registry des Themas liest neu und meldet selbst, was sich geändert hat.
+        """
+        self._refreshers[topic] = refresh
+
+    def receive(self, topic: str, avatar: str, used: bool) -> None:
+        """Meldung aus einem anderen Prozess."""
+        refresh = self._refreshers.get(topic)
+        if refresh is not None:
+            refresh()
+        else:
+            self.publish(topic, avatar, used, remote=True)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+
+class SocketBridge:
+    """
+    Verbindet die Busse mehrerer Prozesse über Unix-Datagramm-Sockets in
+    einem gemeinsamen Verzeichnis (nur lokal, keine Netzwerk-Ports).
+    """
+
+    def __init__(self, bus: OccupancyBus, directory: Path) -> None:
+        self.bus = bus
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{os.getpid()}.sock"
+        self.path.unlink(missing_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._out.setblocking(False)             # nie auf einen langsamen Prozess warten
+        self._thread = threading.Thread(target=self._receive, name="occupancy-bridge", daemon=True)
+        self._thread.start()
+        bus.attach(self)
+
+    def send(self, topic: str, avatar: str, used: bool) -> None:
+        data = json.dumps({"t": topic, "a": avatar, "u": used}, ensure_ascii=False).encode("utf-8")
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            try:
+                self._out.sendto(data, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                peer.unlink(missing_ok=True)     # Prozess gibt es nicht mehr
+            except OSError:
+                pass                             # Puffer voll o. Ä.: der Reaper holt es nach
+
+    def close(self) -> None:
+        self._sock.close()
+        self._out.close()
+        self.path.unlink(missing_ok=True)
+
+    def _receive(self) -> None:
+        while True:
+            try:
+                data = self._sock.recv(4096)
+            except OSError:
+                return
+            try:
+                msg = json.loads(data)
+                self.bus.receive(msg["t"], msg["a"], bool(msg["u"]))
+            except (ValueError, KeyError):
+                continue
+            except Exception:
+                continue                         # z. B. Store kurz gesperrt: der Reaper holt es nach
@@ -0,0 +1,736 @@
+"""
+Postausgang für Umfrageergebnisse: Nachrichten werden zuerst auf die lokale
+Platte geschrieben und anschließend von einem Hintergrund-Thread über EINE
+langlebige SMTP-Verbindung versendet.
+
+WICHTIG:
+- Der Button-Handler wartet nicht mehr auf den SMTP-Server.
+- Fehlgeschlagene Sendungen werden mit exponentiell wachsender Wartezeit
+  erneut versucht; nach zu vielen Versuchen landen sie in "failed/".
+- Im Postausgang liegen nur die anonymen Antworten, wie sie auch per
+  E-Mail verschickt würden.
+- Optional (Sammelversand) werden viele Ergebnisse gebündelt und als EINE
+  E-Mail mit kompaktem Anhang (JSONL oder CSV, ggf. gzip) verschickt.
+- Der Worker sendet höchstens so schnell, wie es die Token-Buckets
+  erlauben (gesamt und je Empfänger). Ein Ansturm wird so geglättet statt
+  abgewiesen; die App zeigt Warteposition und geschätzte Wartezeit.
+"""
+
+import base64
+import bisect
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import dataclasses
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from instrumentation import gauge, incr, observe, span
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------
+# Dateihelfer
+# ------------------------------------------------------------
+
+def _write_json_atomic(path: Path, record: Dict[str, Any]) -> None:
+    """Schreibt erst in eine Temp-Datei und ersetzt dann atomar."""
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _flag(value: Any) -> bool:
+    """Ja/Nein aus st.secrets: TOML-Booleans, aber auch "false"/"0" als Text."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+# ------------------------------------------------------------
+# SMTP-Konfiguration und wiederverwendete Verbindung
+# ------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SmtpConfig:
+    host: str
+    port: int
+    user: str
+    password: str
+    mail_to: str
+    mail_from: str
+    use_ssl: bool = True
+
+    @classmethod
+    def from_secrets(cls, secrets: Mapping[str, Any]) -> "SmtpConfig":
+        """Liest die Zugangsdaten aus st.secrets (keine Hardcodes)."""
+        missing = [k for k in ["SMTP_HOST", "SMTP_USER", "SMTP_PASS", "MAIL_TO"] if secrets.get(k) is None]
+        if missing:
+            raise RuntimeError(f"Fehlende secrets: {', '.join(missing)}")
+        return cls(
+            host=secrets.get("SMTP_HOST"),
+            port=int(secrets.get("SMTP_PORT", 465)),
+            user=secrets.get("SMTP_USER"),
+            password=secrets.get("SMTP_PASS"),
+            mail_to=secrets.get("MAIL_TO"),
+            mail_from=secrets.get("MAIL_FROM", secrets.get("SMTP_USER")),
+            use_ssl=_flag(secrets.get("SMTP_SSL", True)),
+        )
+
+
+class SmtpConnection:
+    """
+    Hält eine SMTP-Verbindung offen und verwendet sie für alle Nachrichten.
+    Nach längerer Pause wird sie per NOOP geprüft und bei Bedarf neu aufgebaut.
+    """
+
+    def __init__(self, config: SmtpConfig, idle_check_after: float = 30.0, timeout: float = 30.0) -> None:
+        self.config = config
+        self.idle_check_after = idle_check_after
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def send(self, msg: MIMEMultipart) -> None:
+        server = self._ensure_connected()
+        try:
+            server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Verbindung wurde serverseitig geschlossen: einmal neu verbinden
+            self._resend(msg)
+        except smtplib.SMTPException:
+            # Antwort des Servers (z. B. 5xx, Empfänger abgelehnt): nicht sofort
+            # noch einmal senden – Wiederholung oder failed/ entscheidet der Worker
+            raise
+        except OSError:
+            # Socket-Fehler (SMTPException erbt auch von OSError, daher erst hier)
+            self._resend(msg)
+        self._last_used = time.monotonic()
+
+    def _resend(self, msg: MIMEMultipart) -> None:
+        self.close()
+        self._ensure_connected().send_message(msg)
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+    def _ensure_connected(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_check_after:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except Exception:
+                self.close()
+
+        if self._server is None:
+            cfg = self.config
+            if cfg.use_ssl:
+                server = smtplib.SMTP_SSL(cfg.host, cfg.port, timeout=self.timeout)
+            else:
+                server = smtplib.SMTP(cfg.host, cfg.port, timeout=self.timeout)
+            try:
+                if cfg.user and cfg.password:
+                    server.login(cfg.user, cfg.password)
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+            self._last_used = time.monotonic()
+        return self._server
+
+
+# ------------------------------------------------------------
+# Ratenbegrenzung (Token-Bucket)
+# ------------------------------------------------------------
+
+@dataclass(frozen=True)
+class RateLimit:
+    per_minute: float = 30.0              # 0: unbegrenzt
+    burst: int = 10                       # so viele gehen sofort hintereinander raus
+    per_recipient_per_minute: float = 0.0
+    recipient_burst: int = 5
+
+    @classmethod
+    def from_secrets(cls, secrets: Mapping[str, Any]) -> "RateLimit":
+        return cls(
+            per_minute=float(secrets.get("SMTP_RATE_PER_MINUTE", 30)),
+            burst=int(secrets.get("SMTP_BURST", 10)),
+            per_recipient_per_minute=float(secrets.get("SMTP_RATE_PER_RECIPIENT_PER_MINUTE", 0)),
+            recipient_burst=int(secrets.get("SMTP_RECIPIENT_BURST", 5)),
+        )
+
+
+class TokenBucket:
+    """
+    Klassischer Token-Bucket: `rate` Tokens pro Sekunde, höchstens `burst`
+    auf Vorrat. Nicht thread-sicher – wird nur vom Worker benutzt.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def tokens(self, now: Optional[float] = None) -> float:
+        self._refill(time.monotonic() if now is None else now)
+        return self._tokens
+
+    def available(self, now: Optional[float] = None) -> float:
+        """Wie `tokens()`, aber ohne den Zustand zu ändern (für Schätzungen aus anderen Threads)."""
+        elapsed = (time.monotonic() if now is None else now) - self._stamp
+        return min(self.burst, self._tokens + elapsed * self.rate)
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Sekunden, bis ein Token verfügbar ist (0: sofort)."""
+        missing = 1.0 - self.tokens(now)
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, now: Optional[float] = None) -> None:
+        self._refill(time.monotonic() if now is None else now)
+        self._tokens -= 1.0
+
+
+# ------------------------------------------------------------
+# Status einer Nachricht (für die Anzeige in der App)
+# ------------------------------------------------------------
+
+QUEUED = "queued"
+RETRYING = "retrying"
+SENT = "sent"
+FAILED = "failed"
+COLLECTED = "collected"
+UNKNOWN = "unknown"
+
+
+@dataclass(frozen=True)
+class OutboxStatus:
+    state: str
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_attempt: Optional[float] = None
+    queue_position: Optional[int] = None    # nur QUEUED: so viele Nachrichten sind vorher dran
+    eta_seconds: Optional[float] = None     # nur QUEUED: geschätzte Wartezeit bis zum Versand
+
+
+@dataclass(frozen=True)
+class OutboxBacklog:
+    depth: int              # wartende Nachrichten (inkl. erneuter Versuche)
+    wait_seconds: float     # geschätzte Zeit, bis alle raus sind
+
+
+# ------------------------------------------------------------
+# Postausgang auf der Platte + Hintergrund-Versand
+# ------------------------------------------------------------
+
+class Outbox:
+    """
+    Dauerhafte Warteschlange für ausgehende E-Mails.
+
+    Jede Nachricht ist eine eigene JSON-Datei in `pending/` (atomar per
+    os.replace geschrieben). Der Worker-Thread arbeitet sie der Reihe nach ab.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        connection: SmtpConnection,
+        *,
+        max_attempts: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        status_history: int = 10_000,
+        rate_limit: Optional[RateLimit] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.pending_dir = self.directory / "pending"
+        self.failed_dir = self.directory / "failed"
+        self.pending_dir.mkdir(parents=True, exist_ok=True)
+        self.failed_dir.mkdir(parents=True, exist_ok=True)
+
+        self.connection = connection
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.status_history = status_history
+
+        self.rate_limit = rate_limit or RateLimit(per_minute=0)
+        self._bucket: Optional[TokenBucket] = None
+        if self.rate_limit.per_minute > 0:
+            self._bucket = TokenBucket(self.rate_limit.per_minute / 60, self.rate_limit.burst)
+        self._recipient_buckets: Dict[str, TokenBucket] = {}
+
+        self._cond = threading.Condition()
+        self._status: "OrderedDict[str, OutboxStatus]" = OrderedDict()
+        self._queued: List[str] = []    # IDs noch nicht zugestellter Nachrichten, sortiert
+        self._due: Dict[str, Tuple[float, Optional[str]]] = {}   # ID -> (next_attempt, mail_to)
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Nachrichten aus einem früheren Lauf wieder aufnehmen
+        for path in sorted(self.pending_dir.glob("*.json")):
+            try:
+                record = _read_json(path)
+            except Exception:
+                path.replace(self.failed_dir / path.name)
+                continue
+            self._status[path.stem] = OutboxStatus(QUEUED)
+            self._queued.append(path.stem)
+            self._due[path.stem] = (record.get("next_attempt", 0.0), record.get("mail_to"))
+
+    # --------------------------------------------------------
+    # Öffentliche API
+    # --------------------------------------------------------
+
+    def enqueue(
+        self,
+        *,
+        subject: str,
+        body_text: str,
+        attachments: Sequence[Tuple[str, bytes, str]] = (),
+        mail_to: Optional[str] = None,
+    ) -> str:
+        """
+        Legt eine Nachricht im Postausgang ab und gibt ihre ID zurück.
+        `attachments` sind Tupel aus (Dateiname, Inhalt, MIME-Subtyp);
+        ohne `mail_to` geht sie an MAIL_TO aus der SMTP-Konfiguration.
+        """
+        message_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        record = {
+            "id": message_id,
+            "subject": subject,
+            "body_text": body_text,
+            "mail_to": mail_to,
+            "attachments": [
+                {"filename": name, "subtype": subtype, "data": base64.b64encode(data).decode("ascii")}
+                for name, data, subtype in attachments
+            ],
+            "attempts": 0,
+            "next_attempt": 0.0,
+            "enqueued_at": time.time(),
+        }
+        _write_json_atomic(self.pending_dir / f"{message_id}.json", record)
+        with self._cond:
+            self._set_status(message_id, OutboxStatus(QUEUED))
+            bisect.insort(self._queued, message_id)
+            self._due[message_id] = (0.0, mail_to)
+            self._cond.notify()
+        return message_id
+
+    def status(self, message_id: str) -> OutboxStatus:
+        with self._cond:
+            status = self._status.get(message_id, OutboxStatus(UNKNOWN))
+            if status.state != QUEUED:
+                return status
+            position = bisect.bisect_left(self._queued, message_id)
+            eta = self._eta(position + 1)
+            if self.rate_limit.per_recipient_per_minute > 0:
+                recipient = self._recipient_of(message_id)
+                ahead = sum(1 for mid in self._queued[:position + 1] if self._recipient_of(mid) == recipient)
+                eta = max(eta, self._recipient_eta(recipient, ahead))
+            return dataclasses.replace(status, queue_position=position, eta_seconds=eta)
+
+    def backlog(self) -> OutboxBacklog:
+        with self._cond:
+            depth = len(self._queued)
+            eta = self._eta(depth)
+            if self.rate_limit.per_recipient_per_minute > 0:
+                per_recipient: Dict[str, int] = {}
+                for mid in self._queued:
+                    recipient = self._recipient_of(mid)
+                    per_recipient[recipient] = per_recipient.get(recipient, 0) + 1
+                for recipient, count in per_recipient.items():
+                    eta = max(eta, self._recipient_eta(recipient, count))
+            return OutboxBacklog(depth, eta)
+
+    def pending_count(self) -> int:
+        return sum(1 for _ in self.pending_dir.glob("*.json"))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0, drain: bool = False) -> None:
+        """
+        Beendet den Worker. Mit `drain=True` wird vorher bis zu `timeout`
+        Sekunden gewartet, damit fällige Nachrichten noch rausgehen.
+        """
+        deadline = time.monotonic() + timeout
+        while drain and self._thread is not None and time.monotonic() < deadline:
+            if self._next_due(admit=False)[0] is None:
+                break
+            time.sleep(0.1)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.connection.close()
+
+    # --------------------------------------------------------
+    # Worker
+    # --------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+            try:
+                path, record, wait = self._next_due()
+                backlog = self.backlog()
+                gauge("umfrage_outbox_queue_depth", backlog.depth)
+                gauge("umfrage_outbox_backlog_seconds", backlog.wait_seconds)
+                if path is not None:
+                    self._deliver(path, record)
+                    continue
+            except Exception:
+                # z. B. Platte voll: nicht den Worker verlieren, später erneut versuchen
+                log.exception("Postausgang: Fehler im Worker")
+                incr("umfrage_outbox_worker_errors_total")
+                wait = self.base_delay
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(timeout=wait)
+
+    def _next_due(self, admit: bool = True):
+        """
+        Älteste fällige Nachricht – oder die Wartezeit bis zur nächsten.
+        Mit `admit` zählen nur Nachrichten, für die die Token-Buckets (gesamt
+        und für den Empfänger) gerade ein Token haben; das wird dann verbraucht.
+        Ausgewählt wird über den Index im Speicher; gelesen wird nur die
+        Datei der Nachricht, die tatsächlich dran ist.
+        """
+        now = time.time()
+        mono = time.monotonic()
+        wait = None
+        if admit and self._bucket is not None:
+            throttled = self._bucket.delay(mono)
+            if throttled > 0:
+                return None, None, throttled
+        with self._cond:
+            candidates = [(mid, *self._due[mid]) for mid in self._queued if mid in self._due]
+        for message_id, due, mail_to in candidates:
+            if due > now:
+                wait = due - now if wait is None else min(wait, due - now)
+                continue
+            recipient = None
+            if admit:
+                recipient = self._recipient_bucket(mail_to or self.connection.config.mail_to)
+                if recipient is not None:
+                    throttled = recipient.delay(mono)
+                    if throttled > 0:
+                        # Dieser Empfänger muss warten – andere vielleicht nicht
+                        wait = throttled if wait is None else min(wait, throttled)
+                        continue
+            path = self.pending_dir / f"{message_id}.json"
+            try:
+                record = _read_json(path)
+            except FileNotFoundError:
+                self._dequeue(message_id)
+                continue
+            except Exception:
+                path.replace(self.failed_dir / path.name)
+                self._update(message_id, OutboxStatus(FAILED, last_error="unlesbar"))
+                self._dequeue(message_id)
+                continue
+            if admit:
+                if recipient is not None:
+                    recipient.take(mono)
+                if self._bucket is not None:
+                    self._bucket.take(mono)
+            return path, record, 0.0
+        return None, None, wait
+
+    def _recipient_bucket(self, recipient: str) -> Optional[TokenBucket]:
+        limit = self.rate_limit
+        if limit.per_recipient_per_minute <= 0:
+            return None
+        bucket = self._recipient_buckets.get(recipient)
+        if bucket is None:
+            bucket = self._recipient_buckets[recipient] = TokenBucket(
+                limit.per_recipient_per_minute / 60, limit.recipient_burst
+            )
+        return bucket
+
+    def _eta(self, position: int) -> float:
+        """Geschätzte Sekunden, bis die `position`-te wartende Nachricht dran ist (Gesamt-Bucket)."""
+        if self._bucket is None:
+            return 0.0
+        missing = position - self._bucket.available()
+        return max(0.0, missing / self._bucket.rate)
+
+    def _recipient_eta(self, recipient: str, position: int) -> float:
+        """Wie `_eta`, aber für die `position`-te wartende Nachricht an `recipient` (Empfänger-Bucket)."""
+        limit = self.rate_limit
+        bucket = self._recipient_buckets.get(recipient)
+        tokens = bucket.available() if bucket is not None else float(max(1, limit.recipient_burst))
+        return max(0.0, (position - tokens) / (limit.per_recipient_per_minute / 60))
+
+    def _recipient_of(self, message_id: str) -> str:
+        """Empfänger einer wartenden Nachricht (nur unter `_cond`)."""
+        return self._due.get(message_id, (0.0, None))[1] or self.connection.config.mail_to
+
+    def _deliver(self, path: Path, record: Dict[str, Any]) -> None:
+        message_id = record["id"]
+        try:
+            with span("smtp_send"):
+                self.connection.send(self._build_message(record))
+        except Exception as e:
+            incr("umfrage_smtp_errors_total")
+            attempts = record.get("attempts", 0) + 1
+            record["attempts"] = attempts
+            record["last_error"] = str(e)
+            if attempts >= self.max_attempts:
+                path.replace(self.failed_dir / path.name)
+                self._update(message_id, OutboxStatus(FAILED, attempts, str(e)))
+                self._dequeue(message_id)
+                return
+            delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+            record["next_attempt"] = time.time() + delay * random.uniform(0.8, 1.2)
+            _write_json_atomic(path, record)
+            with self._cond:
+                self._due[message_id] = (record["next_attempt"], record.get("mail_to"))
+            self.connection.close()
+            self._update(message_id, OutboxStatus(RETRYING, attempts, str(e), record["next_attempt"]))
+            return
+
+        path.unlink(missing_ok=True)
+        incr("umfrage_mails_sent_total")
+        if "enqueued_at" in record:
+            observe("umfrage_outbox_queue_seconds", time.time() - record["enqueued_at"])
+        self._update(message_id, OutboxStatus(SENT, record.get("attempts", 0) + 1))
+        self._dequeue(message_id)
+
+    def _build_message(self, record: Dict[str, Any]) -> MIMEMultipart:
+        cfg = self.connection.config
+        msg = MIMEMultipart()
+        msg["Subject"] = record["subject"]
+        msg["From"] = cfg.mail_from
+        msg["To"] = record.get("mail_to") or cfg.mail_to
+        msg.attach(MIMEText(record["body_text"], "plain", "utf-8"))
+        for att in record.get("attachments", []):
+            part = MIMEApplication(base64.b64decode(att["data"]), _subtype=att["subtype"])
+            part.add_header("Content-Disposition", "attachment", filename=att["filename"])
+            msg.attach(part)
+        return msg
+
+    # --------------------------------------------------------
+    # Interne Helfer
+    # --------------------------------------------------------
+
+    def _update(self, message_id: str, status: OutboxStatus) -> None:
+        with self._cond:
+            self._set_status(message_id, status)
+
+    def _dequeue(self, message_id: str) -> None:
+        with self._cond:
+            i = bisect.bisect_left(self._queued, message_id)
+            if i < len(self._queued) and self._queued[i] == message_id:
+                del self._queued[i]
+            self._due.pop(message_id, None)
+
+    def _set_status(self, message_id: str, status: OutboxStatus) -> None:
+        self._status[message_id] = status
+        self._status.move_to_end(message_id)
+        while len(self._status) > self.status_history:
+            self._status.popitem(last=False)
+
+
+# ------------------------------------------------------------
+# Sammelversand (Digest): viele Ergebnisse in einer E-Mail
+# ------------------------------------------------------------
+
+@dataclass(frozen=True)
+class DigestConfig:
+    max_count: int = 50             # spätestens nach so vielen Ergebnissen senden
+    window_seconds: float = 3600.0  # ... oder wenn das älteste so lange wartet
+    fmt: str = "jsonl"              # "jsonl" oder "csv"
+    compress: bool = False          # Anhang zusätzlich gzip-komprimieren
+
+    @classmethod
+    def from_secrets(cls, secrets: Mapping[str, Any]) -> Optional["DigestConfig"]:
+        """Gibt None zurück, wenn der Sammelversand nicht aktiviert ist."""
+        if not _flag(secrets.get("DIGEST_MODE", False)):
+            return None
+        fmt = str(secrets.get("DIGEST_FORMAT", "jsonl")).lower()
+        if fmt not in ("jsonl", "csv"):
+            raise RuntimeError(f"Unbekanntes DIGEST_FORMAT: {fmt}")
+        return cls(
+            max_count=int(secrets.get("DIGEST_MAX_COUNT", 50)),
+            window_seconds=float(secrets.get("DIGEST_WINDOW_MINUTES", 60)) * 60,
+            fmt=fmt,
+            compress=_flag(secrets.get("DIGEST_GZIP", False)),
+        )
+
+
+def encode_digest(payloads: List[Dict[str, Any]], fmt: str, compress: bool) -> Tuple[str, bytes, str]:
+    """
+    Baut den kompakten Anhang. Das Schema jedes Ergebnisses bleibt das des
+    Sende-Buttons (timestamp_utc, avatar, answers); CSV legt es flach
+    (<frage>.selected mit " | " verbunden, <frage>.other).
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    if fmt == "csv":
+        questions: List[str] = []
+        for p in payloads:
+            for q, a in p.get("answers", {}).items():
+                if isinstance(a, dict) and q not in questions:
+                    questions.append(q)
+        header = ["timestamp_utc", "avatar"]
+        for q in questions:
+            header += [f"{q}.selected", f"{q}.other"]
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(header)
+        for p in payloads:
+            answers = p.get("answers", {})
+            row = [p.get("timestamp_utc", ""), p.get("avatar", "")]
+            for q in questions:
+                a = answers.get(q) or {}
+                row += [" | ".join(a.get("selected", [])), a.get("other", "")]
+            writer.writerow(row)
+        data = buf.getvalue().encode("utf-8")
+        name, subtype = f"umfrage-{stamp}.csv", "csv"
+    else:
+        lines = [json.dumps(p, ensure_ascii=False, separators=(",", ":")) for p in payloads]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        name, subtype = f"umfrage-{stamp}.jsonl", "jsonl"
+
+    if compress:
+        data = gzip.compress(data)
+        name, subtype = name + ".gz", "gzip"
+    return name, data, subtype
+
+
+class DigestCollector:
+    """
+    Sammelt Ergebnisse (je eine Datei in `digest/`, also absturzsicher) und
+    legt sie gebündelt als EINE Nachricht mit Anhang in den Postausgang,
+    sobald `max_count` erreicht ist oder das älteste `window_seconds` wartet.
+    """
+
+    def __init__(
+        self, directory: Path, outbox: Outbox, config: DigestConfig, mail_to: Optional[str] = None
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.outbox = outbox
+        self.config = config
+        self.mail_to = mail_to
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._flushed: "OrderedDict[str, str]" = OrderedDict()   # Ergebnis-ID -> Nachrichten-ID
+        self._thread = threading.Thread(target=self._run, name="digest-timer", daemon=True)
+        self._thread.start()
+
+    def add(self, payload: Dict[str, Any]) -> str:
+        """Nimmt ein Ergebnis auf und gibt seine ID zurück."""
+        result_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        _write_json_atomic(self.directory / f"{result_id}.json", payload)
+        if self._count() >= self.config.max_count:
+            self.flush()
+        else:
+            self._wake.set()
+        return result_id
+
+    def status(self, result_id: str) -> OutboxStatus:
+        with self._lock:
+            message_id = self._flushed.get(result_id)
+        if message_id is not None:
+            return self.outbox.status(message_id)
+        if (self.directory / f"{result_id}.json").exists():
+            return OutboxStatus(COLLECTED)
+        return OutboxStatus(UNKNOWN)
+
+    def flush(self) -> Optional[str]:
+        """Verschickt alle gesammelten Ergebnisse als eine Nachricht."""
+        with self._lock:
+            paths = sorted(self.directory.glob("*.json"))
+            if not paths:
+                return None
+            payloads = [_read_json(p) for p in paths]
+            attachment = encode_digest(payloads, self.config.fmt, self.config.compress)
+            message_id = self.outbox.enqueue(
+                subject=f"Umfrageergebnisse (Sammelversand, {len(payloads)} Antworten)",
+                body_text=(
+                    f"Im Anhang stehen {len(payloads)} anonyme Umfrageergebnisse "
+                    f"({payloads[0].get('timestamp_utc', '?')} bis {payloads[-1].get('timestamp_utc', '?')}).\n"
+                ),
+                attachments=[attachment],
+                mail_to=self.mail_to,
+            )
+            # Erst nach dem sicheren Ablegen im Postausgang löschen
+            for p in paths:
+                p.unlink(missing_ok=True)
+                self._flushed[p.stem] = message_id
+            while len(self._flushed) > self.outbox.status_history:
+                self._flushed.popitem(last=False)
+            return message_id
+
+    def close(self) -> None:
+        """Beim Herunterfahren: Restbestand sofort verschicken."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(5.0)
+        self.flush()
+
+    def _count(self) -> int:
+        return sum(1 for _ in self.directory.glob("*.json"))
+
+    def _oldest_age(self) -> Optional[float]:
+        paths = sorted(self.directory.glob("*.json"))
+        if not paths:
+            return None
+        created_ns = int(paths[0].stem.split("-", 1)[0])
+        return time.time() - created_ns / 1e9
+
+    def _run(self) -> None:
+        while not self._stopping:
+            age = self._oldest_age()
+            if age is not None and age >= self.config.window_seconds:
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+                continue
+            timeout = None if age is None else self.config.window_seconds - age
+            self._wake.wait(timeout)
+            self._wake.clear()
@@ -0,0 +1,188 @@
+"""
+Auswertungsseite (nur für den Vorstand): live Stimmungsbild aus der
+laufenden Auszählung. Zugang über st.secrets ADMIN_PASSWORD bzw. das
+admin_password des Ortsverbands.
+"""
+
+import hmac
+import io
+from typing import Dict
+
+import matplotlib
+matplotlib.use("Agg")  # ohne Display rendern
+import matplotlib.pyplot as plt
+import pandas as pd
+import streamlit as st
+
+from assets import DARK_GREEN_RGB, LIGHT_GREEN_RGB, mpl_color
+from pdf_export import report_html
+from resources import (
+    current_tenant, get_freetext, get_journal, get_secret, get_survey, get_tallies, get_tenants,
+    render_pdf_export,
+)
+from tenants import Tenant
+
+st.set_page_config(
+    page_title="Auswertung – Mitgliederumfrage",
+    page_icon="📊",
+    layout="wide"
+)
+
+# Diagrammfarben wie im Umfrage-Design
+BAR_COLOR = mpl_color(LIGHT_GREEN_RGB)
+TEXT_COLOR = mpl_color(DARK_GREEN_RGB)
+
+
+def select_tenant() -> Tenant:
+    """Ortsverband der Auswertung: aus ?ov= oder per Auswahl (nur bei mehreren)."""
+    tenants = get_tenants()
+    if not tenants.multi:
+        return tenants.all()[0]
+    options = tenants.all()
+    preselected = current_tenant()
+    return st.selectbox(
+        "Ortsverband",
+        options,
+        index=options.index(preselected) if preselected in options else 0,
+        format_func=lambda t: t.name or t.tenant_id,
+    )
+
+
+def check_admin(tenant: Tenant) -> bool:
+    """Einfacher Passwortschutz; ohne hinterlegtes Passwort bleibt die Seite zu."""
+    expected = tenant.admin_password or get_secret("ADMIN_PASSWORD")
+    if expected is None:
+        st.error("Die Auswertung ist gesperrt: In den Secrets ist kein ADMIN_PASSWORD hinterlegt.")
+        return False
+    ok_key = f"admin_ok_{tenant.tenant_id}"
+    if st.session_state.get(ok_key):
+        return True
+
+    pw = st.text_input("Passwort", type="password", key=f"pw_{tenant.tenant_id}")
+    if pw and hmac.compare_digest(pw.encode("utf-8"), str(expected).encode("utf-8")):
+        st.session_state[ok_key] = True
+        return True
+    if pw:
+        st.error("Falsches Passwort.")
+    return False
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_bar_chart(tenant_id: str, question: str, version: int, _counts: Dict[str, int]) -> bytes:
+    """
+    Rendert ein Balkendiagramm als PNG. Zwischengespeichert über
+    (Ortsverband, Frage, Version der Auszählung) – `_counts` geht nicht in den
+    Schlüssel ein. Die Version zählt nur innerhalb eines Ortsverbands, daher
+    gehört `tenant_id` in den Schlüssel.
+    """
+    items = sorted(_counts.items(), key=lambda kv: kv[1])
+    fig, ax = plt.subplots(figsize=(7, 0.45 * max(len(items), 1) + 0.8))
+    ax.barh([k for k, _ in items], [v for _, v in items], color=BAR_COLOR)
+    ax.set_title(question, color=TEXT_COLOR, loc="left")
+    ax.tick_params(colors=TEXT_COLOR)
+    ax.xaxis.get_major_locator().set_params(integer=True)
+    for side in ("top", "right"):
+        ax.spines[side].set_visible(False)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=110)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def question_titles(tenant_id: str) -> Dict[str, str]:
+    """Fragetexte des aktiven Fragebogens (Schlüssel -> Titel)."""
+    return {q.key: q.title for q in get_survey(tenant_id).questions}
+
+
+def render_freetext(tenant_id: str, titles: Dict[str, str]) -> None:
+    """Freitexte je Frage: häufige Wörter und Wortpaare, fast gleiche Antworten."""
+    stats = get_freetext(tenant_id)
+    questions = stats.questions()
+    if not questions:
+        return
+
+    st.markdown("### Sonstiges (Freitexte)")
+    for question in questions:
+        summary = stats.summary(question)
+        with st.expander(f"{titles.get(question, question)} – {summary.answers} Freitexte"):
+            c1, c2 = st.columns(2)
+            c1.dataframe(pd.DataFrame(summary.terms, columns=["Wort", "Anzahl"]), hide_index=True)
+            c2.dataframe(pd.DataFrame(summary.bigrams, columns=["Wortpaar", "Anzahl"]), hide_index=True)
+            if summary.groups:
+                st.markdown("**Ähnliche Antworten**")
+                st.dataframe(
+                    pd.DataFrame(
+                        [{"Antwort": g.representative, "ähnliche": g.count,
+                          "Beispiele": " · ".join(g.examples[1:])} for g in summary.groups]
+                    ),
+                    hide_index=True,
+                )
+
+
+def render_dashboard(tenant_id: str) -> None:
+    snap = get_tallies(tenant_id).snapshot()
+    titles = question_titles(tenant_id)
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Abgaben", snap.submissions)
+    c2.metric("Verschiedene Avatare", len(snap.avatar_counts))
+    c3.metric("Freitexte", sum(snap.other_counts.values()))
+
+    if snap.submissions == 0:
+        st.info("Noch keine Abgaben.")
+        return
+
+    st.markdown("### Antworten je Frage")
+    cols = st.columns(2)
+    for i, question in enumerate(snap.questions):
+        counts = snap.option_counts.get(question, {})
+        with cols[i % 2]:
+            if counts:
+                st.image(render_bar_chart(tenant_id, titles.get(question, question), snap.version, counts))
+            else:
+                st.caption(f"{titles.get(question, question)}: keine Auswahl")
+
+    st.markdown("### Häufig gemeinsam gewählt")
+    pairs = sorted(snap.co_occurrence.items(), key=lambda kv: kv[1], reverse=True)[:20]
+    st.dataframe(
+        pd.DataFrame(
+            [{"Antwort A": a, "Antwort B": b, "gemeinsam": n} for (a, b), n in pairs]
+        ),
+        hide_index=True,
+    )
+
+    render_freetext(tenant_id, titles)
+
+    st.markdown("### Avatar-Nutzung")
+    st.dataframe(
+        pd.DataFrame(
+            sorted(snap.avatar_counts.items(), key=lambda kv: kv[1], reverse=True),
+            columns=["Avatar", "Abgaben"],
+        ),
+        hide_index=True,
+    )
+
+
+st.title("📊 Stimmungsbild")
+
+tenant = select_tenant()
+tenant_id = tenant.tenant_id
+
+if check_admin(tenant):
+    if get_journal(tenant_id) is None:
+        st.caption(
+            "Hinweis: Ohne Ergebnis-Journal (RESULTS_JOURNAL) zählt die Auswertung "
+            "nur Abgaben seit dem letzten Neustart des Servers."
+        )
+    st.fragment(render_dashboard, run_every=5)(tenant_id)
+
+    render_pdf_export(
+        lambda: report_html(get_tallies(tenant_id).snapshot(), get_survey(tenant_id).subtitle,
+                            question_titles(tenant_id)),
+        key=f"pdf_report_{tenant_id}",
+        label="Stimmungsbild als PDF",
+        file_name="stimmungsbild.pdf",
+        persist=True,
+    )
@@ -0,0 +1,250 @@
+"""
+PDF-Export der eigenen Antworten und des zusammengefassten Stimmungsbilds.
+
+WICHTIG:
+- wkhtmltopdf (über pdfkit) läuft in einem kleinen Prozess-Pool, nie im
+  Skript-Thread der Session; die Session fragt nur nach dem Stand.
+- Ergebnisse werden über einen Hash des HTML-Inhalts zwischengespeichert:
+  identische Exporte sind sofort fertig.
+- Persönliche Exporte (eigene Antworten) bleiben nur im Speicher – höchstens
+  `memory_items` Stück für `memory_ttl` Sekunden – und landen nie auf der
+  Platte. Nur das zusammengefasste Stimmungsbild (`persist=True`) wird in
+  `cache_dir` abgelegt.
+- Die HTML-Vorlagen werden einmal beim Import vorbereitet.
+"""
+
+import hashlib
+import html
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from string import Template
+from typing import Any, Dict, Optional, Tuple
+
+from aggregation import TallySnapshot
+
+
+# ------------------------------------------------------------
+# HTML-Vorlagen (einmal kompiliert)
+# ------------------------------------------------------------
+
+_PAGE = Template("""<!DOCTYPE html>
+<html lang="de"><head><meta charset="utf-8">
+<style>
+  body { font-family: "PT Sans", Arial, sans-serif; color: rgb(0, 85, 56); margin: 0; }
+  .title-block { background: rgb(138, 189, 36); padding: 14px 18px; border-radius: 12px; }
+  .title-block h1 { margin: 0; font-size: 22pt; font-style: italic; }
+  .title-block h2 { margin: 4px 0 0 0; font-size: 12pt; font-weight: normal; }
+  h3 { margin: 18px 0 6px 0; font-size: 13pt; }
+  ul { margin: 0; padding-left: 20px; }
+  table { border-collapse: collapse; width: 100%; }
+  td, th { border-bottom: 1px solid rgba(0, 85, 56, 0.25); padding: 3px 6px; text-align: left; }
+  td.n { text-align: right; width: 60px; }
+  .muted { color: #557; font-style: italic; }
+</style></head>
+<body>
+<div class="title-block"><h1>$title</h1><h2>$subtitle</h2></div>
+$content
+</body></html>
+""")
+
+_QUESTION = Template("<h3>$title</h3>\n$body\n")
+
+
+def _esc(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def answers_html(
+    payload: Dict[str, Any],
+    subtitle: str = "Ortsverband – Bündnis 90/Die Grünen",
+    titles: Optional[Dict[str, str]] = None,
+) -> str:
+    """HTML der Antworten einer Person (Schema des Sende-Buttons)."""
+    titles = titles or {}
+    parts = []
+    for question, answer in (payload.get("answers") or {}).items():
+        if not isinstance(answer, dict):
+            continue
+        items = [f"<li>{_esc(opt)}</li>" for opt in answer.get("selected", [])]
+        other = str(answer.get("other", "")).strip()
+        if other:
+            items.append(f"<li><i>Sonstiges:</i> {_esc(other)}</li>")
+        body = f"<ul>{''.join(items)}</ul>" if items else '<p class="muted">keine Angabe</p>'
+        parts.append(_QUESTION.substitute(title=_esc(titles.get(question, question)), body=body))
+
+    avatar = payload.get("avatar") or "–"
+    return _PAGE.substitute(
+        title=f"Meine Antworten {_esc(avatar)}",
+        subtitle=_esc(subtitle),
+        content="".join(parts),
+    )
+
+
+def report_html(
+    snap: TallySnapshot,
+    subtitle: str = "Ortsverband – Bündnis 90/Die Grünen",
+    titles: Optional[Dict[str, str]] = None,
+) -> str:
+    """HTML des zusammengefassten Stimmungsbilds (ohne Zeitstempel, damit gleiche Stände gleich hashen)."""
+    titles = titles or {}
+    parts = [f"<p>Abgaben: <b>{snap.submissions}</b></p>"]
+    for question in snap.questions:
+        counts = sorted(snap.option_counts.get(question, {}).items(), key=lambda kv: kv[1], reverse=True)
+        rows = "".join(f"<tr><td>{_esc(opt)}</td><td class='n'>{n}</td></tr>" for opt, n in counts)
+        others = snap.other_counts.get(question, 0)
+        if others:
+            rows += f"<tr><td><i>Sonstiges (Freitext)</i></td><td class='n'>{others}</td></tr>"
+        parts.append(_QUESTION.substitute(title=_esc(titles.get(question, question)), body=f"<table>{rows}</table>"))
+
+    return _PAGE.substitute(
+        title="Stimmungsbild",
+        subtitle=_esc(subtitle),
+        content="".join(parts),
+    )
+
+
+# ------------------------------------------------------------
+# Rendern im Prozess-Pool
+# ------------------------------------------------------------
+
+def pdf_available() -> bool:
+    """True, wenn pdfkit importierbar und wkhtmltopdf installiert ist."""
+    return importlib.util.find_spec("pdfkit") is not None and shutil.which("wkhtmltopdf") is not None
+
+
+def render_pdf(html_text: str) -> bytes:
+    """Läuft im Worker-Prozess."""
+    import pdfkit
+
+    return pdfkit.from_string(
+        html_text,
+        False,
+        options={"encoding": "UTF-8", "quiet": "", "page-size": "A4"},
+    )
+
+
+READY = "ready"
+RUNNING = "running"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+@dataclass(frozen=True)
+class PdfJobStatus:
+    state: str
+    error: Optional[str] = None
+
+
+class PdfExporter:
+    """
+    Nimmt HTML entgegen und liefert sofort einen Schlüssel (SHA-256 des
+    Inhalts). Gerendert wird in einem begrenzten Prozess-Pool; fertige PDFs
+    landen mit `persist=True` in `cache_dir/<schlüssel>.pdf`, sonst in einem
+    kleinen Zwischenspeicher im Speicher, der nach `memory_ttl` verfällt.
+    """
+
+    def __init__(
+        self, cache_dir: Path, max_workers: int = 2, memory_items: int = 64, memory_ttl: float = 900.0
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self.memory_ttl = memory_ttl
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Future] = {}
+        # Beide verfallen nach `memory_ttl`: Schlüssel -> (Ablauf, PDF bzw. Fehlermeldung)
+        self._memory: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self._errors: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        # "spawn": kein fork() aus dem mehrfädigen Streamlit-Server heraus
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def submit(self, html_text: str, persist: bool = False) -> str:
+        """`persist`: nur für Exporte ohne persönliche Antworten (Stimmungsbild)."""
+        key = hashlib.sha256(html_text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self._cached(key) is not None or key in self._jobs:
+                return key
+            if persist and self._path(key).exists():
+                return key
+            self._errors.pop(key, None)
+            future = self._pool.submit(render_pdf, html_text)
+            self._jobs[key] = future
+        future.add_done_callback(lambda f, key=key: self._finish(key, f, persist))
+        return key
+
+    def status(self, key: str) -> PdfJobStatus:
+        with self._lock:
+            if key in self._jobs:
+                return PdfJobStatus(RUNNING)
+            self._expire()
+            if key in self._errors:
+                return PdfJobStatus(FAILED, self._errors[key][1])
+            if self._cached(key) is not None:
+                return PdfJobStatus(READY)
+        if self._path(key).exists():
+            return PdfJobStatus(READY)
+        return PdfJobStatus(UNKNOWN)
+
+    def result(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._cached(key)
+        if data is not None:
+            return data
+        try:
+            return self._path(key).read_bytes()
+        except OSError:
+            return None
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, key: str, future: Future, persist: bool) -> None:
+        try:
+            data = future.result()
+            if persist:
+                tmp = self._path(key).with_suffix(".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, self._path(key))
+            else:
+                with self._lock:
+                    self._remember(self._memory, key, data)
+        except Exception as e:
+            with self._lock:
+                self._remember(self._errors, key, str(e) or e.__class__.__name__)
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def _remember(self, entries: OrderedDict, key: str, value: Any) -> None:
+        """Neuer Eintrag mit Ablaufzeit; höchstens `memory_items` Stück. Nur unter `_lock`."""
+        entries.pop(key, None)
+        entries[key] = (time.monotonic() + self.memory_ttl, value)
+        while len(entries) > self.memory_items:
+            entries.popitem(last=False)
+
+    def _expire(self) -> None:
+        """Verwirft abgelaufene PDFs und Fehlermeldungen (älteste zuerst). Nur unter `_lock`."""
+        now = time.monotonic()
+        for entries in (self._memory, self._errors):
+            while entries and next(iter(entries.values()))[0] <= now:
+                entries.popitem(last=False)
+
+    def _cached(self, key: str) -> Optional[bytes]:
+        """Persönlicher Export aus dem Speicher (Abgelaufenes wird vorher verworfen). Nur unter `_lock`."""
+        self._expire()
+        entry = self._memory.get(key)
+        return entry[1] if entry is not None else None
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
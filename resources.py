@@ -0,0 +1,511 @@
+"""
+Gemeinsame, prozessweite Ressourcen der App: Reservierungs-Store,
+Postausgang, Journal, Auszählung, Fragebögen und PDF-Export.
+
+WICHTIG:
+- Alle Fabrikfunktionen sind mit st.cache_resource markiert und liegen in
+  diesem Modul, damit die Umfrage und die Auswertungsseite dieselben
+  Instanzen teilen.
+- Was einem Ortsverband gehört (Store, Journal, Auszählung, Sammelversand),
+  wird pro `tenant_id` angelegt (siehe tenants.py); Postausgang, Katalog,
+  Avatar-Räume und PDF-Pool gibt es nur einmal pro Prozess.
+"""
+
+import atexit
+import dataclasses
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+from aggregation import Tallies
+from freetext import FreeTextStats
+from idempotency import IdempotencyIndex
+from instrumentation import incr
+from avatar_space import AvatarSpace
+from avatar_store import AvatarRegistry, ReservationStore
+from ingest import IngestServer, validate_batch
+from journal import ResultsJournal
+from occupancy_bus import OccupancyBus, SocketBridge
+from survey_schema import Survey, SurveyCatalog
+from snapshots import Compactor, Recovery, SnapshotStore, compact, recover
+from pdf_export import FAILED as PDF_FAILED, READY as PDF_READY, RUNNING as PDF_RUNNING, UNKNOWN as PDF_UNKNOWN
+from pdf_export import PdfExporter, pdf_available
+from outbox import (
+    DigestCollector, DigestConfig, Outbox, OutboxStatus, RateLimit, SmtpConfig, SmtpConnection, encode_digest,
+)
+from tenants import DEFAULT_TENANT, QUERY_PARAM, Tenant, TenantDirectory
+
+
+def get_secret(key: str, default: Any = None) -> Any:
+    """
+    Liest einen optionalen Wert aus st.secrets. Gibt es gar keine
+    secrets.toml, gilt der Standardwert (statt eines Fehlers).
+    """
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError:
+        return default
+
+
+# ------------------------------------------------------------
+# Mandanten (Ortsverbände)
+# ------------------------------------------------------------
+
+@st.cache_resource
+def get_tenants() -> TenantDirectory:
+    """Alle Ortsverbände aus st.secrets [tenants.<id>] (ohne: nur "default")."""
+    return TenantDirectory.from_secrets(
+        {"tenants": get_secret("tenants")},
+        data_root=Path(get_secret("TENANT_DATA_DIR", "tenants")),
+    )
+
+
+def get_tenant(tenant_id: str = DEFAULT_TENANT) -> Tenant:
+    tenant = get_tenants().get(tenant_id)
+    if tenant is None:
+        raise KeyError(f"Unbekannter Ortsverband: {tenant_id}")
+    return tenant
+
+
+def current_tenant() -> Optional[Tenant]:
+    """Ortsverband dieser Session laut Query-Parameter `?ov=`; None, wenn unbekannt."""
+    return get_tenants().get(st.query_params.get(QUERY_PARAM))
+
+
+# ------------------------------------------------------------
+# Fragebögen (einmal pro Prozess geladen und geprüft)
+# ------------------------------------------------------------
+
+@st.cache_resource
+def get_survey_catalog() -> SurveyCatalog:
+    return SurveyCatalog.load()
+
+
+def get_survey(tenant_id: str = DEFAULT_TENANT) -> Survey:
+    """
+    Aktiver Fragebogen des Ortsverbands (sonst laut st.secrets SURVEY_ID /
+    SURVEY_VERSION); ein hinterlegter Name ersetzt den Untertitel.
+    """
+    tenant = get_tenant(tenant_id)
+    if tenant.survey_id is not None:
+        survey = get_survey_catalog().get(tenant.survey_id, tenant.survey_version)
+    else:
+        survey = get_survey_catalog().get(
+            get_secret("SURVEY_ID", "ortsverband"),
+            tenant.survey_version or get_secret("SURVEY_VERSION"),
+        )
+    if tenant.name:
+        survey = dataclasses.replace(survey, subtitle=tenant.name)
+    return survey
+
+
+# ------------------------------------------------------------
+# Avatar-Belegung
+# ------------------------------------------------------------
+
+AVATAR_FILE = Path("used_avatars.json")  # Altbestand, wird einmalig übernommen
+AVATAR_DB = Path("avatars.sqlite3")
+
+
+@st.cache_resource
+def get_reservation_store(tenant_id: str = DEFAULT_TENANT) -> ReservationStore:
+    """
+    Ein Reservierungs-Store pro Ortsverband und Server-Prozess (SQLite,
+    WAL-Modus). Beim ersten Start werden Einträge aus used_avatars.json
+    übernommen.
+    """
+    data_dir = get_tenant(tenant_id).data_dir
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return ReservationStore(data_dir / AVATAR_DB, legacy_json=data_dir / AVATAR_FILE)
+
+
+@st.cache_resource
+def get_avatar_space(size: Optional[int] = None) -> AvatarSpace:
+    """
+    Alle wählbaren Avatare (Standard: nur die Tier-Emojis, darüber Tier +
+    Farbe / Nummer). Ortsverbände mit gleicher Größe teilen sich eine Instanz.
+    """
+    return AvatarSpace(size)
+
+
+@st.cache_resource
+def get_avatar_registry(tenant_id: str = DEFAULT_TENANT) -> AvatarRegistry:
+    """
+    Eine gemeinsame Avatar-Registry pro Server-Prozess.
+    Die Belegung wird nur neu gelesen, wenn ein anderer Prozess den Store
+    geändert hat. Reservierungen aus der Auswahl sind Leases
+    (st.secrets AVATAR_LEASE_MINUTES, Standard 10), die offene Tabs per
+    Heartbeat verlängern; ein Hintergrund-Thread räumt abgelaufene ab.
+    Größe des Avatar-Raums: avatar_space_size des Ortsverbands oder
+    st.secrets AVATAR_SPACE_SIZE.
+    """
+    size = get_tenant(tenant_id).avatar_space_size or get_secret("AVATAR_SPACE_SIZE")
+    registry = AvatarRegistry(
+        get_reservation_store(tenant_id),
+        get_avatar_space(int(size) if size is not None else None),
+        lease_seconds=float(get_secret("AVATAR_LEASE_MINUTES", 10)) * 60,
+    )
+    bus = get_occupancy_bus()
+    registry.add_listener(lambda avatar, used, origin: bus.publish(tenant_id, avatar, used, origin))
+    bus.set_refresher(tenant_id, registry.refresh)
+    registry.start_reaper(interval=lease_reap_interval(registry.lease_seconds))
+    atexit.register(registry.stop_reaper)
+    return registry
+
+
+@st.cache_resource
+def get_occupancy_bus() -> OccupancyBus:
+    """
+    Meldet Belegungsänderungen an die offenen Sessions (Thema: tenant_id).
+    Mit st.secrets OCCUPANCY_BUS_DIR tauschen mehrere Server-Prozesse auf
+    derselben Maschine ihre Änderungen über Unix-Sockets in diesem
+    Verzeichnis aus.
+    """
+    bus = OccupancyBus()
+    directory = get_secret("OCCUPANCY_BUS_DIR")
+    if directory:
+        bridge = SocketBridge(bus, Path(directory))
+        atexit.register(bridge.close)
+    return bus
+
+
+def lease_reap_interval(lease_seconds: float) -> float:
+    """Heartbeat- und Aufräum-Takt: ein Fünftel der Lease-Dauer, höchstens eine Minute."""
+    return max(1.0, min(60.0, lease_seconds / 5))
+
+
+# ------------------------------------------------------------
+# E-Mail-Versand über den Postausgang (Hintergrund-Thread)
+# ------------------------------------------------------------
+
+OUTBOX_DIR = Path("outbox")
+
+
+@st.cache_resource
+def get_outbox() -> Outbox:
+    """
+    Ein gemeinsamer Postausgang pro Server-Prozess (für alle Ortsverbände;
+    der Empfänger steht an jeder Nachricht) mit einer langlebigen
+    SMTP-Verbindung. Die Versandrate begrenzen SMTP_RATE_PER_MINUTE /
+    SMTP_BURST (gesamt) und SMTP_RATE_PER_RECIPIENT_PER_MINUTE /
+    SMTP_RECIPIENT_BURST (je Empfänger, also je Ortsverband). Credentials werden ausschließlich über st.secrets
+    bezogen (keine Hardcodes); fehlen sie, wird nichts zwischengespeichert.
+    """
+    config = SmtpConfig.from_secrets(st.secrets)
+    outbox = Outbox(OUTBOX_DIR, SmtpConnection(config), rate_limit=RateLimit.from_secrets(st.secrets))
+    outbox.start()
+    atexit.register(outbox.stop, drain=True)
+    return outbox
+
+
+@st.cache_resource
+def get_digest(tenant_id: str = DEFAULT_TENANT) -> Optional[DigestCollector]:
+    """
+    Sammelversand (optional, über st.secrets DIGEST_MODE = true):
+    Ergebnisse werden pro Ortsverband gesammelt und gebündelt als eine
+    E-Mail verschickt. Beim Herunterfahren wird der Restbestand noch
+    abgeschickt.
+    """
+    config = DigestConfig.from_secrets(st.secrets)
+    if config is None:
+        return None
+    directory = OUTBOX_DIR / ("digest" if tenant_id == DEFAULT_TENANT else f"digest-{tenant_id}")
+    collector = DigestCollector(directory, get_outbox(), config, mail_to=get_tenant(tenant_id).mail_to)
+    atexit.register(collector.close)
+    return collector
+
+
+def send_results_email(*, subject: str, body_text: str, mail_to: Optional[str] = None) -> str:
+    """
+    Legt eine E-Mail im Postausgang ab und kehrt sofort zurück.
+    Der eigentliche Versand läuft im Hintergrund; der Rückgabewert ist die
+    Nachrichten-ID, über die sich der Status abfragen lässt.
+    """
+    return get_outbox().enqueue(subject=subject, body_text=body_text, mail_to=mail_to)
+
+
+# ------------------------------------------------------------
+# Journal & Auszählung
+# ------------------------------------------------------------
+
+@st.cache_resource
+def get_journal(tenant_id: str = DEFAULT_TENANT) -> Optional[ResultsJournal]:
+    """
+    Lokales, anonymes Ergebnis-Journal pro Ortsverband (optional, über
+    st.secrets RESULTS_JOURNAL = true). Ohne Opt-in werden keine Antworten
+    gespeichert.
+    """
+    if not get_secret("RESULTS_JOURNAL", False):
+        return None
+    journal = ResultsJournal(
+        get_tenant(tenant_id).data_dir / get_secret("RESULTS_JOURNAL_DIR", "results_journal"),
+        segment_bytes=int(float(get_secret("RESULTS_JOURNAL_SEGMENT_MB", 8)) * 1024 * 1024),
+    )
+    atexit.register(journal.close)
+    return journal
+
+
+SNAPSHOT_DIR = Path("snapshots")
+
+
+@st.cache_resource
+def get_compactor() -> Compactor:
+    """
+    Schreibt alle SNAPSHOT_MINUTES (Standard 10) und beim Herunterfahren
+    die Snapshots für den nächsten Start (siehe snapshots.py).
+    """
+    compactor = Compactor(interval=float(get_secret("SNAPSHOT_MINUTES", 10)) * 60)
+    atexit.register(compactor.stop)
+    return compactor
+
+
+@st.cache_resource
+def get_recovered_state(tenant_id: str = DEFAULT_TENANT) -> Recovery:
+    """
+    Auszählung und Freitext-Statistik eines Ortsverbands nach dem Start:
+    neuester Snapshot plus der Rest des Journals (falls aktiviert), danach
+    wird Abgabe für Abgabe fortgeschrieben. Das Verdichten zu einem neuen
+    Snapshot läuft im Hintergrund.
+    """
+    journal = get_journal(tenant_id)
+    if journal is None:
+        return Recovery(Tallies(), FreeTextStats(), None, 0, 0, 0.0)
+    store = SnapshotStore(get_tenant(tenant_id).data_dir / SNAPSHOT_DIR)
+    expand = get_survey_catalog().expand_payload
+    state = recover(journal, store, expand)
+    get_compactor().add(lambda: compact(journal, store, expand))
+    return state
+
+
+def get_tallies(tenant_id: str = DEFAULT_TENANT) -> Tallies:
+    """Laufende Auszählung für das Stimmungsbild eines Ortsverbands."""
+    return get_recovered_state(tenant_id).tallies
+
+
+def get_freetext(tenant_id: str = DEFAULT_TENANT) -> FreeTextStats:
+    """
+    Laufende Freitext-Auswertung (Wörter, Wortpaare, Gruppen fast gleicher
+    Antworten) eines Ortsverbands.
+    """
+    return get_recovered_state(tenant_id).freetext
+
+
+@st.cache_resource
+def get_submission_index() -> IdempotencyIndex:
+    """
+    Bereits angenommene Abgaben (Schlüssel -> Nachrichten-ID), gemeinsam für
+    alle Sessions; Einträge verfallen nach SUBMIT_DEDUPE_MINUTES (Standard 60).
+    Der Index wird mit den übrigen Snapshots gesichert, damit z. B. ein
+    wiederholter Stapel der Sammeleingabe auch nach einem Neustart erkannt wird.
+    """
+    index = IdempotencyIndex(ttl=float(get_secret("SUBMIT_DEDUPE_MINUTES", 60)) * 60)
+    store = SnapshotStore(SNAPSHOT_DIR, name="dedupe")
+    snapshot = store.load()
+    if snapshot is not None:
+        index.restore(snapshot.state["entries"])
+    get_compactor().add(lambda: store.write({"entries": index.export()}))
+    return index
+
+
+def submit_results(
+    payload: Dict[str, Any],
+    tenant_id: str = DEFAULT_TENANT,
+    idempotency_key: Optional[str] = None,
+) -> str:
+    """
+    Gibt ein Ergebnis in den Versand: einzeln als E-Mail oder – im
+    Sammelversand – in den nächsten Digest. Liefert eine ID für den Status.
+    Ist das Journal aktiviert, wird das Ergebnis vorher dort abgelegt;
+    in die laufende Auszählung geht es in jedem Fall ein.
+
+    Journal und JSONL-Sammelversand speichern die kompakte Form (Masken);
+    die einzelne E-Mail und der CSV-Anhang bleiben für Menschen lesbar.
+
+    Mit `idempotency_key` wird eine Wiederholung (gleicher Schlüssel) nicht
+    erneut gespeichert oder verschickt; zurück kommt die ID der ersten Abgabe.
+    """
+    if idempotency_key is not None:
+        message_id, duplicate = get_submission_index().run_once(
+            f"{tenant_id}:{idempotency_key}", lambda: submit_results(payload, tenant_id)
+        )
+        if duplicate:
+            incr("umfrage_duplicate_submissions_total")
+        return message_id
+
+    # Zuerst den Versandweg holen: fehlende Secrets fallen so vor dem Speichern auf
+    digest = get_digest(tenant_id)
+    get_outbox()
+    # Auszählungen vor dem Journal-Eintrag anlegen – sonst zählte ihr
+    # erstes Einlesen des Journals diese Abgabe gleich mit
+    tallies = get_tallies(tenant_id)
+    freetext = get_freetext(tenant_id)
+
+    readable = get_survey_catalog().expand_payload(payload)
+
+    journal = get_journal(tenant_id)
+    if journal is not None:
+        journal.append(payload)
+
+    if digest is not None:
+        message_id = digest.add(payload if digest.config.fmt == "jsonl" else readable)
+    else:
+        avatar = payload.get("avatar") or "Unbekannt"
+        subject = f'Neues Umfrageergebnis von "{avatar}"'
+        body = json.dumps(readable, ensure_ascii=False, indent=2)
+        message_id = send_results_email(subject=subject, body_text=body, mail_to=get_tenant(tenant_id).mail_to)
+
+    tallies.add(readable)
+    freetext.add_payload(readable)
+    return message_id
+
+
+def submit_batch(payloads: List[Dict[str, Any]], tenant_id: str = DEFAULT_TENANT) -> Optional[str]:
+    """
+    Wie submit_results, aber für einen ganzen Stapel geprüfter Abgaben:
+    EIN Journal-Schreibvorgang (ein fsync), EINE E-Mail mit dem Stapel als
+    Anhang (Format des Sammelversands, sonst JSONL) und die Auszählungen
+    in einem Durchgang.
+    """
+    if not payloads:
+        return None
+    outbox = get_outbox()
+    digest = get_digest(tenant_id)
+    tallies = get_tallies(tenant_id)
+    freetext = get_freetext(tenant_id)
+
+    catalog = get_survey_catalog()
+    readable = [catalog.expand_payload(p) for p in payloads]
+
+    journal = get_journal(tenant_id)
+    if journal is not None:
+        journal.append_many(payloads)
+
+    fmt, compress = (digest.config.fmt, digest.config.compress) if digest is not None else ("jsonl", False)
+    message_id = outbox.enqueue(
+        subject=f"Umfrageergebnisse (Sammeleingabe, {len(payloads)} Antworten)",
+        body_text=(
+            f"Im Anhang stehen {len(payloads)} anonyme Umfrageergebnisse aus der Sammeleingabe "
+            f"({payloads[0]['timestamp_utc']} bis {payloads[-1]['timestamp_utc']}).\n"
+        ),
+        attachments=[encode_digest(payloads if fmt == "jsonl" else readable, fmt, compress)],
+        mail_to=get_tenant(tenant_id).mail_to,
+    )
+
+    tallies.add_many(readable)
+    freetext.add_many(readable)
+    incr("umfrage_ingested_total", len(payloads))
+    return message_id
+
+
+def ingest_batch(
+    tenant_id: Optional[str], records: List[Any], idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Stapel der Sammeleingabe: prüfen, gültige Abgaben übernehmen, Fehler je
+    Datensatz melden. Ein wiederholter Stapel (gleicher Idempotency-Key)
+    wird nicht noch einmal übernommen.
+    """
+    tenant = get_tenant(tenant_id or DEFAULT_TENANT)
+    valid, errors = validate_batch(records, get_survey_catalog(), tenant.tenant_id, get_tenants().multi)
+    if errors:
+        incr("umfrage_ingest_rejected_total", len(errors))
+
+    duplicate = False
+    if idempotency_key is not None:
+        message_id, duplicate = get_submission_index().run_once(
+            f"{tenant.tenant_id}:ingest:{idempotency_key}", lambda: submit_batch(valid, tenant.tenant_id)
+        )
+    else:
+        message_id = submit_batch(valid, tenant.tenant_id)
+    return {
+        "accepted": 0 if duplicate else len(valid),
+        "rejected": len(errors),
+        "duplicate": duplicate,
+        "message_id": message_id,
+        "errors": errors,
+    }
+
+
+@st.cache_resource
+def get_ingest_server() -> Optional[IngestServer]:
+    """
+    Sammeleingabe über HTTP (optional, über st.secrets INGEST_PORT), nur
+    auf Loopback (INGEST_HOST, Standard 127.0.0.1). Siehe ingest.py.
+    """
+    port = get_secret("INGEST_PORT")
+    if port is None:
+        return None
+    server = IngestServer(
+        (get_secret("INGEST_HOST", "127.0.0.1"), int(port)),
+        ingest_batch,
+        token=get_secret("INGEST_TOKEN"),
+        max_bytes=int(float(get_secret("INGEST_MAX_MB", 16)) * 1024 * 1024),
+    ).start()
+    atexit.register(server.shutdown)
+    return server
+
+
+def get_delivery_status(message_id: str, tenant_id: str = DEFAULT_TENANT) -> OutboxStatus:
+    digest = get_digest(tenant_id)
+    if digest is not None:
+        return digest.status(message_id)
+    return get_outbox().status(message_id)
+
+
+# ------------------------------------------------------------
+# PDF-Export (Rendern im Hintergrund, Session fragt nur nach)
+# ------------------------------------------------------------
+
+PDF_CACHE_DIR = Path("pdf_cache")
+
+
+@st.cache_resource
+def get_pdf_exporter() -> PdfExporter:
+    """Ein begrenzter Prozess-Pool für wkhtmltopdf pro Server-Prozess."""
+    exporter = PdfExporter(PDF_CACHE_DIR, max_workers=int(get_secret("PDF_WORKERS", 2)))
+    atexit.register(exporter.shutdown)
+    return exporter
+
+
+def render_pdf_export(
+    build_html: Callable[[], str], *, key: str, label: str, file_name: str, persist: bool = False
+) -> None:
+    """
+    Button für einen PDF-Export. Das Rendern blockiert die Session nicht:
+    Ein Fragment fragt jede Sekunde nach, bis das PDF bereitsteht.
+    `persist=True` nur für Exporte ohne persönliche Antworten (siehe PdfExporter).
+    """
+    if not pdf_available():
+        st.caption("PDF-Export ist auf diesem Server nicht verfügbar (wkhtmltopdf fehlt).")
+        return
+
+    exporter = get_pdf_exporter()
+    if st.button(label, key=f"{key}_button"):
+        st.session_state[key] = exporter.submit(build_html(), persist=persist)
+
+    job = st.session_state.get(key)
+    if job is None:
+        return
+    if exporter.status(job).state == PDF_UNKNOWN:
+        del st.session_state[key]     # verfallen (persönliche Exporte) – neu anfordern
+        return
+
+    def show_status() -> None:
+        status = exporter.status(job)
+        if status.state == PDF_READY:
+            data = exporter.result(job)
+            if data is not None:
+                st.download_button("📄 PDF herunterladen", data=data, file_name=file_name,
+                                   mime="application/pdf", key=f"{key}_download")
+        elif status.state == PDF_FAILED:
+            st.error(f"PDF konnte nicht erstellt werden: {status.error}")
+        else:
+            st.info("PDF wird erstellt …")
+        # Fertig: einmal komplett neu laden, damit das Nachfragen aufhört
+        if status.state != PDF_RUNNING and polling:
+            st.rerun()
+
+    polling = exporter.status(job).state == PDF_RUNNING
+    st.fragment(show_status, run_every=1 if polling else None)()
@@ -0,0 +1,187 @@
+"""
+Snapshots für einen schnellen Kaltstart: Auszählung und Freitext-Statistik
+werden regelmäßig verdichtet abgelegt, zusammen mit der Journal-Position,
+bis zu der sie reichen. Beim Start wird der neueste gültige Snapshot
+geladen und nur das Journal dahinter nachgelesen.
+
+WICHTIG:
+- Dateiformat: eine JSON-Kopfzeile (Format, Position, Länge, SHA-256) und
+  danach der zlib-komprimierte Zustand als JSON. Geschrieben wird in eine
+  temporäre Datei, per fsync gesichert und dann umbenannt – ein Absturz
+  hinterlässt nie einen halben Snapshot. Passt die Prüfsumme nicht, wird
+  der nächstältere genommen (oder alles nachgelesen).
+- Das Verdichten (`compact`) arbeitet nur auf Snapshot und Journal, nie auf
+  den laufenden Zählern: neuester Snapshot + Journal-Rest = neuer Snapshot.
+  Dadurch braucht es keine gemeinsame Sperre mit den Abgaben.
+- Das Journal selbst bleibt vollständig (es ist die eigentliche Ablage der
+  Ergebnisse); verdichtet wird nur, was beim Start nachgelesen werden muss.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aggregation import Tallies
+from freetext import FreeTextStats
+from journal import ResultsJournal
+
+FORMAT = 1
+SUFFIX = ".snap"
+
+
+@dataclass
+class Snapshot:
+    meta: Dict[str, Any]
+    state: Dict[str, Any]
+    path: Path
+
+
+class SnapshotStore:
+    """Die letzten `keep` Snapshots eines Namens in einem Verzeichnis."""
+
+    def __init__(self, directory: Path, name: str = "state", keep: int = 2) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def paths(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{self.name}-*{SUFFIX}"))
+
+    def write(self, state: Dict[str, Any], **meta: Any) -> Path:
+        body = zlib.compress(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+        header = {
+            "format": FORMAT, "created": time.time(), "bytes": len(body),
+            "sha256": hashlib.sha256(body).hexdigest(), **meta,
+        }
+        with self._lock:
+            path = self.directory / f"{self.name}-{time.time_ns():020d}{SUFFIX}"
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+            for old in self.paths()[:-self.keep]:
+                old.unlink(missing_ok=True)
+            return path
+
+    def load(self) -> Optional[Snapshot]:
+        """Neuester Snapshot mit gültiger Prüfsumme (sonst None)."""
+        for path in reversed(self.paths()):
+            try:
+                with open(path, "rb") as f:
+                    meta = json.loads(f.readline())
+                    body = f.read()
+                if meta.get("format") != FORMAT or len(body) != meta["bytes"]:
+                    continue
+                if hashlib.sha256(body).hexdigest() != meta["sha256"]:
+                    continue
+                return Snapshot(meta, json.loads(zlib.decompress(body)), path)
+            except (OSError, ValueError, KeyError, zlib.error):
+                continue
+        return None
+
+
+# ------------------------------------------------------------
+# Zustand aus Journal und Snapshot
+# ------------------------------------------------------------
+
+@dataclass
+class Recovery:
+    tallies: Tallies
+    freetext: FreeTextStats
+    position: Optional[Tuple[int, int]]   # hinter dem letzten eingerechneten Datensatz
+    from_snapshot: int                     # Abgaben aus dem Snapshot
+    replayed: int                          # aus dem Journal nachgelesen
+    seconds: float
+
+
+def recover(
+    journal: ResultsJournal, store: Optional[SnapshotStore], expand: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> Recovery:
+    """
+    Neuester Snapshot + Journal dahinter. Passt der Snapshot nicht zum
+    Journal (Position fehlt, z. B. nach einem Austausch der Dateien), wird
+    das ganze Journal gelesen.
+    """
+    t0 = time.perf_counter()
+    snapshot = store.load() if store is not None else None
+    position = None
+    if snapshot is not None and journal.contains(tuple(snapshot.meta["position"])):
+        tallies = Tallies.from_state(snapshot.state["tallies"])
+        freetext = FreeTextStats.from_state(snapshot.state["freetext"])
+        position = tuple(snapshot.meta["position"])
+    else:
+        tallies, freetext = Tallies(), FreeTextStats()
+    from_snapshot = tallies.snapshot().submissions
+
+    replayed = 0
+    for record, position in journal.iter_with_positions(start=position):
+        readable = expand(record)
+        tallies.add(readable)
+        freetext.add_payload(readable)
+        replayed += 1
+    return Recovery(tallies, freetext, position, from_snapshot, replayed, time.perf_counter() - t0)
+
+
+def compact(
+    journal: ResultsJournal, store: SnapshotStore, expand: Callable[[Dict[str, Any]], Dict[str, Any]],
+    min_records: int = 1,
+) -> Optional[Path]:
+    """Neuen Snapshot schreiben, wenn seit dem letzten mindestens `min_records` Abgaben dazugekommen sind."""
+    rec = recover(journal, store, expand)
+    if rec.position is None or rec.replayed < min_records:
+        return None
+    return store.write(
+        {"tallies": rec.tallies.to_state(), "freetext": rec.freetext.to_state()},
+        position=list(rec.position),
+        submissions=rec.tallies.snapshot().submissions,
+    )
+
+
+class Compactor:
+    """Hintergrund-Thread, der alle `interval` Sekunden die angemeldeten Aufgaben ausführt."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._tasks: List[Callable[[], Any]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, task: Callable[[], Any]) -> None:
+        self._tasks.append(task)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-compactor", daemon=True)
+            self._thread.start()
+
+    def run_once(self) -> None:
+        for task in list(self._tasks):
+            try:
+                task()
+            except Exception:
+                pass   # z. B. Platte voll: der alte Snapshot bleibt gültig, nächster Lauf versucht es wieder
+
+    def stop(self) -> None:
+        """Beim Herunterfahren: ein letzter Lauf, damit der nächste Start wenig nachlesen muss."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.run_once()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
@@ -0,0 +1,246 @@
+"""
+Deklarative Fragebögen: Die Fragen stehen als JSON in `surveys/` und werden
+einmal pro Prozess geladen, geprüft und in unveränderliche Strukturen mit
+vorberechneten Widget-Schlüsseln übersetzt.
+
+WICHTIG:
+- Neue oder geänderte Fragen brauchen keine Code-Änderung: einfach eine
+  neue Datei (oder eine neue "version") in `surveys/` ablegen.
+- Mehrere Fragebögen und Versionen können nebeneinander bestehen.
+- Antworten werden kompakt gespeichert: pro Frage EINE Ganzzahl (Bit i =
+  Option i) plus optional Freitext. Welche Bits welche Option bedeuten,
+  legt das Codebuch fest (Fragebogen-ID, Version und ein Hash über Fragen
+  und Optionen). Ändert sich die Reihenfolge der Optionen, braucht es eine
+  neue "version" – sonst passen alte Masken nicht mehr.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SURVEY_DIR = Path(__file__).parent / "surveys"
+
+
+class SurveySchemaError(ValueError):
+    """Ein Fragebogen in `surveys/` ist unvollständig oder widersprüchlich."""
+
+
+@dataclass(frozen=True)
+class Question:
+    key: str                      # Schlüssel in den Antworten, z. B. "q1_motive"
+    prefix: str                   # Präfix der Widget-Schlüssel, z. B. "q1"
+    title: str
+    options: Tuple[str, ...]      # Reihenfolge = Bit-Position in der Maske
+    max_choices: Optional[int]
+    option_keys: Tuple[str, ...]  # vorberechnet: f"{prefix}_cb_{i}"
+    other_key: str                # vorberechnet: f"{prefix}_other"
+    mask_key: str                 # vorberechnet: f"{prefix}_mask" (Session State)
+    limit_caption: Optional[str]  # vorberechnet: Hinweis auf max_choices
+
+    def selected(self, mask: int) -> List[str]:
+        """Optionen einer Maske in Fragebogen-Reihenfolge."""
+        return [opt for i, opt in enumerate(self.options) if mask >> i & 1]
+
+    def mask(self, selected: List[str]) -> int:
+        index = {opt: i for i, opt in enumerate(self.options)}
+        mask = 0
+        for opt in selected:
+            if opt not in index:
+                raise SurveySchemaError(f"{self.key}: unbekannte Option '{opt}'")
+            mask |= 1 << index[opt]
+        return mask
+
+    def check_mask(self, mask: Any) -> int:
+        """Maske von außen (Browser, Import) prüfen: nur bekannte Optionen, höchstens max_choices."""
+        if not isinstance(mask, int) or isinstance(mask, bool) or mask < 0 or mask >> len(self.options):
+            raise SurveySchemaError(f"{self.key}: ungültige Auswahl {mask!r}")
+        if self.max_choices is not None and bin(mask).count("1") > self.max_choices:
+            raise SurveySchemaError(f"{self.key}: höchstens {self.max_choices} Antworten erlaubt")
+        return mask
+
+
+@dataclass(frozen=True)
+class Survey:
+    survey_id: str
+    version: int
+    title: str
+    subtitle: str
+    questions: Tuple[Question, ...]
+    codebook: str                 # z. B. "ortsverband/1/3f9c2a1b"
+
+    def compact(self, masks: Dict[str, int], other: Dict[str, str]) -> Dict[str, Any]:
+        """Kompakte Antworten: nur gesetzte Masken und ausgefüllte Freitexte."""
+        return {
+            "codebook": self.codebook,
+            "masks": {q.key: masks[q.key] for q in self.questions if masks.get(q.key)},
+            "other": {q.key: other[q.key] for q in self.questions if str(other.get(q.key, "")).strip()},
+        }
+
+    def validate(self, masks: Any, other: Any) -> Dict[str, Any]:
+        """
+        Wie compact(), aber für Antworten, die nicht aus den eigenen Widgets
+        stammen: unbekannte Fragen, fremde Bits, zu viele Antworten oder
+        Freitexte, die keine Zeichenkette sind, lösen SurveySchemaError aus.
+        """
+        if not isinstance(masks, dict) or not isinstance(other, dict):
+            raise SurveySchemaError("masks und other müssen Objekte sein")
+        keys = {q.key for q in self.questions}
+        unknown = (set(masks) | set(other)) - keys
+        if unknown:
+            raise SurveySchemaError(f"unbekannte Fragen: {', '.join(sorted(map(str, unknown)))}")
+        for q in self.questions:
+            q.check_mask(masks.get(q.key, 0))
+            if not isinstance(other.get(q.key, ""), str):
+                raise SurveySchemaError(f"{q.key}: Freitext muss eine Zeichenkette sein")
+        return self.compact(masks, other)
+
+    def expand(self, masks: Dict[str, int], other: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """Lesbare Antworten ({frage: {"selected": [...], "other": ...}}), verlustfrei."""
+        return {
+            q.key: {"selected": q.selected(masks.get(q.key, 0)), "other": other.get(q.key, "")}
+            for q in self.questions
+        }
+
+    def compress(self, answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Gegenstück zu expand(): lesbare Antworten in die kompakte Form."""
+        masks, other = {}, {}
+        for q in self.questions:
+            answer = answers.get(q.key)
+            if isinstance(answer, dict):
+                masks[q.key] = q.mask(answer.get("selected", []))
+                other[q.key] = answer.get("other", "")
+        return self.compact(masks, other)
+
+
+def codebook_id(survey_id: str, version: int, questions: List[Question]) -> str:
+    layout = json.dumps([[q.key, list(q.options)] for q in questions], ensure_ascii=False)
+    return f"{survey_id}/{version}/{hashlib.sha256(layout.encode('utf-8')).hexdigest()[:8]}"
+
+
+def compile_survey(data: Dict[str, Any], source: str = "<dict>") -> Survey:
+    """Prüft die Rohdaten eines Fragebogens und übersetzt sie."""
+
+    def fail(msg: str) -> None:
+        raise SurveySchemaError(f"{source}: {msg}")
+
+    for field in ("id", "version", "title", "questions"):
+        if field not in data:
+            fail(f"Feld '{field}' fehlt")
+    if not isinstance(data["version"], int) or data["version"] < 1:
+        fail("'version' muss eine positive ganze Zahl sein")
+    if not isinstance(data["questions"], list) or not data["questions"]:
+        fail("'questions' muss eine nicht-leere Liste sein")
+
+    questions: List[Question] = []
+    seen_keys, seen_prefixes = set(), set()
+    for i, q in enumerate(data["questions"], start=1):
+        where = f"Frage {i}"
+        for field in ("key", "prefix", "title", "options"):
+            if field not in q:
+                fail(f"{where}: Feld '{field}' fehlt")
+        key, prefix = str(q["key"]), str(q["prefix"])
+        if key in seen_keys:
+            fail(f"{where}: Schlüssel '{key}' kommt doppelt vor")
+        if prefix in seen_prefixes:
+            fail(f"{where}: Präfix '{prefix}' kommt doppelt vor")
+        seen_keys.add(key)
+        seen_prefixes.add(prefix)
+
+        options = tuple(str(o) for o in q["options"])
+        if not options:
+            fail(f"{where}: keine Optionen")
+        if len(set(options)) != len(options):
+            fail(f"{where}: Optionen kommen doppelt vor")
+
+        max_choices = q.get("max_choices")
+        if max_choices is not None:
+            if not isinstance(max_choices, int) or not 1 <= max_choices <= len(options):
+                fail(f"{where}: 'max_choices' muss zwischen 1 und {len(options)} liegen")
+
+        questions.append(Question(
+            key=key,
+            prefix=prefix,
+            title=str(q["title"]),
+            options=options,
+            max_choices=max_choices,
+            option_keys=tuple(f"{prefix}_cb_{i}" for i in range(len(options))),
+            other_key=f"{prefix}_other",
+            mask_key=f"{prefix}_mask",
+            limit_caption=(
+                f"Bitte höchstens **{max_choices}** Antworten auswählen."
+                if max_choices is not None else None
+            ),
+        ))
+
+    return Survey(
+        survey_id=str(data["id"]),
+        version=data["version"],
+        title=str(data["title"]),
+        subtitle=str(data.get("subtitle", "")),
+        questions=tuple(questions),
+        codebook=codebook_id(str(data["id"]), data["version"], questions),
+    )
+
+
+class SurveyCatalog:
+    """Alle Fragebögen eines Verzeichnisses, nach (id, version) abgelegt."""
+
+    def __init__(self, surveys: List[Survey]) -> None:
+        self._surveys: Dict[Tuple[str, int], Survey] = {}
+        self._codebooks: Dict[str, Survey] = {}
+        for survey in surveys:
+            ident = (survey.survey_id, survey.version)
+            if ident in self._surveys:
+                raise SurveySchemaError(f"Fragebogen {ident[0]} v{ident[1]} ist doppelt vorhanden")
+            self._surveys[ident] = survey
+            self._codebooks[survey.codebook] = survey
+
+    @classmethod
+    def load(cls, directory: Path = SURVEY_DIR) -> "SurveyCatalog":
+        surveys = []
+        for path in sorted(Path(directory).glob("*.json")):
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                raise SurveySchemaError(f"{path.name}: kein gültiges JSON ({e})") from e
+            surveys.append(compile_survey(data, source=path.name))
+        return cls(surveys)
+
+    def get(self, survey_id: str, version: Optional[int] = None) -> Survey:
+        """Ohne Versionsangabe wird die neueste Version geliefert."""
+        if version is not None:
+            try:
+                return self._surveys[(survey_id, int(version))]
+            except KeyError:
+                raise SurveySchemaError(f"Fragebogen {survey_id} v{version} nicht gefunden") from None
+        versions = [v for (sid, v) in self._surveys if sid == survey_id]
+        if not versions:
+            raise SurveySchemaError(f"Fragebogen {survey_id} nicht gefunden")
+        return self._surveys[(survey_id, max(versions))]
+
+    def all(self) -> List[Survey]:
+        return list(self._surveys.values())
+
+    def by_codebook(self, codebook: str) -> Survey:
+        try:
+            return self._codebooks[codebook]
+        except KeyError:
+            raise SurveySchemaError(
+                f"Codebuch {codebook} unbekannt (Fragebogen geändert, ohne die Version zu erhöhen?)"
+            ) from None
+
+    def expand_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Abgabe in lesbarer Form (Schema des Sende-Buttons mit "answers").
+        Lesbare Abgaben (z. B. aus älteren Journalen) bleiben unverändert.
+        """
+        if "masks" not in payload:
+            return payload
+        survey = self.by_codebook(payload["codebook"])
+        readable = {k: v for k, v in payload.items() if k not in ("codebook", "masks", "other")}
+        readable["answers"] = survey.expand(payload["masks"], payload.get("other", {}))
+        return readable
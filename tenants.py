@@ -0,0 +1,93 @@
+"""
+Mandanten: eine Installation für mehrere Ortsverbände.
+
+Jeder Ortsverband steht als eigene Tabelle in den Secrets, z. B.
+
+    [tenants.nord]
+    name = "Ortsverband Nord"           # Untertitel im Titelblock
+    mail_to = "vorstand-nord@example.org"
+    survey_id = "ortsverband"           # optional, sonst SURVEY_ID
+    survey_version = 1                  # optional
+    avatar_space_size = 120             # optional, sonst AVATAR_SPACE_SIZE
+    admin_password = "..."              # optional, sonst ADMIN_PASSWORD
+
+und wird über den Query-Parameter `?ov=nord` aufgerufen.
+
+WICHTIG:
+- Ohne [tenants] gibt es genau einen Mandanten "default" mit den bisherigen
+  globalen Secrets und Dateipfaden – bestehende Installationen ändern sich nicht.
+- Pro Mandant getrennt: Avatar-Store, Journal, Auszählung, Sammelversand,
+  Fragebogen und Empfänger. Geteilt: Fragebogen-Katalog, Assets, der
+  Postausgang mit seiner SMTP-Verbindung und der PDF-Pool.
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+
+DEFAULT_TENANT = "default"
+QUERY_PARAM = "ov"
+
+_TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+
+class TenantConfigError(ValueError):
+    """Die [tenants]-Einträge in den Secrets sind unvollständig oder ungültig."""
+
+
+@dataclass(frozen=True)
+class Tenant:
+    tenant_id: str
+    data_dir: Path                       # Avatar-Store, Journal usw. dieses Mandanten
+    name: Optional[str] = None           # ersetzt den Untertitel des Fragebogens
+    mail_to: Optional[str] = None        # None: MAIL_TO aus den Secrets
+    survey_id: Optional[str] = None
+    survey_version: Optional[int] = None
+    avatar_space_size: Optional[int] = None
+    admin_password: Optional[str] = None
+
+
+class TenantDirectory:
+    """Alle Mandanten aus den Secrets, nach ID abgelegt."""
+
+    def __init__(self, tenants: List[Tenant], multi: bool) -> None:
+        self._tenants: Dict[str, Tenant] = {t.tenant_id: t for t in tenants}
+        self.multi = multi
+
+    @classmethod
+    def from_secrets(cls, secrets: Mapping[str, Any], data_root: Path = Path("tenants")) -> "TenantDirectory":
+        raw = secrets.get("tenants")
+        if not raw:
+            return cls([Tenant(DEFAULT_TENANT, data_dir=Path("."))], multi=False)
+
+        tenants = []
+        for tenant_id, cfg in raw.items():
+            if not _TENANT_ID.match(tenant_id):
+                raise TenantConfigError(
+                    f"Mandant '{tenant_id}': nur Kleinbuchstaben, Ziffern, '-' und '_' (max. 40 Zeichen)"
+                )
+            if not isinstance(cfg, Mapping):
+                raise TenantConfigError(f"Mandant '{tenant_id}': Eintrag muss eine Tabelle sein")
+            size = cfg.get("avatar_space_size")
+            version = cfg.get("survey_version")
+            tenants.append(Tenant(
+                tenant_id=tenant_id,
+                data_dir=Path(data_root) / tenant_id,
+                name=cfg.get("name"),
+                mail_to=cfg.get("mail_to"),
+                survey_id=cfg.get("survey_id"),
+                survey_version=int(version) if version is not None else None,
+                avatar_space_size=int(size) if size is not None else None,
+                admin_password=cfg.get("admin_password"),
+            ))
+        return cls(tenants, multi=True)
+
+    def get(self, tenant_id: Optional[str]) -> Optional[Tenant]:
+        if not self.multi:
+            return self._tenants[DEFAULT_TENANT]
+        return self._tenants.get(tenant_id or "")
+
+    def all(self) -> List[Tenant]:
+        return list(self._tenants.values())
@@ -1,356 +1,159 @@
-import json
-from pathlib import Path
-from PIL import Image
-from typing import List, Dict, Any
+import uuid
+from typing import Dict, Any, Optional
 import streamlit as st
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from answer_component import answer_form, answers_pending, supports as answer_form_supports
+from assets import css_markup, icon_png, page_icon
+from idempotency import submission_key
+from instrumentation import finish_rerun, incr, span, start_rerun
+from outbox import COLLECTED, FAILED, RETRYING, SENT
+from pdf_export import answers_html
+from resources import (
+    current_tenant, get_avatar_registry, get_delivery_status, get_ingest_server, get_journal, get_occupancy_bus,
+    get_secret, get_survey, get_tenants, lease_reap_interval, render_pdf_export, submit_results,
+)
+from survey_schema import Question, Survey
+
 from datetime import datetime, timezone
 
+start_rerun()
+
 # ============================================================
-# DESIGN-FARBEN (RGB -> CSS)
+# GRUNDEINSTELLUNGEN DER APP
+# (Farben, Icon und Stylesheet liegen in assets.py)
 # ============================================================
-DARK_GREEN = "rgb(0, 85, 56)"       # Hintergrund & Titel-Farbe
-LIGHT_GREEN = "rgb(138, 189, 36)"   # Schriftfarbe & Titelblock-Hintergrund
+with span("page_icon"):
+    st.set_page_config(
+        page_title="Anonyme Mitgliederumfrage – Bündnis 90/Die Grünen",
+        page_icon=page_icon(),  # Sonnenblume, einmal pro Prozess dekodiert
+        layout="centered"
+    )
+
+# Sammeleingabe über HTTP (nur mit INGEST_PORT) – startet mit der ersten Session
+get_ingest_server()
 
 # ============================================================
-# GRUNDEINSTELLUNGEN DER APP
+# ORTSVERBAND (Mandant) – über ?ov=<id>, ohne [tenants] immer "default"
 # ============================================================
-ICON_PATH = Path(__file__).parent / "sunflower.png"
-page_icon = "🌻"
-if ICON_PATH.exists():
-    page_icon = Image.open(ICON_PATH) # <- Bilddatei im selben Ordner (Sonnenblume)
-
-st.set_page_config(
-    page_title="Anonyme Mitgliederumfrage – Bündnis 90/Die Grünen",
-    page_icon=page_icon,  
-    layout="centered"
-)
+tenant = current_tenant()
+if tenant is None:
+    st.markdown("### 🌻 Bitte wähle Deinen Ortsverband")
+    st.markdown("\n".join(
+        f"- [{t.name or t.tenant_id}](?ov={t.tenant_id})" for t in get_tenants().all()
+    ))
+    st.stop()
+tenant_id = tenant.tenant_id
 
 # ------------------------------------------------------------
 # Hilfsfunktionen für die persistent gespeicherte Avatar-Liste
+# (Store, Postausgang & Co. liegen in resources.py, damit auch die
+# Auswertungsseite dieselben Instanzen verwendet)
 # ------------------------------------------------------------
 
-AVATAR_FILE = Path("used_avatars.json")
-
-
-def load_used_avatars() -> List[str]:
+def reserve_avatar(emoji: Optional[str] = None) -> Optional[str]:
     """
-    Lädt die Liste bereits verwendeter Avatare (Emojis) aus einer JSON-Datei.
+    Reserviert ein Emoji (oder, ohne Angabe, einen zufälligen freien
+    Avatar) atomar für diese Session und gibt einen zuvor reservierten
+    Avatar wieder frei.
 
-    WICHTIG:
-    - Hier wird nur eine kleine Emoji-Liste gespeichert, KEINE Antworten.
-    - Falls die Datei nicht existiert oder fehlerhaft ist, wird eine leere Liste zurückgegeben.
+    Gibt den reservierten Avatar zurück oder None, wenn jemand anderes
+    schneller war bzw. nichts mehr frei ist.
     """
-    if not AVATAR_FILE.exists():
-        return []
+    registry = get_avatar_registry(tenant_id)
+    session_id = st.session_state.session_token
+    previous = st.session_state.get("reserved_avatar")
 
     try:
-        with AVATAR_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            return [str(x) for x in data]
-        return []
-    except Exception:
-        return []
-
-
-def save_used_avatars(used_avatars: List[str]) -> None:
-    """
-    Speichert die Liste bereits verwendeter Avatare (Emojis) in eine JSON-Datei.
-
-    WICHTIG:
-    - Nur Emoji-Zeichen werden gespeichert.
-    - Keine Inhalte der Umfrage, keine personenbezogenen Daten.
-    """
-    try:
-        with AVATAR_FILE.open("w", encoding="utf-8") as f:
-            json.dump(used_avatars, f, ensure_ascii=False, indent=2)
+        if emoji is None:
+            emoji = registry.reserve_random(session_id)
+            if emoji is None:
+                return None
+        elif not registry.reserve(emoji, session_id):
+            return None
+        if previous and previous != emoji:
+            registry.release(previous, session_id)
     except Exception as e:
         st.warning(
-            f"Die Avatar-Liste konnte nicht dauerhaft gespeichert werden "
+            f"Der Avatar konnte nicht dauerhaft reserviert werden "
             f"(technischer Hinweis: {e})."
         )
+        return None
+
+    if emoji != previous:
+        st.session_state.avatar_permanent = False
+    st.session_state.reserved_avatar = emoji
+    return emoji
+
 
-def send_results_email(*, subject: str, body_text: str) -> None:
+def keep_avatar_lease() -> None:
     """
-    Sendet eine E-Mail via SMTP über Streamlit Secrets.
-    Credentials werden ausschließlich über st.secrets bezogen (keine Hardcodes).
+    Heartbeat für die Avatar-Lease, solange der Tab offen ist (läuft als
+    Fragment mit run_every). Wurde die Lease inzwischen abgeräumt – etwa
+    weil der Rechner lange geschlafen hat –, wird die Auswahl zurückgesetzt.
     """
-    host = st.secrets.get("SMTP_HOST")
-    port = int(st.secrets.get("SMTP_PORT", 465))
-    user = st.secrets.get("SMTP_USER")
-    pw = st.secrets.get("SMTP_PASS")
-    mail_to = st.secrets.get("MAIL_TO")
-    mail_from = st.secrets.get("MAIL_FROM", user)
+    avatar = st.session_state.get("reserved_avatar")
+    if avatar is None or st.session_state.get("avatar_permanent"):
+        return
+    registry = get_avatar_registry(tenant_id)
+    session_id = st.session_state.session_token
+    if registry.holds(avatar, session_id):
+        registry.heartbeat(session_id)
+        return
+    st.session_state.reserved_avatar = None
+    st.session_state.chosen_avatar = None
+    st.session_state.avatar_lease_lost = avatar
+    st.rerun()
 
-    missing = [k for k in ["SMTP_HOST", "SMTP_USER", "SMTP_PASS", "MAIL_TO"] if st.secrets.get(k) is None]
-    if missing:
-        raise RuntimeError(f"Fehlende secrets: {', '.join(missing)}")
 
-    msg = MIMEMultipart()
-    msg["Subject"] = subject
-    msg["From"] = mail_from
-    msg["To"] = mail_to
+# ------------------------------------------------------------
+# Versandstatus
+# ------------------------------------------------------------
 
-    msg.attach(MIMEText(body_text, "plain", "utf-8"))
+def render_send_status() -> None:
+    """
+    Zeigt den Versandstatus der zuletzt abgeschickten Nachricht an.
+    Solange sie unterwegs ist, fragt ein Fragment regelmäßig nach.
+    """
+    message_id = st.session_state.get("outbox_message_id")
+    if message_id is None:
+        return
 
-    with smtplib.SMTP_SSL(host, port) as server:
-        server.login(user, pw)
-        server.send_message(msg)
+    status = get_delivery_status(message_id, tenant_id)
+    if status.state == SENT:
+        st.success("Vielen Dank! Die Ergebnisse wurden per E-Mail versendet.")
+    elif status.state == COLLECTED:
+        st.success("Vielen Dank! Deine Ergebnisse gehen mit dem nächsten Sammelversand an den Ortsverband.")
+    elif status.state == FAILED:
+        st.error(f"E-Mail konnte nicht versendet werden: {status.last_error}")
+        st.info("Prüfe SMTP-Daten in .streamlit/secrets.toml oder in den Streamlit-Cloud-Secrets.")
+    elif status.state == RETRYING:
+        st.info(f"Der Mailserver ist gerade nicht erreichbar – neuer Versuch läuft ({status.attempts}).")
+    elif status.queue_position and status.eta_seconds and status.eta_seconds >= 5:
+        # Viele senden gleichzeitig: der Postausgang verschickt gleichmäßig nacheinander
+        st.info(
+            f"Deine Ergebnisse werden gesendet … Es sind gerade viele gleichzeitig dran "
+            f"(noch {status.queue_position} vor Dir, etwa {round(status.eta_seconds)} Sekunden)."
+        )
+    else:
+        st.info("Deine Ergebnisse werden gesendet …")
 
-# ------------------------------------------------------------
-# Definition der Avatar-Emojis
-# ------------------------------------------------------------
-ALL_AVATAR_EMOJIS: List[Dict[str, str]] = [
-    {"emoji": "🦇", "name": "Fledermaus"},
-    {"emoji": "🦉", "name": "Eule"},
-    {"emoji": "🦅", "name": "Adler"},
-    {"emoji": "🦆", "name": "Ente"},
-    {"emoji": "🦢", "name": "Schwan"},
-    {"emoji": "🦜", "name": "Papagei"},
-    {"emoji": "🦚", "name": "Pfau"},
-    {"emoji": "🦩", "name": "Flamingo"},
-    {"emoji": "🕊️", "name": "Taube"},
-    {"emoji": "🦤", "name": "Dodo"},
-    {"emoji": "🦝", "name": "Waschbär"},
-    {"emoji": "🦨", "name": "Stinktier"},
-    {"emoji": "🦡", "name": "Dachs"},
-    {"emoji": "🦫", "name": "Biber"},
-    {"emoji": "🦦", "name": "Otter"},
-    {"emoji": "🦥", "name": "Faultier"},
-    {"emoji": "🦘", "name": "Känguru"},
-    {"emoji": "🦙", "name": "Lama"},
-    {"emoji": "🦒", "name": "Giraffe"},
-    {"emoji": "🦬", "name": "Bison"},
-    {"emoji": "🦏", "name": "Nashorn"},
-    {"emoji": "🦛", "name": "Nilpferd"},
-    {"emoji": "🐆", "name": "Leopard"},
-    {"emoji": "🐅", "name": "Tiger"},
-    {"emoji": "🐊", "name": "Krokodil"},
-    {"emoji": "🦈", "name": "Hai"},
-    {"emoji": "🐋", "name": "Wal"},
-    {"emoji": "🐬", "name": "Delfin"},
-    {"emoji": "🦭", "name": "Robbe"},
-    {"emoji": "🦎", "name": "Eidechse"},
-    {"emoji": "🐢", "name": "Schildkröte"},
-    {"emoji": "🦕", "name": "Sauropode"},
-    {"emoji": "🦖", "name": "T-Rex"},
-    {"emoji": "🦟", "name": "Mücke"},
-    {"emoji": "🕷️", "name": "Spinne"},
-    {"emoji": "🦂", "name": "Skorpion"},
-    {"emoji": "🐙", "name": "Oktopus"},
-    {"emoji": "🦑", "name": "Kalmar"},
-    {"emoji": "🪼", "name": "Qualle"},
-]
+    # Endzustand erreicht: einmal komplett neu laden, damit das Nachfragen aufhört
+    if status.state in (SENT, COLLECTED, FAILED) and st.session_state.get("outbox_polling"):
+        st.session_state.outbox_polling = False
+        st.rerun()
 
 # ------------------------------------------------------------
-# Custom CSS: Dunkelgrüner Hintergrund, hellgrüne Schrift,
-# Titelblock hellgrün mit dunkelgrüner Überschrift,
-# größere Emoji-Icons
+# Custom CSS: wird einmal pro Prozess erzeugt (assets.py) und als
+# statische Datei ausgeliefert – hier geht nur ein kurzer Verweis raus
 # ------------------------------------------------------------
 def inject_custom_css() -> None:
-    st.markdown(
-        f"""
-        <style>
-        /* ================= GOOGLE FONTS ================= */
-        @import url('https://fonts.googleapis.com/css2?family=PT+Sans:ital,wght@0,400;0,700;1,400&family=Oswald:ital,wght@1,600;1,700&display=swap');
-
-        /* App-Hintergrund */
-        .stApp {{
-            background: {DARK_GREEN};
-        }}
-
-        /* Standard-Textfarbe (Absätze, Hinweise, Labels etc.) */
-        html, body, [class*="css"] {{
-            font-family: "PT Sans", Arial, sans-serif;
-            color: {LIGHT_GREEN} !important;
-        }}
-
-        /* Streamlit Markdown/Text */
-        .stMarkdown, .stMarkdown p, .stMarkdown li {{
-            color: {LIGHT_GREEN} !important;
-        }}
-
-        /* Captions / Help-Text */
-        .stCaption, small {{
-            color: {LIGHT_GREEN} !important;
-            opacity: 0.9;
-        }}
-
-        /* Expander Header */
-        div[data-testid="stExpander"] > details > summary {{
-            color: {LIGHT_GREEN} !important;
-        }}
-
-        /* Inputs/Selectbox Labels */
-        label, .stTextInput label, .stSelectbox label, .stMultiSelect label {{
-            color: {LIGHT_GREEN} !important;
-        }}
-
-        /* Karten/Container (leicht transparent, damit es "modern" wirkt) */
-        .survey-card {{
-            background: rgba(255, 255, 255, 0.06);
-            border-radius: 16px;
-            padding: 1.2rem 1.4rem;
-            border: 1px solid rgba(138, 189, 36, 0.35);
-            box-shadow: 0 6px 18px rgba(0,0,0,0.18);
-        }}
-
-        /* Titel-Block: hellgrün, Text dunkelgrün */
-        .title-block {{
-            background: {LIGHT_GREEN};
-            border-radius: 18px;
-            padding: 1.1rem 1.3rem;
-            border: 1px solid rgba(0,0,0,0.08);
-            box-shadow: 0 8px 20px rgba(0,0,0,0.18);
-            margin-bottom: 1rem;
-        }}
-        .title-block h1 {{
-            margin: 0;
-            padding: 0;
-            font-size: 2.25rem;
-            line-height: 1.1;
-            color: {DARK_GREEN} !important;
-            /*GrueneType fallback*/
-            font-family: "Oswald", "Arial Narrow", Arial, sans-serif;
-            font-style: italic;
-            font-weight: 700;
-            letter-spacing: 0.02em;
-        }}
-        .title-block h2 {{
-            margin: 0.35rem 0 0 0;
-            padding: 0;
-            font-size: 1.1rem;
-            line-height: 1.2;
-            color: {DARK_GREEN} !important;
-            font-weight: 600;
-            opacity: 0.95;
-        }}
-
-        /* Trennlinie */
-        hr {{
-            border: none;
-            border-top: 1px solid rgba(138, 189, 36, 0.35);
-            margin: 1.0rem 0;
-        }}
-
-        /* Buttons */
-        button[kind="primary"] {{
-            background-color: {LIGHT_GREEN} !important;
-            color: {DARK_GREEN} !important;
-            border: 1px solid rgba(0,0,0,0.08) !important;
-            font-weight: 700 !important;
-        }}
-
-        /* Emoji-Übersicht (größer) */
-        .avatar-box {{
-            display: flex;
-            flex-wrap: wrap;
-            gap: 0.75rem;
-            margin: 0.6rem 0 0.2rem 0;
-        }}
-
-        /* Größere Icons */
-        .avatar-pill {{
-            font-size: 2.35rem;   /* <- größer */
-            line-height: 1;
-            border-radius: 999px;
-            padding: 0.35rem 0.85rem;
-            border: 1px solid rgba(138, 189, 36, 0.55);
-            cursor: default;
-            user-select: none;
-        }}
-        .avatar-pill.used {{
-            opacity: 0.30;
-        }}
-        .avatar-pill.free {{
-            background: rgba(138, 189, 36, 0.14);
-        }}
-        .avatar-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(72px, 1fr));
-            gap: 0.9rem;
-            margin-top: 0.8rem;
-        }}
-
-        .avatar-tile {{
-            font-size: 3rem;
-            line-height: 1;
-            text-align: center;
-            padding: 0.6rem 0.2rem;
-            border-radius: 16px;
-            cursor: pointer;
-            border: 2px solid transparent;
-            background: rgba(138, 189, 36, 0.14);
-            transition: all 0.15s ease-in-out;
-        }}
-
-        .avatar-tile:hover {{
-            border-color: rgb(138, 189, 36);
-            transform: scale(1.05);
-        }}
-
-        .avatar-tile.used {{
-            opacity: 0.25;
-            cursor: not-allowed;
-        }}
-
-        .avatar-tile.selected {{
-            border-color: rgb(138, 189, 36);
-            box-shadow: 0 0 0 3px rgba(138, 189, 36, 0.35);
-            background: rgba(138, 189, 36, 0.25);
-        }}
-
-        /* Avatar-Kachel (Emoji + Name) */
-        .avatar-card {{
-            display: flex;
-            align-items: center;
-            gap: 0.7rem;
-            padding: 0.75rem 0.9rem;
-            border-radius: 16px;
-            border: none;
-            background: rgba(138, 189, 36, 0.12);
-        }}
-
-        .avatar-card.used {{
-            opacity: 0.30;
-        }}
-
-        .avatar-card.selected {{
-            box-shadow: 0 0 0 3px rgba(138, 189, 36, 0.35);
-            background: rgba(138, 189, 36, 0.22);
-        }}
-
-        .avatar-emoji {{
-            font-size: 2.6rem;
-            line-height: 1;
-        }}
-
-        .avatar-name {{
-            font-size: 1.05rem;
-            font-weight: 700;
-            color: rgb(138, 189, 36);
-        }}
-
-
-
-        /* Fußnote */
-        .footnote {{
-            font-size: 0.85rem;
-            color: {LIGHT_GREEN} !important;
-            opacity: 0.9;
-            margin-top: 0.8rem;
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(css_markup(), unsafe_allow_html=True)
 
 
-inject_custom_css()
+with span("custom_css"):
+    inject_custom_css()
+
+survey = get_survey(tenant_id)
 
 # ============================================================
 # TITEL & EINLEITUNG (mit Logo links + Titelblock rechts)
@@ -359,15 +162,16 @@ inject_custom_css()
 col_logo, col_title = st.columns([1, 12], vertical_alignment="center")
 
 with col_logo:
-    if ICON_PATH.exists():
-        st.image(str(ICON_PATH), width=48)  # ggf. 56, wenn Du es größer willst
+    logo = icon_png(96)  # doppelte Auflösung für 48 px
+    if logo is not None:
+        st.image(logo, width=48)  # ggf. 56, wenn Du es größer willst
 
 with col_title:
     st.markdown(
-        """
+        f"""
         <div class="title-block" style="margin-bottom: 0;">
-            <h1>Anonyme Mitgliederumfrage</h1>
-            <h2>Ortsverband – Bündnis 90/Die Grünen</h2>
+            <h1>{survey.title}</h1>
+            <h2>{survey.subtitle}</h2>
         </div>
         """,
         unsafe_allow_html=True
@@ -393,7 +197,11 @@ st.markdown("<hr>", unsafe_allow_html=True)
 # AVATAR-BEREICH (Emojis + globale Memory-Liste)
 # ============================================================
 
-used_avatars_global: List[str] = load_used_avatars()
+# Wechsel des Ortsverbands in derselben Session: Avatar gehört zum alten Store
+if st.session_state.get("tenant_id") != tenant_id:
+    st.session_state.tenant_id = tenant_id
+    st.session_state.chosen_avatar = None
+    st.session_state.reserved_avatar = None
 
 if "chosen_avatar" not in st.session_state:
     st.session_state.chosen_avatar = None
@@ -401,44 +209,152 @@ if "chosen_avatar" not in st.session_state:
 if "reserved_avatar" not in st.session_state:
     st.session_state.reserved_avatar = None
 
+# Zufällige, nicht zurückverfolgbare Kennung dieser Browser-Session
+if "session_token" not in st.session_state:
+    st.session_state.session_token = uuid.uuid4().hex
+
 st.markdown("### 🐾 Dein anonymes Tier-Emoji")
-st.markdown("Klicke auf ein Emoji, um es auszuwählen.")
-
-cols = st.columns(4)
-
-for i, av in enumerate(ALL_AVATAR_EMOJIS):
-    col = cols[i % 4]
-    emoji = av["emoji"]
-    name = av["name"]
-
-    is_used = emoji in used_avatars_global
-    is_selected = emoji == st.session_state.chosen_avatar
-
-    classes = ["avatar-card"]
-    if is_used:
-        classes.append("used")
-    if is_selected:
-        classes.append("selected")
-
-    with col:
-        st.markdown(
-            f"""
-            <div class="{' '.join(classes)}">
-                <div class="avatar-emoji">{emoji}</div>
-                <div class="avatar-name">{name}</div>
-            </div>
-            """,
-            unsafe_allow_html=True
+st.markdown("Klicke auf ein Emoji, um es auszuwählen – oder lass Dir eines zufällig zuteilen.")
+
+AVATAR_PAGE_SIZE = 40  # Karten pro Seite
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def avatar_grid_html(
+    tenant_id: str, version: int, page: int, reserved: Optional[str], chosen: Optional[str], _registry: Any
+) -> str:
+    """
+    Alle Karten einer Seite als EIN HTML-Element. Zwischengespeichert über
+    (Ortsverband, Belegungsversion, Seite, eigene Auswahl) – `_registry`
+    geht nicht in den Schlüssel ein.
+    """
+    space = _registry.space
+    first = page * AVATAR_PAGE_SIZE
+    cards = []
+    for index in range(first, min(first + AVATAR_PAGE_SIZE, len(space))):
+        emoji = space.avatar(index)
+        classes = "avatar-tile"
+        # Der eigene reservierte Avatar gilt nicht als "belegt"
+        if emoji != reserved and _registry.is_used(emoji):
+            classes += " used"
+        if emoji == chosen:
+            classes += " selected"
+        cards.append(
+            f'<div class="{classes}" title="{space.name(index)}">{emoji}'
+            f'<div class="avatar-name">{space.name(index)}</div></div>'
         )
+    return f'<div class="avatar-grid">{"".join(cards)}</div>'
 
-        # Auswahl-Button separat (Streamlit-Buttons sind zuverlässig klickbar)
-        if st.button("Auswählen", key=f"pick_{emoji}", disabled=is_used):
-            # nur lokal auswählen – noch NICHT global reservieren
-            st.session_state.chosen_avatar = emoji
-            st.rerun()
 
-if st.session_state.chosen_avatar:
-    st.success(f"Dein Avatar ist: {st.session_state.chosen_avatar}")
+def request_avatar() -> None:
+    """Callback der Auswahlliste: merkt sich den Wunsch, das Fragment reserviert."""
+    st.session_state.avatar_request = st.session_state.avatar_choice
+
+
+def render_avatar_picker() -> None:
+    """
+    Avatar-Auswahl als eigenes Fragment: Eine Auswahl führt nur diesen
+    Abschnitt neu aus, nicht die ganze Seite.
+
+    Die Übersicht ist ein einziges, zwischengespeichertes HTML-Element;
+    gewählt wird über EINE Auswahlliste mit den freien Avataren der Seite.
+    Bei großen Avatar-Räumen wird nur eine Seite mit AVATAR_PAGE_SIZE
+    Karten gezeigt; "frei?" ist ein Bit-Test in der Registry.
+
+    Bis zur Abgabe läuft das Fragment zusätzlich im Takt
+    OCCUPANCY_WATCH_SECONDS: Was der Belegungs-Bus von anderen Sessions
+    meldet, baut so nur die Auswahl neu auf (alles aus dem Speicher), nie
+    die ganze Seite – ein Klick weiter unten (z. B. "Senden") geht nicht
+    verloren.
+    """
+    registry = get_avatar_registry(tenant_id)
+    space = registry.space
+    # Was der Bus bis hierher gemeldet hat, zeichnet dieser Lauf ohnehin
+    st.session_state.occupancy_sub.take()
+
+    lost = st.session_state.pop("avatar_lease_lost", None)
+    if lost is not None:
+        st.info(f"Deine Reservierung für {lost} ist abgelaufen – bitte wähle erneut.")
+
+    def pick(emoji: Optional[str]) -> None:
+        first_pick = st.session_state.reserved_avatar is None
+        # Atomar global reservieren – schlägt fehl, wenn jemand schneller war
+        chosen = reserve_avatar(emoji)
+        if chosen is not None:
+            st.session_state.chosen_avatar = chosen
+            # Beim ersten Avatar ändert sich auch der Sende-Button -> ganze Seite
+            st.rerun(scope="app" if first_pick else "fragment")
+        elif emoji is None:
+            st.warning("Leider sind alle Avatare vergeben.")
+        else:
+            st.warning(f"{emoji} wurde gerade von jemand anderem gewählt.")
+
+    requested = st.session_state.pop("avatar_request", None)
+    if requested is not None and requested != st.session_state.reserved_avatar:
+        pick(requested)
+
+    reserved = st.session_state.reserved_avatar
+    with span("avatar_registry"):
+        free_count = registry.free_count
+    st.caption(f"Noch frei: {free_count} von {len(space)} Avataren.")
+
+    if st.button("🎲 Zufälligen freien Avatar wählen", key="pick_random", disabled=free_count == 0):
+        pick(None)
+
+    n_pages = -(-len(space) // AVATAR_PAGE_SIZE)
+    page = 0
+    if n_pages > 1:
+        page = st.number_input(
+            f"Seite (von {n_pages})", min_value=1, max_value=n_pages, step=1, key="avatar_page"
+        ) - 1
+    first = page * AVATAR_PAGE_SIZE
+
+    st.markdown(
+        avatar_grid_html(tenant_id, registry.version, page, reserved, st.session_state.chosen_avatar, registry),
+        unsafe_allow_html=True,
+    )
+
+    # Wählbar: die freien Avatare dieser Seite, der eigene steht vorn
+    choices = [reserved] if reserved is not None else []
+    for index in range(first, min(first + AVATAR_PAGE_SIZE, len(space))):
+        emoji = space.avatar(index)
+        if emoji != reserved and not registry.is_used(emoji):
+            choices.append(emoji)
+    st.session_state.avatar_choice = reserved
+    st.selectbox(
+        "Avatar auswählen",
+        choices,
+        index=None,
+        key="avatar_choice",
+        placeholder="Freien Avatar auswählen …",
+        format_func=lambda e: f"{e}  {space.name(space.index(e))}" if space.index(e) is not None else e,
+        on_change=request_avatar,
+    )
+
+    if st.session_state.chosen_avatar:
+        st.success(f"Dein Avatar ist: {st.session_state.chosen_avatar}")
+
+
+# Änderungen anderer Sessions: Abonnement auf dem Belegungs-Bus
+occupancy_sub = st.session_state.get("occupancy_sub")
+if occupancy_sub is None or occupancy_sub.topic != tenant_id:
+    st.session_state.occupancy_sub = get_occupancy_bus().subscribe(tenant_id, st.session_state.session_token)
+
+# Die Auswahl läuft bis zur Abgabe im Takt – danach ist sie abgeschlossen
+with span("avatar_picker"):
+    st.fragment(
+        render_avatar_picker,
+        run_every=None if st.session_state.get("avatar_permanent") else float(get_secret("OCCUPANCY_WATCH_SECONDS", 2)),
+    )()
+
+st.fragment(
+    keep_avatar_lease,
+    run_every=(
+        lease_reap_interval(get_avatar_registry(tenant_id).lease_seconds)
+        if st.session_state.reserved_avatar and not st.session_state.get("avatar_permanent")
+        else None
+    ),
+)()
 
 
 # ============================================================
@@ -454,12 +370,18 @@ st.markdown(
     """
 )
 
-def question_checkboxes(
-    key_prefix: str,
-    title: str,
-    options: List[str],
-    max_choices: int | None = None
-) -> Dict[str, Any]:
+def toggle_option(question: Question, index: int) -> None:
+    """Callback einer Checkbox: setzt bzw. löscht Bit `index` in der Maske der Frage."""
+    state = st.session_state
+    mask = state.get(question.mask_key, 0)
+    if state[question.option_keys[index]]:
+        state[question.mask_key] = mask | (1 << index)
+    else:
+        state[question.mask_key] = mask & ~(1 << index)
+
+
+@st.fragment
+def question_checkboxes(question: Question) -> None:
     """
     Zeigt echte Checkboxen (eine pro Option) + Freitextfeld.
     Optional kann die maximale Anzahl an Auswahloptionen begrenzt werden.
@@ -467,115 +389,66 @@ def question_checkboxes(
     UX:
     - Wenn max_choices erreicht ist, werden die übrigen (noch nicht angehakten)
       Checkboxen automatisch deaktiviert.
-    """
-    st.markdown(f"#### {title}")
-
-    if max_choices is not None:
-        st.caption(f"Bitte höchstens **{max_choices}** Antworten auswählen.")
 
-    # Aktuellen Zustand zählen
-    checked_count = 0
-    for opt in options:
-        if st.session_state.get(f"{key_prefix}_cb_{opt}", False):
-            checked_count += 1
-
-    selected: List[str] = []
-
-    # Checkboxen rendern
-    for opt in options:
-        state_key = f"{key_prefix}_cb_{opt}"
-
-        # Deaktivieren, wenn Limit erreicht und diese Box nicht schon aktiv ist
-        disabled = False
-        if max_choices is not None:
-            already_checked = st.session_state.get(state_key, False)
-            if (checked_count >= max_choices) and (not already_checked):
-                disabled = True
-
-        value = st.checkbox(opt, key=state_key, disabled=disabled)
-        if value:
-            selected.append(opt)
+    Jede Frage ist ein eigenes Fragment: Ein Häkchen führt nur diese Frage
+    neu aus. Die Auswahl steht als EINE Ganzzahl (Bitmaske) im Session State
+    und wird von den Checkbox-Callbacks gepflegt. Alle Widget-Schlüssel sind
+    im Fragebogen vorberechnet.
+    """
+    st.markdown(f"#### {question.title}")
+
+    if question.limit_caption is not None:
+        st.caption(question.limit_caption)
+
+    # Aktuellen Zustand einmal lesen und zählen
+    mask = st.session_state.get(question.mask_key, 0)
+    limit_reached = question.max_choices is not None and bin(mask).count("1") >= question.max_choices
+
+    # Checkboxen rendern – deaktiviert, wenn Limit erreicht und nicht schon aktiv
+    for i, (opt, state_key) in enumerate(zip(question.options, question.option_keys)):
+        already_checked = bool(mask >> i & 1)
+        st.checkbox(
+            opt,
+            key=state_key,
+            disabled=limit_reached and not already_checked,
+            on_change=toggle_option,
+            args=(question, i),
+        )
 
     # Freitext
-    other = st.text_input(
+    st.text_input(
         label="Sonstiges / eigene Antwort:",
-        key=f"{key_prefix}_other"
+        key=question.other_key
     )
 
     st.markdown("<hr>", unsafe_allow_html=True)
-    return {"selected": selected, "other": other}
-
-
 
-antworten: Dict[str, Any] = {}
 
-antworten["q1_motive"] = question_checkboxes(
-    key_prefix="q1",
-    title="1. Was sind Deine Motive dabei zu sein?",
-    options=[
-        "Politische Veränderung bewirken",
-        "Klima- und Umweltschutz",
-        "Soziale Gerechtigkeit",
-        "Engagement vor Ort",
-        "Mitgestaltung kommunaler Politik",
-        "Vernetzung & Gemeinschaft"
-    ],
-    max_choices=3
-)
-
-antworten["q2_erwartung"] = question_checkboxes(
-    key_prefix="q2",
-    title="2. Was ist Deine Erwartung an den Ortsverband?",
-    options=[
-        "Transparente politische Arbeit",
-        "Mehr Austausch untereinander",
-        "Konkrete Projektarbeit",
-        "Unterstützung im Engagement",
-        "Weiterbildung / politische Bildung"
-    ],
-    max_choices=3
-)
+def collect_answers(survey: Survey) -> Dict[str, Any]:
+    """Antworten aller Fragen in kompakter Form (Codebuch, Masken, Freitexte)."""
+    state = st.session_state
+    return survey.compact(
+        {q.key: state.get(q.mask_key, 0) for q in survey.questions},
+        {q.key: state.get(q.other_key, "") for q in survey.questions},
+    )
 
-antworten["q3_themen"] = question_checkboxes(
-    key_prefix="q3",
-    title="3. Welche Themen bewegen Dich besonders?",
-    options=[
-        "Energie & Klima",
-        "Verkehr & Mobilität",
-        "Soziales & Integration",
-        "Naturschutz & Biodiversität",
-        "Digitalisierung",
-        "Bildung",
-        "Landwirtschaft",
-        "Gesundheit"
-    ],
-    max_choices=4
-)
 
-antworten["q4_aendern"] = question_checkboxes(
-    key_prefix="q4",
-    title="4. Was würdest Du im Ortsverband anders machen?",
-    options=[
-        "Offener kommunizieren",
-        "Entscheidungswege verkürzen",
-        "Mehr Aktionen & Veranstaltungen",
-        "Bessere Einbindung neuer Mitglieder"
-    ],
-    max_choices=3
-)
+# Standard: alle Fragen als EINE Browser-Komponente – Häkchen kosten dann
+# keinen Serveraufruf mehr. st.secrets ANSWER_MODE = "server" schaltet auf
+# die Checkbox-Fragmente zurück (z. B. wenn Komponenten blockiert sind).
+component_mode = get_secret("ANSWER_MODE", "component") == "component" and answer_form_supports(survey)
+with span("questions"):
+    if component_mode:
+        error = answer_form(survey)
+        if error is not None:
+            st.error(error)
+    else:
+        for question in survey.questions:
+            question_checkboxes(question)
 
-antworten["q5_hemmnisse"] = question_checkboxes(
-    key_prefix="q5",
-    title="5. Was hält Dich ab, Dich (noch) mehr einzubringen?",
-    options=[
-        "Zeitmangel",
-        "Unklare Rollen / Aufgaben",
-        "Zu wenig Informationen",
-        "Hemmschwelle in der Gruppe",
-        "Strukturen sind unübersichtlich"
-    ],
-    max_choices=3
-)
+kompakt: Dict[str, Any] = collect_answers(survey)
+# Lesbare Form nur für Vorschau und PDF
+antworten: Dict[str, Any] = survey.expand(kompakt["masks"], kompakt["other"])
 
 antworten["avatar"] = st.session_state.get("chosen_avatar", None)
 
@@ -595,12 +468,19 @@ st.markdown(
 if st.button("Antworten als Beispiel anzeigen", type="primary"):
     st.json(antworten)
 
+render_pdf_export(
+    lambda: answers_html({"avatar": st.session_state.get("chosen_avatar"), "answers": antworten},
+                         survey.subtitle, {q.key: q.title for q in survey.questions}),
+    key="pdf_answers",
+    label="Meine Antworten als PDF",
+    file_name="meine_antworten.pdf",
+)
 
 st.markdown(
     """
     <div class="footnote">
-    In der endgültigen Version wird hier ein Button ergänzt, der die Antworten
-    anonym als E-Mail an den Ortsverband sendet und ggf. einen PDF-Export erlaubt.
+    Das PDF wird nur für Dich erstellt und nicht verschickt. Unten kannst Du
+    Deine Antworten anonym als E-Mail an den Ortsverband senden.
     </div>
     """,
     unsafe_allow_html=True
@@ -613,31 +493,57 @@ send_opt_in = st.checkbox(
     value=False
 )
 
-st.caption("Hinweis: Es werden keine Antworten gespeichert. Beim Versand werden die Antworten nur per E-Mail übertragen.")
-
-# Für klare Logik: Versand nur erlauben, wenn ein Avatar reserviert ist (falls Du reservieren/auswählen getrennt hast).
-# Wenn Du noch KEIN reserved_avatar verwendest, ersetze reserved_avatar durch chosen_avatar.
-avatar_for_sending = st.session_state.get("reserved_avatar") or st.session_state.get("chosen_avatar")
-
-can_send = send_opt_in and (avatar_for_sending is not None)
-
-if st.button("📨 Ergebnisse jetzt senden", type="primary", disabled=not can_send):
+if get_journal(tenant_id) is not None:
+    st.caption("Hinweis: Beim Versand werden die Antworten anonym (ohne Session-Kennung) im Ergebnis-Journal des Ortsverbands abgelegt und per E-Mail übertragen.")
+else:
+    st.caption("Hinweis: Es werden keine Antworten gespeichert. Beim Versand liegen die Antworten nur kurz im Postausgang und werden per E-Mail übertragen.")
+
+# Für klare Logik: Versand nur erlauben, wenn ein Avatar reserviert ist.
+avatar_for_sending = st.session_state.get("reserved_avatar")
+
+# Browser-Komponente: Nicht übernommene Änderungen würden beim Senden fehlen
+unapplied = component_mode and answers_pending()
+if unapplied:
+    st.warning("Du hast Antworten geändert, aber noch nicht übernommen. "
+               "Klicke oben auf „✔️ Antworten übernehmen“, bevor Du sendest.")
+
+can_send = send_opt_in and (avatar_for_sending is not None) and not unapplied
+
+# Payload: gut maschinenlesbar (JSON), plus ein paar Metadaten
+payload = {
+    "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+    "survey_id": survey.survey_id,
+    "survey_version": survey.version,
+    **({"tenant": tenant_id} if get_tenants().multi else {}),
+    "avatar": avatar_for_sending,
+    **kompakt,
+}
+# Gleiche Antworten derselben Session = gleicher Schlüssel. Ob schon
+# gesendet wurde, steht in der Session – dafür ist kein Serverzugriff nötig.
+send_key = submission_key(st.session_state.session_token, payload)
+already_sent = st.session_state.get("sent_key") == send_key
+
+if already_sent:
+    st.caption("✅ Diese Antworten hast Du bereits gesendet. Änderst Du etwas, kannst Du erneut senden.")
+
+if st.button("📨 Ergebnisse jetzt senden", type="primary", disabled=not can_send or already_sent) and can_send:
     try:
-        # Payload: gut maschinenlesbar (JSON), plus ein paar Metadaten
-        payload = {
-            "timestamp_utc": datetime.now(timezone.utc).isoformat(),
-            "avatar": avatar_for_sending,
-            "answers": antworten,
-        }
-
-        avatar = st.session_state.get("reserved_avatar") or st.session_state.get("chosen_avatar") or "Unbekannt"
-        subject = f'Neues Umfrageergebnis von "{avatar}"'
-
-        body = json.dumps(payload, ensure_ascii=False, indent=2)
-
-        send_results_email(subject=subject, body_text=body)
-
-        st.success("Vielen Dank! Die Ergebnisse wurden per E-Mail versendet.")
+        with span("submit"):
+            st.session_state.outbox_message_id = submit_results(payload, tenant_id, idempotency_key=send_key)
+        st.session_state.sent_key = send_key
+        st.session_state.outbox_polling = True
+        # Abgeschickt: Der Avatar bleibt dauerhaft belegt (keine Lease mehr)
+        st.session_state.avatar_permanent = get_avatar_registry(tenant_id).make_permanent(
+            avatar_for_sending, st.session_state.session_token
+        )
+        incr("umfrage_submissions_total")
     except Exception as e:
         st.error(f"E-Mail konnte nicht versendet werden: {e}")
         st.info("Prüfe SMTP-Daten in .streamlit/secrets.toml oder in den Streamlit-Cloud-Secrets.")
+
+st.fragment(
+    render_send_status,
+    run_every=2 if st.session_state.get("outbox_polling") else None,
+)()
+
+finish_rerun()